@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from app.api.v1.transcription import router as transcription_router
+from app.api.v1.speakers import router as speakers_router
 from app.api.v1.thinking_process import router as thinking_process_router
 from app.api.v1.feedback import router as feedback_router
 from app.api.v1.role_play_analysis import router as role_play_analysis_router
@@ -26,6 +27,13 @@ router.include_router(
     tags=["transcription"]
 )
 
+# 包含声纹库路由
+router.include_router(
+    speakers_router,
+    prefix="/speakers",
+    tags=["speakers"]
+)
+
 # 包含思考过程分析路由
 router.include_router(
     thinking_process_router,
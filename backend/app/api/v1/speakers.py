@@ -0,0 +1,84 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.api.v1.uploads import decode_spooled_upload, parse_time_range
+from app.services.speaker_diarization import speaker_service
+from app.services.speaker_registry import speaker_registry
+import json
+
+router = APIRouter()
+
+def _enroll(file: UploadFile, name: str, time_range: tuple = None, metadata: dict = None) -> dict:
+    """解码音频、提取声纹并登记"""
+    audio = decode_spooled_upload(file, time_range)
+    embeddings = speaker_service.embed_audio(audio)
+    return speaker_registry.enroll(name, embeddings, metadata)
+
+@router.get("")
+async def list_speakers():
+    """列出声纹库中已登记的说话人
+    
+    Returns:
+        dict: {"status": "success", "speakers": [{"id", "name", "metadata", "samples", "enrolled_at", "updated_at"}, ...], "stats": {...}}
+    """
+    return {
+        "status": "success",
+        "speakers": speaker_registry.list_speakers(),
+        "stats": speaker_registry.stats()
+    }
+
+@router.post("")
+async def enroll_speaker(name: str, file: UploadFile = File(...), start: float = None, end: float = None,
+                         metadata: str = None):
+    """登记说话人声纹，之后的转录中认出该说话人时直接使用其名称
+    
+    上传只含该说话人的音频，或用 start/end 指定节目中其单独发言的时间段；同名说话人再次登记时合并声纹。
+    
+    Args:
+        name: 说话人名称
+        file: 音频文件
+        start: 发言起点（秒）
+        end: 发言终点（秒）
+        metadata: JSON 对象形式的附加信息，如 {"show": "节目名"}
+    
+    Returns:
+        dict: {"status": "success", "speaker": {...}}
+    """
+    time_range = parse_time_range(start, end)
+    try:
+        extra = json.loads(metadata) if metadata else None
+    except ValueError:
+        extra = None
+    if metadata and not isinstance(extra, dict):
+        raise HTTPException(status_code=400, detail="metadata must be a JSON object")
+
+    try:
+        speaker = await run_in_threadpool(_enroll, file, name, time_range, extra)
+        return {
+            "status": "success",
+            "speaker": speaker
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except HTTPException as e:
+        raise HTTPException(status_code=500, detail=f"Speaker enrollment failed: {e.detail}")
+    except Exception as e:
+        print(f"Speaker enrollment error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Speaker enrollment failed: {str(e)}")
+
+@router.delete("/{speaker_id}")
+async def delete_speaker(speaker_id: str):
+    """从声纹库删除说话人
+    
+    Args:
+        speaker_id: 说话人ID
+    
+    Returns:
+        dict: {"status": "success"}
+    """
+    if not await run_in_threadpool(speaker_registry.remove, speaker_id):
+        raise HTTPException(status_code=404, detail="Speaker not found")
+    return {
+        "status": "success"
+    }
@@ -1,68 +1,1031 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from app.api.v1.uploads import decode_spooled_upload, parse_time_range
 from app.services.model_service import model_service
-from app.services.speaker_diarization import SpeakerDiarizationService
-from app.utils.audio_processor import AudioProcessor
+from app.services.model_registry import DEFAULT_MODEL, model_registry
+from app.services.batching import batcher
+from app.services.transcription_jobs import job_manager
+from app.services.job_store import job_store
+from app.services.transcription_pipeline import transcription_pipeline
+from app.services.fingerprint_index import fingerprint_index
+from app.services.episode_chunks import episode_chunks
+from app.services.transcription_cache import transcription_cache
+from app.services.audio_cache import audio_cache
+from app.services.streaming_asr import streaming_asr_service
+from app.services.speaker_diarization import speaker_service
+from app.services.speaker_registry import speaker_registry
+from app.utils.audio_processor import AudioProcessor, SEEKABLE_INPUT_FORMATS
+from app.utils.cancellation import Cancelled, CancelToken
+from app.utils.hashing import file_sha256
+from app.utils.priority import PRIORITY_CLASSES
 from app.core.config import settings
-import tempfile
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import json
+import queue
+import time
 import os
-import shutil
+import numpy as np
 
 router = APIRouter()
 
-speaker_service = SpeakerDiarizationService()
 audio_processor = AudioProcessor()
 
+def _parse_hotwords(hotwords: str = None):
+    """解析逗号分隔的热词参数，未提供时返回 None（使用默认配置）"""
+    if hotwords is None:
+        return None
+    return [word.strip() for word in hotwords.split(",") if word.strip()]
+
+def _parse_timeout(timeout: float = None) -> CancelToken:
+    """校验超时参数并创建请求的取消令牌
+    
+    Args:
+        timeout: 请求的最长处理时间（秒），默认使用配置，0 表示不限
+        
+    Returns:
+        CancelToken: 携带截止时间的取消令牌
+        
+    Raises:
+        HTTPException: 超时为负数时返回400
+    """
+    if timeout is None:
+        timeout = settings.REQUEST_TIMEOUT_SECONDS
+    if timeout < 0:
+        raise HTTPException(status_code=400, detail="Invalid timeout: require timeout >= 0")
+    return CancelToken(timeout)
+
+def _parse_priority(priority: str = None, default: str = "normal") -> str:
+    """校验调度优先级参数
+    
+    Args:
+        priority: interactive / normal / bulk
+        default: 未指定时使用的优先级，同步接口默认 interactive，异步任务默认 normal
+        
+    Returns:
+        str: 优先级
+        
+    Raises:
+        HTTPException: 未知的优先级返回400
+    """
+    if priority is None:
+        return default
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"Invalid priority: require one of {', '.join(PRIORITY_CLASSES)}")
+    return priority
+
+def _parse_model(model: str = None) -> str:
+    """校验模型参数
+    
+    Args:
+        model: 模型注册表中的模型名称
+        
+    Returns:
+        str: 模型名称，默认模型返回 None，与未指定模型时的缓存键一致
+        
+    Raises:
+        HTTPException: 未知的模型返回400
+    """
+    if model is None or model == DEFAULT_MODEL:
+        return None
+    if not model_registry.has(model):
+        raise HTTPException(status_code=400, detail=f"Invalid model: require one of {', '.join(model_registry.names())}")
+    return model
+
+@asynccontextmanager
+async def _watch_disconnect(request: Request, cancel_token: CancelToken):
+    """在后台检测客户端断开，断开时取消令牌，使解码和推理尽快停止
+    
+    必须在请求体读取完毕后进入，否则检测会与读取请求体争抢消息。
+    """
+    async def watch():
+        while not cancel_token.cancelled:
+            if await request.is_disconnected():
+                cancel_token.cancel("disconnected")
+                return
+            await asyncio.sleep(settings.DISCONNECT_POLL_SECONDS)
+    
+    watcher = asyncio.create_task(watch())
+    try:
+        yield
+    finally:
+        watcher.cancel()
+
+async def _await_job(job, cancel_token: CancelToken) -> list:
+    """等待任务结果，请求的令牌取消（客户端断开或超时）时不再等待
+    
+    撤回该请求后没有其他请求共用任务时，工作线程在下一个片段边界停止。
+    
+    Raises:
+        Cancelled: 请求或任务被取消时抛出
+    """
+    future = asyncio.wrap_future(job.future)
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=settings.DISCONNECT_POLL_SECONDS)
+        if done:
+            return future.result()
+        if cancel_token.cancelled:
+            job_manager.release(job, cancel_token.reason)
+            raise Cancelled(cancel_token.reason)
+
+def _cancelled_error(error: Cancelled) -> HTTPException:
+    """取消原因对应的HTTP错误：超时为504，客户端断开为499"""
+    if error.reason == "deadline":
+        return HTTPException(status_code=504, detail="Transcription deadline exceeded")
+    return HTTPException(status_code=499, detail=f"Transcription {error.reason}")
+
+def _slice_time_range(audio, time_range: tuple = None):
+    """从整段PCM中截取时间窗口，内存映射数组的切片不复制数据"""
+    if time_range is None:
+        return audio
+    start, end = time_range
+    first = int(round(start * settings.AUDIO_SAMPLE_RATE))
+    last = None if end is None else int(round(end * settings.AUDIO_SAMPLE_RATE))
+    return audio[first:last]
+
+def _episode_key(episode: str, default: str = None, time_range: tuple = None):
+    """确定增量转录使用的节目标识
+    
+    只转录时间窗口时不参与增量转录，避免以部分片段覆盖节目的片段记录。
+    
+    Args:
+        episode: 请求指定的节目标识
+        default: 未指定时使用的标识，如本地文件路径；上传的文件名（如 audio.mp3）不能区分节目，不作为默认标识
+        time_range: 只转录的时间窗口
+        
+    Returns:
+        str: 节目标识，不做增量转录时为 None
+    """
+    if time_range is not None:
+        return None
+    return episode or default
+
+def _transcribe_audio(audio, options: dict = None, job=None, cache_key: str = None, offset: float = 0.0,
+                      episode: str = None, resumed: list = None) -> list:
+    """对解码后的PCM进行识别并分离说话人
+    
+    长音频按静音切分为片段后经由微批处理层并行推理，结果按时间顺序拼接；
+    与指纹库吻合的重复片段、与上一版本相同的片段跳过推理，复用统计写入任务的 metadata["reuse"]。
+    识别过程中句子带临时说话人推送给任务的订阅者，全部完成后基于说话人嵌入重新分配说话人。
+    任务被取消时在片段边界停止，不再分离说话人。
+    记录在任务库中的长任务另存PCM，每完成一个片段就写入该片段的句子，服务重启后从第一个未完成的片段继续。
+    指定模型时先在工作线程中按需加载，识别期间持有该模型，不会被其他模型挤出内存。
+    
+    Args:
+        audio: 16kHz单声道float32 PCM数组
+        options: 识别参数，包含 hotwords、language、itn、model
+        job: 所属的转录任务，用于上报进度和推送句子
+        cache_key: 转录缓存键，提供时结果写入缓存
+        offset: 音频在源文件中的起始时间（秒），结果时间为源文件中的绝对时间
+        episode: 节目标识，与该节目上一版本内容相同的片段复用上一版本的文本
+        resumed: 续转时任务库中已完成片段的句子，每个片段一个列表
+        
+    Returns:
+        list: 带有说话人和时间的转录结果
+    """
+    transcription = [item for items in resumed or [] for item in items]
+    checkpoint = (job is not None and job.persistent
+                  and len(audio) > settings.JOB_CHECKPOINT_MIN_SECONDS * settings.AUDIO_SAMPLE_RATE)
+    if checkpoint and resumed is None:
+        job_store.save_audio(job.id, audio)
+    chunk_items = []
+    
+    def report(done, total):
+        if job is not None:
+            job.set_progress(5 + 85 * done / total)
+        if checkpoint:
+            # 片段按时间顺序完成，chunk_items 为第 done 个片段产生的句子
+            job_store.add_chunk(job.id, done - 1, chunk_items, job.progress)
+            chunk_items.clear()
+    
+    def handle(segment):
+        items = speaker_service.assign_speakers([segment], turn_offset=len(transcription))
+        transcription.extend(items)
+        chunk_items.extend(items)
+        if job is not None:
+            for item in items:
+                job.publish(item)
+    
+    reuse = {}
+    cancel_token = job.cancel_token if job is not None else None
+    model = (options or {}).get("model")
+    if model is not None:
+        model_registry.acquire(model)
+    try:
+        transcription_pipeline.transcribe(audio, options, progress=report, on_segment=handle,
+                                          skip_chunks=len(resumed or []), offset=offset, report=reuse,
+                                          episode=episode, cancel_token=cancel_token,
+                                          priority=job.priority if job is not None else None)
+    finally:
+        if model is not None:
+            model_registry.release(model)
+    if job is not None:
+        job.metadata["reuse"] = reuse
+    # 模拟模型的输出不做说话人分离，也不写入缓存；按需加载的模型加载失败时已抛出异常
+    if model is None and not model_service.is_ready():
+        return transcription
+    if cancel_token is not None:
+        cancel_token.check()
+    transcription = speaker_service.diarize(audio, transcription, offset)
+    if cache_key is not None:
+        transcription_cache.put(cache_key, transcription)
+    return transcription
+
+def _submit_job(audio, options: dict = None, metadata: dict = None, cache_key: str = None, on_segment=None,
+                offset: float = 0.0, episode: str = None, cancel_token: CancelToken = None,
+                priority: str = "normal", background: bool = False):
+    """将转录任务提交到任务队列，相同内容和参数的任务尚未结束时附着到该任务
+    
+    缓存键由内容哈希、识别参数和时间窗口决定，解码参数全局一致；
+    附着的请求不再推理，与先到的请求共用结果，句子从头补发给 on_segment。
+    异步任务的状态和结果通过 /jobs/{job_id} 查询，可能由其他工作进程读取，一律记录在任务库中；
+    同步返回结果的请求只有可续转的长任务才记录，且不写入结果，短请求不产生任何任务库写入。
+    
+    Args:
+        audio: 16kHz单声道float32 PCM数组
+        options: 识别参数，包含 hotwords、language、itn
+        metadata: 任务附加信息
+        cache_key: 转录缓存键，同时作为合并相同请求的键
+        on_segment: 句子回调，在工作线程中调用
+        offset: 音频在源文件中的起始时间（秒）
+        episode: 节目标识，用于增量转录
+        cancel_token: 任务的取消令牌，携带异步任务的截止时间；同步接口由 _await_job 检查请求的令牌
+        priority: 调度优先级，决定任务出队和片段推理的先后
+        background: 是否为异步任务
+        
+    Returns:
+        TranscriptionJob: 已提交或附着的任务
+        
+    Raises:
+        HTTPException: 队列已满时抛出503
+    """
+    job = job_manager.attach(cache_key, priority) if cache_key is not None else None
+    if job is None:
+        record = None
+        if background or len(audio) > settings.JOB_CHECKPOINT_MIN_SECONDS * settings.AUDIO_SAMPLE_RATE:
+            # 续转所需的请求参数，缓存键由源文件哈希、识别参数和时间窗口决定
+            record = {
+                "options": options,
+                "cache_key": cache_key,
+                "offset": offset,
+                "episode": episode,
+                "sample_rate": settings.AUDIO_SAMPLE_RATE,
+                "channels": settings.AUDIO_CHANNELS,
+                "samples": len(audio),
+                "background": background
+            }
+        try:
+            job = job_manager.submit(
+                lambda job: _transcribe_audio(audio, options, job, cache_key, offset, episode), metadata,
+                cancel_token, priority, record, key=cache_key, store_result=background
+            )
+        except queue.Full:
+            raise HTTPException(status_code=503, detail="Transcription queue is full, please retry later")
+    if on_segment is not None:
+        job.subscribe(on_segment)
+    return job
+
+def resume_jobs() -> int:
+    """接管上次运行中断的任务：等待模型加载完成后，从任务库读取已完成片段的句子，从第一个未完成的片段继续
+    
+    没有保存PCM的短任务、解码参数与当前配置不一致或所选模型已不在配置中的任务无法续转，标记为失败。
+    
+    Returns:
+        int: 续转的任务数
+    """
+    model_service.wait_until_loaded()
+    if not model_service.is_ready():
+        # 模拟模型的输出不能作为续转结果，保留到下次启动
+        return 0
+    
+    resumed = 0
+    for record in job_store.claim_unfinished():
+        request = record["request"]
+        # 时间窗口任务可能引用整段缓存音频，按时间偏移截取，与 _slice_time_range 一致
+        start = int(round((request.get("offset") or 0.0) * settings.AUDIO_SAMPLE_RATE))
+        audio = job_store.load_audio(record["id"], start, request["samples"])
+        model = (request.get("options") or {}).get("model")
+        if (audio is None or len(audio) != request["samples"]
+                or (request["sample_rate"], request["channels"]) != (settings.AUDIO_SAMPLE_RATE, settings.AUDIO_CHANNELS)
+                or (model is not None and not model_registry.has(model))):
+            job_store.fail(record["id"], "Interrupted by server restart")
+            continue
+        chunks = job_store.load_chunks(record["id"])
+        metadata = dict(record["metadata"], resumed_chunks=len(chunks))
+        try:
+            job_manager.submit(
+                lambda job, audio=audio, request=request, chunks=chunks: _transcribe_audio(
+                    audio, request["options"], job, request["cache_key"], offset=request["offset"],
+                    episode=request["episode"], resumed=chunks
+                ),
+                metadata, priority=record["priority"], record=request, job_id=record["id"],
+                key=request["cache_key"], store_result=request.get("background", True)
+            )
+        except queue.Full:
+            job_store.fail(record["id"], "Transcription queue is full")
+            continue
+        job_store.record_resumed()
+        resumed += 1
+        print(f"Resumed transcription job {record['id']} from chunk {len(chunks)}")
+    return resumed
+
+def _feed(decoder, hasher, chunk: bytes):
+    """写入一块音频字节并更新内容哈希"""
+    hasher.update(chunk)
+    decoder.feed(chunk)
+
+async def _ingest(chunks, options: dict = None, fallback=None, time_range: tuple = None,
+                  cancel_token: CancelToken = None) -> tuple:
+    """接收音频字节流：边接收边送入ffmpeg解码，同时计算内容哈希
+    
+    接收完毕后先查询转录缓存，再查询解码音频缓存，命中时直接终止解码；
+    未命中时等待解码完成并把PCM写入解码音频缓存。指定时间窗口时只解码窗口内的音频，
+    窗口PCM不写入解码音频缓存，但可以从已缓存的整段PCM中截取。
+    
+    Args:
+        chunks: 音频字节块的异步迭代器
+        options: 识别参数，参与缓存键计算
+        fallback: 管道解码失败时的备用解码函数
+        time_range: 只转录的时间窗口 (start, end)，由 parse_time_range 校验
+        cancel_token: 取消令牌，每收到一块数据检查一次，取消时终止ffmpeg
+        
+    Returns:
+        tuple: (audio, cache_key, cached)，命中缓存时 audio 为 None、cached 为缓存结果
+        
+    Raises:
+        Cancelled: 令牌已取消时抛出
+    """
+    hasher = hashlib.sha256()
+    head = bytearray()
+    decoder = None
+    
+    def open_decoder():
+        # 已是目标格式的PCM WAV走直通解码，不启动ffmpeg
+        return audio_processor.open_decoder(
+            sample_rate=settings.AUDIO_SAMPLE_RATE,
+            channels=settings.AUDIO_CHANNELS,
+            head=bytes(head),
+            start=time_range[0] if time_range else None,
+            end=time_range[1] if time_range else None
+        )
+    
+    try:
+        # 先缓冲文件开头探测WAV头，确定解码方式后再把缓冲的字节一并送入解码器
+        async for chunk in chunks:
+            if cancel_token is not None:
+                cancel_token.check()
+            if not chunk:
+                continue
+            if decoder is None:
+                head.extend(chunk)
+                if not audio_processor.header_probe_complete(head):
+                    continue
+                decoder = open_decoder()
+                chunk = bytes(head)
+            await run_in_threadpool(_feed, decoder, hasher, chunk)
+        if decoder is None:
+            decoder = open_decoder()
+            if head:
+                await run_in_threadpool(_feed, decoder, hasher, bytes(head))
+        
+        audio_hash = hasher.hexdigest()
+        cache_key = transcription_cache.make_key(audio_hash, options, time_range)
+        cached = transcription_cache.get(cache_key)
+        if cached is not None:
+            return None, cache_key, cached
+        
+        # 同一音频换识别参数重新转录时，直接映射已解码的PCM
+        audio_key = audio_cache.make_key(audio_hash)
+        audio = await run_in_threadpool(audio_cache.get, audio_key)
+        if audio is not None:
+            return _slice_time_range(audio, time_range), cache_key, None
+        
+        try:
+            audio = await run_in_threadpool(decoder.finish, cancel_token)
+        except HTTPException:
+            if fallback is None:
+                raise
+            audio = await run_in_threadpool(fallback)
+        if time_range is None:
+            await run_in_threadpool(audio_cache.put, audio_key, audio)
+        return audio, cache_key, None
+    finally:
+        if decoder is not None:
+            decoder.abort()
+
+async def _iter_upload(file: UploadFile):
+    """按块读取上传文件"""
+    while True:
+        chunk = await file.read(settings.STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+async def _ingest_upload(file: UploadFile, options: dict = None, time_range: tuple = None,
+                         cancel_token: CancelToken = None) -> tuple:
+    """接收并解码上传文件，优先使用管道模式
+    
+    Args:
+        file: 上传的音频文件
+        options: 识别参数，参与缓存键计算
+        time_range: 只转录的时间窗口 (start, end)
+        cancel_token: 取消令牌
+        
+    Returns:
+        tuple: (audio, cache_key, cached)，含义同 _ingest
+    """
+    fallback = None
+    # moov位于文件末尾的MP4类容器无法从管道解码，回退到基于文件的解码
+    if os.path.splitext(file.filename or "")[1].lower() in SEEKABLE_INPUT_FORMATS:
+        fallback = lambda: decode_spooled_upload(file, time_range, cancel_token)
+    return await _ingest(_iter_upload(file), options, fallback, time_range, cancel_token)
+
 @router.post("/transcribe")
-async def transcribe(file: UploadFile = File(...)):
+async def transcribe(request: Request, file: UploadFile = File(...), hotwords: str = None, language: str = None,
+                     itn: bool = None, start: float = None, end: float = None, episode: str = None,
+                     timeout: float = None, priority: str = None, model: str = None):
     """语音识别API，将音频文件转录为文本并区分说话人
     
+    上传内容通过管道直接送入ffmpeg，解码为内存中的PCM后交给模型，不写中间文件。
+    
     Args:
+        request: 请求对象，用于检测客户端断开
         file: 上传的音频文件
+        hotwords: 逗号分隔的热词，默认使用配置
+        language: 识别语言，默认使用配置
+        itn: 是否进行数字转换，默认使用配置
+        start: 只转录该时间点（秒）之后的音频，结果时间戳仍为源文件中的绝对时间
+        end: 只转录该时间点（秒）之前的音频
+        episode: 节目标识，同一节目重新上传剪辑后的版本时只推理新增或改动的片段，未指定时不做增量转录
+        timeout: 最长处理时间（秒），超时后停止推理并返回504；客户端断开时同样停止推理
+        priority: 调度优先级 interactive / normal / bulk，默认 interactive
+        model: 模型名称，可选值见 /stats 的 models.available，默认使用默认模型
         
     Returns:
-        dict: 转录结果，格式为 {"status": "success", "transcription": [{"speaker": "主持人", "text": "xxx"}, ...]}
+        dict: 转录结果，格式为 {"status": "success", "transcription": [{"speaker": "主持人", "text": "xxx", "start": 0.0, "end": 3.2}, ...]}
     """
+    time_range = parse_time_range(start, end)
+    cancel_token = _parse_timeout(timeout)
+    priority = _parse_priority(priority, "interactive")
+    model = _parse_model(model)
     try:
-        # 保存上传的文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            shutil.copyfileobj(file.file, temp_file)
-            temp_file_path = temp_file.name
-        
-        # 转换为WAV格式
-        wav_path = audio_processor.convert_to_wav(
-            temp_file_path,
-            sample_rate=settings.AUDIO_SAMPLE_RATE,
-            channels=settings.AUDIO_CHANNELS
-        )
+        async with _watch_disconnect(request, cancel_token):
+            options = {"hotwords": _parse_hotwords(hotwords), "language": language, "itn": itn, "model": model}
+            audio, cache_key, transcription = await _ingest_upload(file, options, time_range, cancel_token)
+            if transcription is None:
+                job = _submit_job(audio, options, {"filename": file.filename}, cache_key,
+                                  offset=time_range[0] if time_range else 0.0,
+                                  episode=_episode_key(episode, time_range=time_range), priority=priority)
+                # 推理在工作线程中执行，事件循环只等待结果，其他请求不受影响
+                transcription = await _await_job(job, cancel_token)
+        
+        return {
+            "status": "success",
+            "transcription": transcription
+        }
+    except Cancelled as e:
+        raise _cancelled_error(e)
+    except HTTPException as e:
+        if e.status_code != 503:
+            raise HTTPException(status_code=500, detail=f"Transcription failed: {e.detail}")
+        raise
+    except Exception as e:
+        print(f"Transcription error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+
+@router.post("/transcribe/raw")
+async def transcribe_raw(request: Request, hotwords: str = None, language: str = None, itn: bool = None,
+                         start: float = None, end: float = None, episode: str = None, timeout: float = None,
+                         priority: str = None, model: str = None):
+    """流式上传的语音识别API，请求体为原始音频字节
+    
+    与multipart上传不同，请求体在到达时即被送入ffmpeg，解码与上传重叠进行。
+    
+    Args:
+        request: 请求体为音频文件内容（application/octet-stream）
+        hotwords: 逗号分隔的热词，默认使用配置
+        language: 识别语言，默认使用配置
+        itn: 是否进行数字转换，默认使用配置
+        start: 只转录该时间点（秒）之后的音频，结果时间戳仍为源文件中的绝对时间
+        end: 只转录该时间点（秒）之前的音频
+        episode: 节目标识，同一节目重新上传剪辑后的版本时只推理新增或改动的片段
+        timeout: 最长处理时间（秒），超时后停止推理并返回504；客户端断开时同样停止推理
+        priority: 调度优先级 interactive / normal / bulk，默认 interactive
+        model: 模型名称，可选值见 /stats 的 models.available，默认使用默认模型
+        
+    Returns:
+        dict: 转录结果，格式同 /transcribe
+    """
+    time_range = parse_time_range(start, end)
+    cancel_token = _parse_timeout(timeout)
+    priority = _parse_priority(priority, "interactive")
+    model = _parse_model(model)
+    try:
+        options = {"hotwords": _parse_hotwords(hotwords), "language": language, "itn": itn, "model": model}
+        # 上传过程中客户端断开时读取请求体即会失败，读完请求体后再检测断开
+        audio, cache_key, transcription = await _ingest(request.stream(), options, time_range=time_range,
+                                                        cancel_token=cancel_token)
+        if transcription is None:
+            async with _watch_disconnect(request, cancel_token):
+                job = _submit_job(audio, options, cache_key=cache_key, offset=time_range[0] if time_range else 0.0,
+                                  episode=_episode_key(episode, time_range=time_range), priority=priority)
+                transcription = await _await_job(job, cancel_token)
         
+        return {
+            "status": "success",
+            "transcription": transcription
+        }
+    except Cancelled as e:
+        raise _cancelled_error(e)
+    except HTTPException as e:
+        if e.status_code != 503:
+            raise HTTPException(status_code=500, detail=f"Transcription failed: {e.detail}")
+        raise
+    except Exception as e:
+        print(f"Transcription error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+
+def _resolve_local_path(path: str) -> str:
+    """校验本地文件位于允许的目录内
+    
+    符号链接和 .. 均先解析为真实路径再比较，避免越出允许的目录。
+    
+    Args:
+        path: 本地文件路径
+        
+    Returns:
+        str: 解析后的真实路径
+        
+    Raises:
+        HTTPException: 未配置允许目录或路径不在其中时返回403，文件不存在时返回404
+    """
+    real_path = os.path.realpath(path)
+    for allowed in settings.LOCAL_INGEST_DIRS:
+        allowed = os.path.realpath(allowed)
         try:
-            # 使用模型进行转录
-            text = model_service.transcribe(wav_path)
-            
-            # 分离说话人
-            transcription = speaker_service.separate_speakers(text)
-            
-            return {
-                "status": "success",
-                "transcription": transcription
-            }
-        finally:
-            # 清理临时文件
-            audio_processor.cleanup_temp_files([temp_file_path, wav_path])
+            if os.path.commonpath([real_path, allowed]) == allowed:
+                break
+        except ValueError:
+            # Windows 上位于不同盘符的路径无法比较，视为不在该目录内
+            continue
+    else:
+        raise HTTPException(status_code=403, detail="Path is not in an allowed directory")
+    if not os.path.isfile(real_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return real_path
+
+def _ingest_local(path: str, options: dict = None, time_range: tuple = None, cancel_token: CancelToken = None) -> tuple:
+    """在原位置读取本地音频：计算哈希后依次查询转录缓存、解码音频缓存，未命中时由ffmpeg直接读取文件解码
+    
+    指定时间窗口时ffmpeg在输入端定位，只读取窗口内的数据。
+    
+    Args:
+        path: 已校验的本地文件路径
+        options: 识别参数，参与缓存键计算
+        time_range: 只转录的时间窗口 (start, end)
+        cancel_token: 取消令牌，取消时终止ffmpeg
+        
+    Returns:
+        tuple: (audio, cache_key, cached)，含义同 _ingest
+    """
+    audio_hash = file_sha256(path)
+    cache_key = transcription_cache.make_key(audio_hash, options, time_range)
+    cached = transcription_cache.get(cache_key)
+    if cached is not None:
+        return None, cache_key, cached
+    
+    audio_key = audio_cache.make_key(audio_hash)
+    audio = audio_cache.get(audio_key)
+    if audio is not None:
+        return _slice_time_range(audio, time_range), cache_key, None
+    audio = audio_processor.decode_to_array(
+        path,
+        sample_rate=settings.AUDIO_SAMPLE_RATE,
+        channels=settings.AUDIO_CHANNELS,
+        start=time_range[0] if time_range else None,
+        end=time_range[1] if time_range else None,
+        cancel_token=cancel_token
+    )
+    if time_range is None:
+        audio_cache.put(audio_key, audio)
+    return audio, cache_key, None
+
+@router.post("/transcribe/local")
+async def transcribe_local(request: Request, path: str, hotwords: str = None, language: str = None,
+                           itn: bool = None, start: float = None, end: float = None, episode: str = None,
+                           timeout: float = None, priority: str = None, model: str = None):
+    """本地路径语音识别API，供同机运行的桌面应用使用
+    
+    直接在原位置读取文件，不经过HTTP上传，也不复制临时文件。路径必须位于 LOCAL_INGEST_DIRS 配置的目录内。
+    
+    Args:
+        request: 请求对象，用于检测客户端断开
+        path: 音频文件的本地路径
+        hotwords: 逗号分隔的热词，默认使用配置
+        language: 识别语言，默认使用配置
+        itn: 是否进行数字转换，默认使用配置
+        start: 只转录该时间点（秒）之后的音频，结果时间戳仍为源文件中的绝对时间
+        end: 只转录该时间点（秒）之前的音频
+        episode: 节目标识，同一节目重新上传剪辑后的版本时只推理新增或改动的片段，默认使用文件路径
+        timeout: 最长处理时间（秒），超时后停止推理并返回504；客户端断开时同样停止推理
+        priority: 调度优先级 interactive / normal / bulk，默认 interactive
+        model: 模型名称，可选值见 /stats 的 models.available，默认使用默认模型
+        
+    Returns:
+        dict: 转录结果，格式同 /transcribe
+    """
+    real_path = _resolve_local_path(path)
+    time_range = parse_time_range(start, end)
+    cancel_token = _parse_timeout(timeout)
+    priority = _parse_priority(priority, "interactive")
+    model = _parse_model(model)
+    try:
+        async with _watch_disconnect(request, cancel_token):
+            options = {"hotwords": _parse_hotwords(hotwords), "language": language, "itn": itn, "model": model}
+            audio, cache_key, transcription = await run_in_threadpool(_ingest_local, real_path, options, time_range,
+                                                                      cancel_token)
+            if transcription is None:
+                job = _submit_job(audio, options, {"filename": os.path.basename(real_path)}, cache_key,
+                                  offset=time_range[0] if time_range else 0.0,
+                                  episode=_episode_key(episode, real_path, time_range), priority=priority)
+                transcription = await _await_job(job, cancel_token)
+        
+        return {
+            "status": "success",
+            "transcription": transcription
+        }
+    except Cancelled as e:
+        raise _cancelled_error(e)
+    except HTTPException as e:
+        if e.status_code != 503:
+            raise HTTPException(status_code=500, detail=f"Transcription failed: {e.detail}")
+        raise
+    except Exception as e:
+        print(f"Transcription error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+
+def _sse_event(event: str, data) -> str:
+    """格式化一条SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/transcribe/stream")
+async def transcribe_stream(request: Request, file: UploadFile = File(...), hotwords: str = None,
+                            language: str = None, itn: bool = None, start: float = None, end: float = None,
+                            episode: str = None, timeout: float = None, priority: str = None, model: str = None):
+    """流式转录API，通过SSE在每个片段识别完成后立即推送结果
+    
+    事件类型：
+        - segment: 单句结果 {"speaker": "主持人", "text": "xxx", "start": 0.0, "end": 3.2}，speaker 为临时标注
+        - speakers: 说话人分离完成后各句的最终说话人 {"speakers": ["主持人", "嘉宾", ...]}，与 segment 事件一一对应
+        - summary: 结束汇总 {"status": "success", "segments": 句子数, "duration": 音频时长, "elapsed": 总耗时, "time_to_first_segment": 首句延迟, "inference_seconds_saved": 复用已识别片段节省的推理时长}
+        - error: 转录失败或超时 {"status": "error", "detail": "xxx"}
     
+    客户端断开连接时停止推理。
+    
+    Args:
+        request: 请求对象，用于检测客户端断开
+        file: 上传的音频文件
+        hotwords: 逗号分隔的热词，默认使用配置
+        language: 识别语言，默认使用配置
+        itn: 是否进行数字转换，默认使用配置
+        start: 只转录该时间点（秒）之后的音频，结果时间戳仍为源文件中的绝对时间
+        end: 只转录该时间点（秒）之前的音频
+        episode: 节目标识，同一节目重新上传剪辑后的版本时只推理新增或改动的片段，未指定时不做增量转录
+        timeout: 最长处理时间（秒），超时后停止推理并推送 error 事件
+        priority: 调度优先级 interactive / normal / bulk，默认 interactive
+        model: 模型名称，可选值见 /stats 的 models.available，默认使用默认模型
+        
+    Returns:
+        StreamingResponse: text/event-stream 响应
+    """
+    started = time.perf_counter()
+    time_range = parse_time_range(start, end)
+    offset = time_range[0] if time_range else 0.0
+    cancel_token = _parse_timeout(timeout)
+    priority = _parse_priority(priority, "interactive")
+    model = _parse_model(model)
+    try:
+        options = {"hotwords": _parse_hotwords(hotwords), "language": language, "itn": itn, "model": model}
+        async with _watch_disconnect(request, cancel_token):
+            audio, cache_key, cached = await _ingest_upload(file, options, time_range, cancel_token)
+        
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        job = None
+        on_segment = lambda item: loop.call_soon_threadsafe(events.put_nowait, item)
+        if cached is None:
+            # 工作线程中产生的句子通过事件循环线程安全地放入队列，任务结束时放入 None 作为结束标记
+            job = _submit_job(
+                audio, options, {"filename": file.filename, "stream": True}, cache_key, on_segment=on_segment,
+                offset=offset, episode=_episode_key(episode, time_range=time_range), priority=priority
+            )
+            job.future.add_done_callback(lambda _: loop.call_soon_threadsafe(events.put_nowait, None))
+            duration = len(audio) / settings.AUDIO_SAMPLE_RATE
+        else:
+            for item in cached:
+                events.put_nowait(item)
+            events.put_nowait(None)
+            duration = cached[-1]["end"] - offset if cached else 0.0
+    except Cancelled as e:
+        raise _cancelled_error(e)
+    except HTTPException as e:
+        if e.status_code != 503:
+            raise HTTPException(status_code=500, detail=f"Transcription failed: {e.detail}")
+        raise
     except Exception as e:
         print(f"Transcription error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+    
+    async def event_stream():
+        count = 0
+        first_segment_at = None
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(events.get(), timeout=settings.DISCONNECT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    if cancel_token.cancelled:
+                        break
+                    continue
+                if item is None:
+                    break
+                if first_segment_at is None:
+                    first_segment_at = time.perf_counter() - started
+                count += 1
+                yield _sse_event("segment", item)
+        finally:
+            # 客户端断开时生成器被取消，没有其他请求共用任务时停止仍在进行的推理
+            if job is not None and not job.future.done():
+                job.unsubscribe(on_segment)
+                job_manager.release(job, cancel_token.reason or "disconnected")
+        
+        if job is not None and (not job.future.done() or job.future.exception() is not None):
+            error = job.future.exception() if job.future.done() else Cancelled(cancel_token.reason)
+            detail = _cancelled_error(error).detail if isinstance(error, Cancelled) else \
+                f"Transcription failed: {getattr(error, 'detail', error)}"
+            yield _sse_event("error", {"status": "error", "detail": detail})
+            return
+        saved = 0.0
+        if job is not None:
+            yield _sse_event("speakers", {"speakers": [item["speaker"] for item in job.future.result()]})
+            saved = job.metadata.get("reuse", {}).get("inference_seconds_saved", 0.0)
+        yield _sse_event("summary", {
+            "status": "success",
+            "segments": count,
+            "duration": round(duration, 3),
+            "elapsed": round(time.perf_counter() - started, 3),
+            "time_to_first_segment": round(first_segment_at, 3) if first_segment_at is not None else None,
+            "cached": job is None,
+            "inference_seconds_saved": saved
+        })
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def _decode_pcm_frame(data: bytes, pcm_format: str) -> np.ndarray:
+    """将WebSocket收到的原始PCM帧转换为float32数组
+    
+    Args:
+        data: 原始PCM字节
+        pcm_format: s16le（16位整型）或 f32le（32位浮点）
+        
+    Returns:
+        np.ndarray: float32 PCM 采样数组
+    """
+    if pcm_format == "f32le":
+        return np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+    samples = np.frombuffer(data[:len(data) - len(data) % 2], dtype=np.int16)
+    return samples.astype(np.float32) / 32768.0
+
+def _is_end_message(text: str) -> bool:
+    """判断文本消息是否为结束指令（"end" 或 {"type": "end"}）"""
+    if text.strip() == "end":
+        return True
+    try:
+        return json.loads(text).get("type") == "end"
+    except (ValueError, AttributeError):
+        return False
+
+@router.websocket("/stream/ws")
+async def stream_ws(websocket: WebSocket, format: str = "s16le"):
+    """实时流式识别WebSocket接口
+    
+    客户端以二进制消息发送16kHz单声道PCM帧，发送 "end" 结束会话。服务端返回JSON消息：
+        - {"type": "ready"}: 模型就绪，可以开始发送音频
+        - {"type": "partial", "text": "xxx"}: 当前句子的实时识别结果
+        - {"type": "final", "text": "xxx", "start": 0.0, "end": 3.2}: 检测到句末静音后的最终结果
+        - {"type": "end"}: 会话结束
+        - {"type": "error", "detail": "xxx"}: 出错
+    
+    Args:
+        websocket: WebSocket连接
+        format: PCM格式，s16le 或 f32le
+    """
+    await websocket.accept()
+    if format not in ("s16le", "f32le"):
+        await websocket.send_json({"type": "error", "detail": "Unsupported PCM format, use s16le or f32le"})
+        await websocket.close(code=1003)
+        return
+    if not streaming_asr_service.try_acquire():
+        await websocket.send_json({"type": "error", "detail": "Too many concurrent streams, please retry later"})
+        await websocket.close(code=1013)
+        return
+    
+    receiver = None
+    try:
+        try:
+            await run_in_threadpool(streaming_asr_service.load_model)
+        except RuntimeError as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close(code=1011)
+            return
+        
+        session = streaming_asr_service.create_session()
+        frames = asyncio.Queue(maxsize=settings.STREAMING_MAX_QUEUED_FRAMES)
+        
+        async def receive():
+            try:
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        break
+                    if message.get("bytes") is not None:
+                        # 队列已满时在此等待而不再读取socket，背压经TCP传导给客户端
+                        await frames.put(message["bytes"])
+                    elif message.get("text") is not None and _is_end_message(message["text"]):
+                        break
+            finally:
+                await frames.put(None)
+        
+        receiver = asyncio.create_task(receive())
+        await websocket.send_json({"type": "ready"})
+        while True:
+            data = await frames.get()
+            if data is None:
+                break
+            events = await run_in_threadpool(session.accept, _decode_pcm_frame(data, format))
+            for event in events:
+                await websocket.send_json(event)
+        
+        for event in await run_in_threadpool(session.finish):
+            await websocket.send_json(event)
+        await websocket.send_json({"type": "end"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        # 客户端已断开，丢弃剩余结果
+        pass
+    except Exception as e:
+        print(f"Streaming recognition error: {e}")
+        try:
+            await websocket.send_json({"type": "error", "detail": f"Streaming recognition failed: {e}"})
+            await websocket.close(code=1011)
+        except (WebSocketDisconnect, RuntimeError):
+            # 连接已关闭，无法告知客户端
+            pass
+    finally:
+        if receiver is not None:
+            receiver.cancel()
+        streaming_asr_service.release()
+
+@router.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...), hotwords: str = None, language: str = None, itn: bool = None,
+                     start: float = None, end: float = None, episode: str = None, timeout: float = None,
+                     priority: str = None, model: str = None):
+    """提交异步转录任务，立即返回任务ID
+    
+    Args:
+        file: 上传的音频文件
+        hotwords: 逗号分隔的热词，默认使用配置
+        language: 识别语言，默认使用配置
+        itn: 是否进行数字转换，默认使用配置
+        start: 只转录该时间点（秒）之后的音频，结果时间戳仍为源文件中的绝对时间
+        end: 只转录该时间点（秒）之前的音频
+        episode: 节目标识，同一节目重新上传剪辑后的版本时只推理新增或改动的片段，未指定时不做增量转录
+        timeout: 最长处理时间（秒），超时后任务状态为 cancelled
+        priority: 调度优先级 interactive / normal / bulk，默认 normal
+        model: 模型名称，可选值见 /stats 的 models.available，默认使用默认模型
+        
+    Returns:
+        dict: {"status": "success", "job_id": "xxx", "state": "queued"}，相同内容和参数的任务尚未结束时返回该任务的ID
+    """
+    time_range = parse_time_range(start, end)
+    cancel_token = _parse_timeout(timeout)
+    priority = _parse_priority(priority, "normal")
+    model = _parse_model(model)
+    try:
+        options = {"hotwords": _parse_hotwords(hotwords), "language": language, "itn": itn, "model": model}
+        audio, cache_key, cached = await _ingest_upload(file, options, time_range, cancel_token)
+        if cached is not None:
+            job = job_manager.add_completed(cached, {"filename": file.filename, "cached": True})
+        else:
+            job = _submit_job(audio, options, {"filename": file.filename}, cache_key,
+                              offset=time_range[0] if time_range else 0.0,
+                              episode=_episode_key(episode, time_range=time_range), cancel_token=cancel_token,
+                              priority=priority, background=True)
+        
+        return {
+            "status": "success",
+            "job_id": job.id,
+            "state": job.state
+        }
+    except Cancelled as e:
+        raise _cancelled_error(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Job submission error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Job submission failed: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询转录任务的状态、进度和结果
+    
+    Args:
+        job_id: 任务ID
+        
+    Returns:
+        dict: 任务状态，包含 state、progress、queue_wait、run_time，完成后包含 result
+    """
+    job = job_manager.get(job_id)
+    # 重启前结束的任务和其他工作进程的任务从任务库读取
+    data = job.to_dict() if job is not None else job_store.get(job_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "status": "success",
+        "job": data
+    }
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """取消转录任务，排队中的任务不再执行，运行中的任务在下一个片段边界停止
+    
+    相同请求合并到同一任务时，只撤回本次提交；最后一个提交撤回后任务才取消。
+    
+    Args:
+        job_id: 任务ID
+        
+    Returns:
+        dict: 取消后的任务状态
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "status": "success",
+        "job": job.to_dict()
+    }
+
+@router.get("/stats")
+async def get_stats():
+    """转录子系统统计信息，包含队列深度、工作线程占用和任务耗时
+    
+    Returns:
+        dict: 统计信息
+    """
+    return {
+        "status": "success",
+        "jobs": job_manager.stats(),
+        "batching": batcher.stats(),
+        "cache": transcription_cache.stats(),
+        "audio_cache": audio_cache.stats(),
+        "ingest": audio_processor.ingest_stats(),
+        "diarization": {**speaker_service.stats(), "registry": speaker_registry.stats()},
+        "fingerprints": fingerprint_index.stats(),
+        "incremental": episode_chunks.stats(),
+        "job_store": job_store.stats(),
+        "models": model_registry.stats(),
+        "streaming": streaming_asr_service.stats()
+    }
+
+@router.delete("/cache")
+async def purge_cache():
+    """清空转录结果缓存和解码音频缓存（管理接口）
+    
+    Returns:
+        dict: {"status": "success", "removed": 删除的转录结果条目数, "removed_audio": 删除的解码音频条目数}
+    """
+    removed = await run_in_threadpool(transcription_cache.purge)
+    removed_audio = await run_in_threadpool(audio_cache.purge)
+    return {
+        "status": "success",
+        "removed": removed,
+        "removed_audio": removed_audio
+    }
 
 @router.get("/health")
 async def health_check():
     """健康检查接口，用于检查服务是否正常运行
     
     Returns:
-        dict: 健康状态，格式为 {"status": "healthy", "model_loaded": True, "service": "xxx"}
+        dict: 健康状态，格式为 {"status": "healthy", "model_loaded": True, "model": {...}, "service": "xxx"}
     """
     return {
         "status": "healthy",
         "model_loaded": model_service.model is not None,
+        "model": model_service.status(),
         "service": settings.PROJECT_NAME
     }
\ No newline at end of file
@@ -0,0 +1,56 @@
+from fastapi import UploadFile, HTTPException
+from app.core.config import settings
+from app.utils.audio_processor import AudioProcessor
+from app.utils.cancellation import CancelToken
+import tempfile
+import os
+import shutil
+
+audio_processor = AudioProcessor()
+
+def parse_time_range(start: float = None, end: float = None):
+    """校验时间窗口参数
+    
+    Args:
+        start: 窗口起点（秒）
+        end: 窗口终点（秒）
+        
+    Returns:
+        tuple: (start, end)，end 为 None 表示到音频结尾；两者都未提供时返回 None
+        
+    Raises:
+        HTTPException: 参数为负数或终点不晚于起点时返回400
+    """
+    if start is None and end is None:
+        return None
+    start = start or 0.0
+    if start < 0 or (end is not None and end <= start):
+        raise HTTPException(status_code=400, detail="Invalid time range: require 0 <= start < end")
+    return start, end
+
+def decode_spooled_upload(file: UploadFile, time_range: tuple = None, cancel_token: CancelToken = None):
+    """将已缓存的上传文件写入临时文件后解码，用于无法从管道解码的容器格式
+    
+    Args:
+        file: 上传的音频文件
+        time_range: 只解码的时间窗口 (start, end)
+        cancel_token: 取消令牌，取消时终止ffmpeg，临时文件随即删除
+        
+    Returns:
+        np.ndarray: float32 PCM 采样数组
+    """
+    file.file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename or "")[1]) as temp_file:
+        shutil.copyfileobj(file.file, temp_file)
+        temp_file_path = temp_file.name
+    try:
+        return audio_processor.decode_to_array(
+            temp_file_path,
+            sample_rate=settings.AUDIO_SAMPLE_RATE,
+            channels=settings.AUDIO_CHANNELS,
+            start=time_range[0] if time_range else None,
+            end=time_range[1] if time_range else None,
+            cancel_token=cancel_token
+        )
+    finally:
+        audio_processor.cleanup_temp_files([temp_file_path])
@@ -6,9 +6,26 @@ class Settings:
     TRUST_REMOTE_CODE: bool = True
     REMOTE_CODE: bool = None
     DISABLE_UPDATE: bool = True
+    # 可按请求选择的其他模型，格式为 name=模型目录，多个以逗号分隔；default 为上面配置的默认模型
+    MODELS: dict = dict(
+        (name.strip(), model_dir.strip())
+        for name, _, model_dir in (item.partition("=") for item in os.environ.get("MODELS", "").split(","))
+        if name.strip() and model_dir.strip() and name.strip() != "default"
+    )
+    MODEL_RAM_BUDGET_MB: int = int(os.environ.get("MODEL_RAM_BUDGET_MB", "0"))  # 按需加载的模型常驻内存上限（MB），超过时卸载最久未使用的模型，0为不限
     
     # 设备配置
     DEVICE: str = "cuda:0" if os.environ.get("USE_GPU", "False").lower() == "true" else "cpu"
+    NCPU: int = int(os.environ.get("NCPU", str(os.cpu_count() or 4)))  # CPU推理使用的线程数
+    MODEL_BACKEND: str = os.environ.get("MODEL_BACKEND", "torch").lower()  # torch（funasr.AutoModel）/ onnx（onnxruntime）
+    MODEL_QUANTIZE: str = os.environ.get("MODEL_QUANTIZE", "none").lower()  # none / int8（CPU推理时对线性层做动态INT8量化）
+    
+    # ONNX Runtime 推理配置（MODEL_BACKEND=onnx 时生效）
+    ONNX_MODEL_DIR: str = os.environ.get("ONNX_MODEL_DIR", "iic/speech_paraformer-large_asr_nat-zh-cn-16k-common-vocab8404-pytorch")
+    ONNX_CACHE_DIR: str = os.environ.get("ONNX_CACHE_DIR", os.path.join(os.getcwd(), "cache", "onnx"))  # 导出的ONNX图缓存目录
+    ONNX_INTRA_OP_THREADS: int = int(os.environ.get("ONNX_INTRA_OP_THREADS", str(os.cpu_count() or 4)))  # 算子内并行线程数
+    ONNX_INTER_OP_THREADS: int = int(os.environ.get("ONNX_INTER_OP_THREADS", "1"))  # 算子间并行线程数
+    ONNX_GRAPH_OPTIMIZATION: str = os.environ.get("ONNX_GRAPH_OPTIMIZATION", "all").lower()  # disable / basic / extended / all
     
     # 服务配置
     API_V1_STR: str = "/api/v1"
@@ -19,11 +36,93 @@ class Settings:
     AUDIO_SAMPLE_RATE: int = 16000
     AUDIO_CHANNELS: int = 1
     AUDIO_FORMAT: str = "wav"
+    STREAM_CHUNK_SIZE: int = 1024 * 1024  # 上传流送入ffmpeg的分块大小（字节）
+    # 允许按本地路径直接读取的目录（os.pathsep 分隔），为空时禁用本地路径转录
+    LOCAL_INGEST_DIRS: list = [path for path in os.environ.get("LOCAL_INGEST_DIRS", "").split(os.pathsep) if path]
     
     # 转录配置
-    BATCH_SIZE: int = 1
+    BATCH_SIZE: int = 1  # model.generate 的最小批大小
+    BATCH_MAX_SIZE: int = int(os.environ.get("BATCH_MAX_SIZE", "8"))  # 微批处理单批最多合并的请求数
+    BATCH_MAX_WAIT_MS: float = float(os.environ.get("BATCH_MAX_WAIT_MS", "10"))  # 微批处理的最长等待时间（毫秒）
     HOTWORDS: list = ["开放时间"]
     LANGUAGE: str = "中文"
     ITN: bool = True  # 数字转换
+    
+    # 长音频配置
+    LONG_AUDIO_SECONDS: float = 60  # 超过该时长的音频按静音切分后分片推理
+    VAD_MAX_CHUNK_SECONDS: float = 30  # 单个推理片段的最大时长
+    CHUNK_MAX_INFLIGHT: int = 16  # 单个任务同时在途的推理片段数
+    
+    # 实时流式识别配置
+    STREAMING_MODEL_DIR: str = os.environ.get("STREAMING_MODEL_DIR", "paraformer-zh-streaming")
+    STREAMING_MAX_SESSIONS: int = int(os.environ.get("STREAMING_MAX_SESSIONS", "4"))  # 并发流式会话上限
+    STREAMING_CHUNK_SIZE: list = [0, 10, 5]  # 流式块配置，10 * 60ms = 600ms
+    STREAMING_ENCODER_LOOK_BACK: int = 4
+    STREAMING_DECODER_LOOK_BACK: int = 1
+    STREAMING_ENDPOINT_SILENCE_MS: int = 800  # 尾部静音超过该时长时结束当前句子
+    STREAMING_SILENCE_DB: float = -45.0  # 静音判定阈值（dBFS）
+    STREAMING_MAX_QUEUED_FRAMES: int = 32  # 每个连接待处理音频帧上限，超过后暂停读取形成背压
+    
+    # 说话人分离配置：按语音窗口提取说话人嵌入后聚类
+    DIARIZATION_ENABLED: bool = os.environ.get("DIARIZATION_ENABLED", "true").lower() == "true"
+    DIARIZATION_MODEL_DIR: str = os.environ.get("DIARIZATION_MODEL_DIR", "iic/speech_campplus_sv_zh-cn_16k-common")
+    DIARIZATION_WINDOW_SECONDS: float = 1.5  # 嵌入窗口长度
+    DIARIZATION_STEP_SECONDS: float = 0.75  # 窗口步长
+    DIARIZATION_THRESHOLD: float = float(os.environ.get("DIARIZATION_THRESHOLD", "0.5"))  # 簇间平均余弦相似度低于该值时不再合并
+    DIARIZATION_NUM_SPEAKERS: int = int(os.environ.get("DIARIZATION_NUM_SPEAKERS", "0"))  # 已知说话人数，0为自动估计
+    DIARIZATION_MAX_MICRO_CLUSTERS: int = 256  # 凝聚聚类前的微簇数上限，决定两两相似度矩阵的大小
+    DIARIZATION_BLOCK_SIZE: int = 4096  # 分块计算相似度时每块的窗口数
+    DIARIZATION_BATCH_SIZE: int = 64  # 嵌入提取的批大小
+    
+    # 声纹库配置：聚类中心与已登记说话人的余弦相似度达到阈值时使用登记的名称
+    SPEAKER_REGISTRY_DIR: str = os.environ.get("SPEAKER_REGISTRY_DIR", os.path.join(os.getcwd(), "data", "speakers"))
+    SPEAKER_MATCH_THRESHOLD: float = float(os.environ.get("SPEAKER_MATCH_THRESHOLD", "0.6"))
+    
+    # 转录缓存配置
+    CACHE_ENABLED: bool = os.environ.get("TRANSCRIPTION_CACHE", "true").lower() == "true"
+    CACHE_DIR: str = os.environ.get("TRANSCRIPTION_CACHE_DIR", os.path.join(os.getcwd(), "cache", "transcriptions"))
+    CACHE_MAX_BYTES: int = int(os.environ.get("TRANSCRIPTION_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    
+    # 重复音频指纹配置：片头片尾、广告音乐等与已识别片段吻合时复用其文本，跳过推理
+    FINGERPRINT_ENABLED: bool = os.environ.get("FINGERPRINT_INDEX", "true").lower() == "true"
+    FINGERPRINT_DIR: str = os.environ.get("FINGERPRINT_DIR", os.path.join(os.getcwd(), "cache", "fingerprints"))
+    FINGERPRINT_EDGE_SECONDS: float = float(os.environ.get("FINGERPRINT_EDGE_SECONDS", "300"))  # 只处理开头和结尾该时长内的片段，0为整段
+    FINGERPRINT_MAX_HASHES: int = int(os.environ.get("FINGERPRINT_MAX_HASHES", "10000000"))  # 指纹库哈希总数上限，每个哈希占16字节，约 160MB
+    FINGERPRINT_MIN_MATCHES: int = 20  # 判定为同一片段所需的最少吻合哈希数
+    FINGERPRINT_MIN_RATIO: float = 0.8  # 吻合哈希同时占查询片段和已登记片段哈希数的最低比例
+    FINGERPRINT_MAX_DRIFT_SECONDS: float = 0.5  # 片段时长和对齐位置允许的偏差
+    FINGERPRINT_FLUSH_SECONDS: float = float(os.environ.get("FINGERPRINT_FLUSH_SECONDS", "60"))  # 指纹库写盘的最短间隔
+    
+    # 增量转录配置：长音频按内容定义的切分点分片，同一节目重新上传后内容未变的片段复用上一版本的文本
+    INCREMENTAL_ENABLED: bool = os.environ.get("INCREMENTAL_TRANSCRIPTION", "true").lower() == "true"
+    EPISODE_CHUNKS_DIR: str = os.environ.get("EPISODE_CHUNKS_DIR", os.path.join(os.getcwd(), "cache", "episodes"))
+    CDC_MIN_CHUNK_SECONDS: float = 10  # 内容定义切分的片段最短时长，最长时长同 VAD_MAX_CHUNK_SECONDS
+    
+    # 解码音频缓存配置：按源文件哈希保存解码后的PCM，重复转录时跳过ffmpeg
+    AUDIO_CACHE_ENABLED: bool = os.environ.get("DECODED_AUDIO_CACHE", "true").lower() == "true"
+    AUDIO_CACHE_DIR: str = os.environ.get("DECODED_AUDIO_CACHE_DIR", os.path.join(os.getcwd(), "cache", "audio"))
+    AUDIO_CACHE_MAX_BYTES: int = int(os.environ.get("DECODED_AUDIO_CACHE_MAX_BYTES", str(4 * 1024 * 1024 * 1024)))
+    
+    # 任务队列配置
+    TRANSCRIPTION_WORKERS: int = int(os.environ.get("TRANSCRIPTION_WORKERS", "4"))  # 并发转录任务数，推理经由微批处理层串行合批
+    JOB_QUEUE_MAX_SIZE: int = int(os.environ.get("JOB_QUEUE_MAX_SIZE", "100"))  # 排队任务上限，0为不限
+    JOB_RETENTION_SECONDS: int = 3600  # 已结束任务的保留时间
+    
+    # 任务库配置：任务状态和长音频已完成片段的结果写入 SQLite，服务重启后从第一个未完成的片段继续
+    JOB_STORE_ENABLED: bool = os.environ.get("JOB_STORE", "true").lower() == "true"
+    JOB_STORE_DIR: str = os.environ.get("JOB_STORE_DIR", os.path.join(os.getcwd(), "data", "jobs"))
+    JOB_CHECKPOINT_MIN_SECONDS: float = 60  # 超过该时长的任务另存PCM并逐片段记录结果；较短的同步请求不记录，异步任务重启后标记为失败
+    
+    # 优先级调度配置：interactive > normal > bulk，任务队列和微批处理层都按优先级出队
+    PRIORITY_AGING_SECONDS: float = float(os.environ.get("PRIORITY_AGING_SECONDS", "30"))  # 排队每满该时长提升一级，0为不老化
+    INTERACTIVE_RESERVED_WORKERS: int = int(os.environ.get("INTERACTIVE_RESERVED_WORKERS", "1"))  # 只执行交互任务的工作线程数
+    
+    # 请求取消配置：客户端断开或超过截止时间后，在片段边界停止推理并终止ffmpeg
+    REQUEST_TIMEOUT_SECONDS: float = float(os.environ.get("REQUEST_TIMEOUT_SECONDS", "0"))  # 默认请求超时，0为不限
+    DISCONNECT_POLL_SECONDS: float = 0.5  # 检测客户端断开的间隔
+    
+    # 多进程服务配置
+    SERVER_WORKERS: int = int(os.environ.get("SERVER_WORKERS", "1"))  # 大于1时由父进程加载模型后派生工作进程共享权重
+    WORKER_HEARTBEAT_TIMEOUT: float = float(os.environ.get("WORKER_HEARTBEAT_TIMEOUT", "30"))  # 工作进程心跳超时（秒），超时后重启
 
 settings = Settings()
\ No newline at end of file
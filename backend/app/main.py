@@ -1,7 +1,15 @@
+import os
+import threading
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from app.api import api_router
+from app.api.v1.transcription import resume_jobs
 from app.core.config import settings
 from app.services.model_service import model_service
+from app.services.model_registry import model_registry
+from app.services.transcription_jobs import job_manager
+from app.services.batching import batcher
+from app.services.fingerprint_index import fingerprint_index
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -22,17 +30,53 @@ async def root():
         "version": settings.VERSION
     }
 
-# 启动事件：加载模型
+# 存活检查：进程能响应即返回200
+@app.get("/health/live")
+async def liveness():
+    return {
+        "status": "alive",
+        "service": settings.PROJECT_NAME,
+        "pid": os.getpid()
+    }
+
+# 就绪检查：真实模型加载完成才返回200，加载中或回退到模拟模型时返回503
+@app.get("/health/ready")
+async def readiness():
+    status = model_service.status()
+    if not model_service.is_ready():
+        return JSONResponse(status_code=503, content={"status": "not_ready", **status})
+    return {"status": "ready", **status}
+
+# 启动事件：在后台加载模型，不阻塞服务启动；多进程模式下模型已由父进程加载，直接跳过
 @app.on_event("startup")
 async def load_model():
-    model_service.load_model()
+    model_service.start_loading()
+
+# 启动事件：模型加载完成后在后台续转上次运行中断的任务
+@app.on_event("startup")
+async def resume_interrupted_jobs():
+    threading.Thread(target=resume_jobs, name="job-resume", daemon=True).start()
 
-# 关闭事件：卸载模型
+# 关闭事件：停止任务工作线程，撤回排队中的推理请求并卸载模型；中断的任务在重启后续转
 @app.on_event("shutdown")
 async def unload_model():
+    job_manager.shutdown()
+    batcher.shutdown()
+    # 指纹库按间隔写盘，退出前写入尚未保存的片段
+    fingerprint_index.flush(force=True)
+    model_registry.unload_all()
     model_service.unload_model()
 
 if __name__ == "__main__":
+    if settings.SERVER_WORKERS > 1:
+        from app.prefork import PreforkServer
+        PreforkServer(
+            host="0.0.0.0",
+            port=8000,
+            workers=settings.SERVER_WORKERS,
+            heartbeat_timeout=settings.WORKER_HEARTBEAT_TIMEOUT
+        ).run()
+        raise SystemExit(0)
     import uvicorn
     uvicorn.run(
         "app.main:app",
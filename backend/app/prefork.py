@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+多进程预派生服务：父进程加载一次模型后派生多个 uvicorn 工作进程
+
+子进程通过 fork 继承父进程已加载的模型，权重所在的内存页以写时复制方式共享，
+N 个工作进程不会占用 N 份模型内存。父进程负责监控心跳并重启异常退出或卡死的工作进程。
+
+用法:
+    python -m app.prefork --workers 4
+"""
+import argparse
+import asyncio
+import gc
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+import uvicorn
+from app.core.config import settings
+
+
+class PreforkServer:
+    """预加载模型并派生工作进程的服务器"""
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 8000, workers: int = 2,
+                 heartbeat_interval: float = 1.0, heartbeat_timeout: float = 30.0, shutdown_timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.shutdown_timeout = shutdown_timeout
+        self.children = {}  # pid -> 工作进程编号
+        self.restarts = [0] * workers
+        self.spawned_at = [0.0] * workers
+        self.next_spawn_at = [0.0] * workers
+        self.stopping = False
+        self.socket = None
+        self.app = None
+        # 共享内存中的心跳时间戳，每个工作进程一个槽位
+        self.heartbeats = multiprocessing.Array("d", workers, lock=False)
+
+    def run(self):
+        """加载模型、监听端口、派生工作进程并进入监控循环"""
+        if not hasattr(os, "fork"):
+            raise RuntimeError("Prefork serving requires a POSIX system with os.fork")
+
+        # 在父进程中导入应用并同步加载模型，子进程直接继承
+        from app.main import app
+        from app.services.model_service import model_service
+        self.app = app
+        if not model_service.load_model():
+            # 加载失败时每个工作进程都会各自重试加载，失去共享权重的意义
+            raise RuntimeError(f"Model loading failed in prefork parent: {model_service.load_error}")
+        # 说话人嵌入模型同样在父进程加载，失败时各进程保留临时说话人标注
+        from app.services.speaker_diarization import speaker_service
+        if speaker_service.enabled:
+            speaker_service.load_model()
+
+        # 冻结现有对象，避免子进程的垃圾回收触碰模型对象的引用计数页而触发复制
+        gc.collect()
+        gc.freeze()
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(2048)
+        self.socket.set_inheritable(True)
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        print(f"Prefork server listening on {self.host}:{self.port} with {self.workers} workers")
+        for index in range(self.workers):
+            self._spawn(index)
+
+        try:
+            self._monitor()
+        finally:
+            self._shutdown()
+
+    def status(self) -> list:
+        """获取各工作进程的状态
+
+        Returns:
+            list: [{"index": 0, "pid": 123, "heartbeat_age": 0.5, "restarts": 0}, ...]
+        """
+        pids = {index: pid for pid, index in self.children.items()}
+        now = time.time()
+        return [
+            {
+                "index": index,
+                "pid": pids.get(index),
+                "heartbeat_age": round(now - self.heartbeats[index], 3) if self.heartbeats[index] else None,
+                "restarts": self.restarts[index]
+            }
+            for index in range(self.workers)
+        ]
+
+    def _spawn(self, index: int):
+        """派生一个工作进程"""
+        self.spawned_at[index] = self.heartbeats[index] = time.time()
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(index)
+            os._exit(0)
+        self.children[pid] = index
+        print(f"Started worker {index} (pid {pid})")
+
+    def _run_worker(self, index: int):
+        """工作进程入口：在继承的套接字上运行 uvicorn，并定期写入心跳"""
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        # Ctrl+C 同时发给整个进程组，由父进程统一处理
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        # 每个工作进程平分CPU核心，避免推理线程超额订阅
+        try:
+            import torch
+            torch.set_num_threads(max(1, settings.NCPU // self.workers))
+        except ImportError:
+            pass
+
+        # 未完成的请求最多等待一半的关闭时限，留出时间执行应用的关闭钩子
+        config = uvicorn.Config(self.app, log_level="info", timeout_graceful_shutdown=self.shutdown_timeout / 2)
+        server = uvicorn.Server(config)
+        # 父进程以 SIGTERM 停止工作进程：交给 uvicorn 正常退出，执行关闭钩子（写入指纹库、更新任务库等）
+        server.install_signal_handlers = lambda: None
+        signal.signal(signal.SIGTERM, server.handle_exit)
+
+        async def heartbeat():
+            # 心跳在事件循环中写入，事件循环被阻塞时父进程能发现
+            while True:
+                self.heartbeats[index] = time.time()
+                await asyncio.sleep(self.heartbeat_interval)
+
+        async def serve():
+            beat = asyncio.create_task(heartbeat())
+            try:
+                await server.serve(sockets=[self.socket])
+            finally:
+                beat.cancel()
+
+        asyncio.run(serve())
+
+    def _monitor(self):
+        """监控循环：回收退出的工作进程并按退避策略重启，杀死心跳超时的工作进程"""
+        while not self.stopping:
+            self._reap()
+
+            now = time.time()
+            for pid, index in list(self.children.items()):
+                if now - self.heartbeats[index] > self.heartbeat_timeout:
+                    print(f"Worker {index} (pid {pid}) missed heartbeats, killing it")
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+
+            running = set(self.children.values())
+            for index in range(self.workers):
+                if index not in running and now >= self.next_spawn_at[index] and not self.stopping:
+                    self.restarts[index] += 1
+                    self._spawn(index)
+
+            time.sleep(self.heartbeat_interval)
+
+    def _reap(self):
+        """回收已退出的工作进程，启动后很快退出的进程延迟重启"""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self.children.pop(pid, None)
+            if index is None:
+                continue
+            # 正常运行时长为派生到最后一次心跳的时间，启动后即卡住、因心跳超时被杀死的进程也算快速崩溃
+            uptime = self.heartbeats[index] - self.spawned_at[index]
+            print(f"Worker {index} (pid {pid}) exited with status {status}")
+            if uptime >= 5:
+                # 稳定运行过的进程立即重启，退避从头计算
+                self.restarts[index] = 0
+                delay = 0.0
+            else:
+                # 连续快速崩溃时指数退避，最长30秒
+                delay = min(30.0, 2 ** min(self.restarts[index], 5))
+            self.next_spawn_at[index] = time.time() + delay
+
+    def _handle_stop(self, signum, frame):
+        """收到终止信号时停止监控循环"""
+        self.stopping = True
+
+    def _shutdown(self):
+        """终止全部工作进程并关闭套接字"""
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + self.shutdown_timeout
+        while self.children and time.time() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        if self.socket is not None:
+            self.socket.close()
+        print("Prefork server stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预加载模型的多进程服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    parser.add_argument("--heartbeat-timeout", type=float, default=settings.WORKER_HEARTBEAT_TIMEOUT)
+    args = parser.parse_args()
+
+    PreforkServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        heartbeat_timeout=args.heartbeat_timeout
+    ).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
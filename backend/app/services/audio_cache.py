@@ -0,0 +1,171 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from app.core.config import settings
+
+
+class DecodedAudioCache:
+    """解码后PCM的磁盘缓存，以内存映射方式读取
+
+    键为源文件内容哈希加目标采样率和声道数；同一音频换热词、语言重新转录时不再调用ffmpeg，
+    直接以零拷贝方式映射已解码的 float32 数组。按最近使用顺序淘汰，总大小不超过 max_bytes。
+    """
+
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index = None  # key -> 文件大小，按最近使用排序
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(audio_hash: str, sample_rate: int = None, channels: int = None) -> str:
+        """生成缓存键
+
+        Args:
+            audio_hash: 源文件内容的SHA-256
+            sample_rate: 解码采样率，默认使用配置
+            channels: 解码声道数，默认使用配置
+
+        Returns:
+            str: 缓存键
+        """
+        sample_rate = sample_rate or settings.AUDIO_SAMPLE_RATE
+        channels = channels or settings.AUDIO_CHANNELS
+        return f"{audio_hash}-{sample_rate}hz-{channels}ch"
+
+    def get(self, key: str):
+        """以只读内存映射方式打开缓存的PCM
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            np.memmap: float32 PCM数组，未命中时返回 None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                audio = np.load(path, mmap_mode="r")
+                os.utime(path)
+            except Exception as e:
+                print(f"Failed to read decoded audio cache {key}: {e}")
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, key: str, audio: np.ndarray):
+        """写入解码后的PCM，超出容量时淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            audio: float32 PCM数组
+        """
+        if not self.enabled or len(audio) == 0:
+            return
+        with self._lock:
+            self._load_index()
+            path = self._path(key)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(temp_path, "wb") as f:
+                    np.save(f, np.asarray(audio, dtype=np.float32))
+                os.replace(temp_path, path)
+            except Exception as e:
+                print(f"Failed to write decoded audio cache {key}: {e}")
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                return
+            size = os.path.getsize(path)
+            if key in self._index:
+                self._total_bytes -= self._index.pop(key)
+            self._index[key] = size
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                self._remove(next(iter(self._index)))
+                self.evictions += 1
+
+    def purge(self) -> int:
+        """清空缓存
+
+        Returns:
+            int: 删除的条目数
+        """
+        with self._lock:
+            self._load_index()
+            removed = len(self._index)
+            for key in list(self._index):
+                self._remove(key)
+            return removed
+
+    def stats(self) -> dict:
+        """获取缓存命中与容量统计
+
+        Returns:
+            dict: 统计信息
+        """
+        with self._lock:
+            self._load_index()
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._index),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+    def _path(self, key: str) -> str:
+        """缓存文件路径"""
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def _load_index(self):
+        """首次使用时扫描缓存目录，按修改时间重建最近使用顺序"""
+        if self._index is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npy"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(size for _, _, size in entries)
+
+    def _remove(self, key: str):
+        """删除单个缓存条目；已映射的数组在Linux上仍可继续读取"""
+        self._total_bytes -= self._index.pop(key, 0)
+        path = self._path(key)
+        try:
+            if os.path.exists(path):
+                os.unlink(path)
+        except OSError as e:
+            # Windows 上被映射的文件无法删除，留待下次淘汰
+            print(f"Failed to remove decoded audio cache {key}: {e}")
+
+
+# 创建全局解码音频缓存实例
+audio_cache = DecodedAudioCache(
+    directory=settings.AUDIO_CACHE_DIR,
+    max_bytes=settings.AUDIO_CACHE_MAX_BYTES,
+    enabled=settings.AUDIO_CACHE_ENABLED
+)
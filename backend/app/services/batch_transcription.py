@@ -0,0 +1,178 @@
+import json
+import os
+import time
+from app.core.config import settings
+from app.services.model_service import model_service
+from app.services.speaker_diarization import speaker_service
+from app.services.transcription_cache import transcription_cache
+from app.services.audio_cache import audio_cache
+from app.services.fingerprint_index import fingerprint_index
+from app.services.transcription_pipeline import transcription_pipeline
+from app.utils.audio_processor import AudioProcessor
+from app.utils.hashing import file_sha256
+
+# 批量转录时识别的音频扩展名
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".mp4", ".wav", ".flac", ".aac", ".ogg", ".opus", ".webm")
+
+
+def write_json_atomic(path: str, data):
+    """先写临时文件再重命名，进程中途退出不会留下半个文件"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def find_audio_files(input_dir: str, extensions: tuple = AUDIO_EXTENSIONS) -> list:
+    """递归查找目录下的音频文件
+
+    Args:
+        input_dir: 输入目录
+        extensions: 音频扩展名
+
+    Returns:
+        list: 相对于输入目录的路径，按名称排序
+    """
+    found = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                found.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return found
+
+
+class BatchManifest:
+    """批量转录清单：记录每个文件的大小、修改时间、哈希和状态，用于重复运行时跳过已完成的文件
+
+    状态：pending / partial（有检查点，可续转）/ completed / failed
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    def is_completed(self, relpath: str, source_path: str, transcript_path: str) -> bool:
+        """文件是否已转录完成且自上次转录后未修改
+
+        大小和修改时间与清单一致时不再重新计算哈希。
+        """
+        entry = self.files.get(relpath)
+        if not entry or entry.get("status") != "completed" or not os.path.exists(transcript_path):
+            return False
+        stat = os.stat(source_path)
+        if entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            return True
+        return entry.get("sha256") == file_sha256(source_path)
+
+    def update(self, relpath: str, **fields):
+        """更新单个文件的记录"""
+        self.files.setdefault(relpath, {}).update(fields)
+
+    def save(self):
+        """原子写入清单文件"""
+        write_json_atomic(self.path, {"files": self.files})
+
+    def counts(self) -> dict:
+        """按状态统计文件数"""
+        counts = {}
+        for entry in self.files.values():
+            counts[entry.get("status", "pending")] = counts.get(entry.get("status", "pending"), 0) + 1
+        return counts
+
+
+def transcribe_file(source_path: str, transcript_path: str, checkpoint_path: str, options: dict = None) -> dict:
+    """转录单个文件并写出转录稿，每完成一个片段就更新检查点
+
+    检查点记录已完成的片段数和结果；再次运行时若源文件哈希未变，从检查点之后的片段继续。
+
+    Args:
+        source_path: 音频文件路径
+        transcript_path: 转录稿输出路径（JSON）
+        checkpoint_path: 检查点路径
+        options: 识别参数，包含 hotwords、language、itn
+
+    Returns:
+        dict: {"status": "completed", "sha256", "duration", "elapsed", "resumed_chunks", "cached",
+               "inference_seconds_saved", "size", "mtime"}
+
+    Raises:
+        RuntimeError: 模型未就绪时抛出，避免把模拟结果写成转录稿
+    """
+    start = time.time()
+    stat = os.stat(source_path)
+    audio_hash = file_sha256(source_path)
+    cache_key = transcription_cache.make_key(audio_hash, options)
+
+    transcription = transcription_cache.get(cache_key)
+    cached = transcription is not None
+    duration = None
+    resumed_chunks = 0
+    reuse = {}
+    if not cached:
+        if not model_service.is_ready():
+            raise RuntimeError("Model is not loaded")
+
+        audio_key = audio_cache.make_key(audio_hash)
+        audio = audio_cache.get(audio_key)
+        if audio is None:
+            audio = AudioProcessor.decode_to_array(
+                source_path,
+                sample_rate=settings.AUDIO_SAMPLE_RATE,
+                channels=settings.AUDIO_CHANNELS
+            )
+            audio_cache.put(audio_key, audio)
+        duration = len(audio) / settings.AUDIO_SAMPLE_RATE
+
+        transcription = []
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("sha256") == audio_hash:
+                resumed_chunks = checkpoint["chunks_done"]
+                transcription = checkpoint["transcription"]
+
+        def handle(segment):
+            transcription.extend(speaker_service.assign_speakers([segment], turn_offset=len(transcription)))
+
+        def report(done, total):
+            # 片段按时间顺序完成，done 之前的片段结果都已写入 transcription
+            write_json_atomic(checkpoint_path, {
+                "sha256": audio_hash,
+                "chunks_done": done,
+                "chunks_total": total,
+                "transcription": transcription
+            })
+
+        transcription_pipeline.transcribe(audio, options, progress=report, on_segment=handle,
+                                          skip_chunks=resumed_chunks, report=reuse,
+                                          episode=os.path.abspath(source_path), priority="bulk")
+        transcription = speaker_service.diarize(audio, transcription)
+        transcription_cache.put(cache_key, transcription)
+        # 批量转录的工作进程随进程池结束，每个文件完成后立即写入指纹库
+        fingerprint_index.flush(force=True)
+
+    write_json_atomic(transcript_path, {
+        "source": os.path.basename(source_path),
+        "sha256": audio_hash,
+        "duration": round(duration, 3) if duration is not None else None,
+        "transcription": transcription
+    })
+    if os.path.exists(checkpoint_path):
+        os.unlink(checkpoint_path)
+
+    return {
+        "status": "completed",
+        "sha256": audio_hash,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "duration": round(duration, 3) if duration is not None else None,
+        "elapsed": round(time.time() - start, 3),
+        "resumed_chunks": resumed_chunks,
+        "cached": cached,
+        "inference_seconds_saved": reuse.get("inference_seconds_saved", 0.0)
+    }
@@ -0,0 +1,258 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from app.core.config import settings
+from app.services.model_registry import model_registry
+from app.services.model_service import model_service
+from app.utils.metrics import percentile
+from app.utils.priority import PRIORITY_CLASSES, effective_priority, priority_rank
+
+
+class _BatchRequest:
+    """等待合批的单个识别请求"""
+
+    def __init__(self, audio, key: tuple, priority: str = "normal"):
+        self.audio = audio
+        self.key = key
+        self.priority = priority
+        self.rank = priority_rank(priority)
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """动态微批处理：在短时间窗口内收集并发请求，合并为一次 model.generate 调用
+
+    只有模型、热词、语言和ITN设置完全相同的请求才会合入同一批次，结果按原顺序分发回各调用方。
+    调用方取消 Future 后，尚未开始推理的请求在组批时丢弃，不进入模型。
+
+    每个请求带有优先级（interactive / normal / bulk），老化后优先级最高的请求所在分组先出批，
+    长任务的片段逐个提交，交互请求最多等待正在执行的一个批次即可插队。
+    """
+
+    def __init__(self, service=None, max_batch_size: int = 8, max_wait_ms: float = 10, aging_seconds: float = 30,
+                 registry=None):
+        self.service = service or model_service
+        self.registry = registry or model_registry
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.aging_seconds = aging_seconds
+        self._groups = {}
+        self._condition = threading.Condition()
+        self._dispatcher = None
+        self._stopping = False
+
+        # 统计信息
+        self.total_requests = 0
+        self.total_batches = 0
+        self.cancelled_requests = 0
+        self.latencies = deque(maxlen=1000)
+        self.batch_sizes = deque(maxlen=1000)
+        self.completions = deque(maxlen=1000)
+        self.class_requests = {priority: 0 for priority in PRIORITY_CLASSES}
+        self.class_queue_waits = {priority: deque(maxlen=1000) for priority in PRIORITY_CLASSES}
+        self.class_latencies = {priority: deque(maxlen=1000) for priority in PRIORITY_CLASSES}
+
+    def submit(self, audio, hotwords: list = None, language: str = None, itn: bool = None,
+               priority: str = None, model: str = None) -> Future:
+        """提交识别请求
+
+        Args:
+            audio: 音频文件路径或PCM数组
+            hotwords: 热词列表，默认使用配置
+            language: 识别语言，默认使用配置
+            itn: 是否进行数字转换，默认使用配置
+            priority: 调度优先级 interactive / normal / bulk，默认 normal
+            model: 模型注册表中的模型名称，默认使用默认模型
+
+        Returns:
+            Future: 结果为识别文本
+
+        Raises:
+            ValueError: 未知的优先级
+        """
+        key = (
+            model,
+            tuple(settings.HOTWORDS if hotwords is None else hotwords),
+            settings.LANGUAGE if language is None else language,
+            settings.ITN if itn is None else itn
+        )
+        request = _BatchRequest(audio, key, priority or "normal")
+        with self._condition:
+            self._ensure_dispatcher()
+            self._groups.setdefault(key, []).append(request)
+            self.total_requests += 1
+            self.class_requests[request.priority] += 1
+            self._condition.notify()
+        return request.future
+
+    def transcribe(self, audio, hotwords: list = None, language: str = None, itn: bool = None,
+                   priority: str = None, model: str = None) -> str:
+        """提交识别请求并阻塞等待结果
+
+        Returns:
+            str: 识别结果文本
+        """
+        return self.submit(audio, hotwords, language, itn, priority, model).result()
+
+    def stats(self) -> dict:
+        """获取合批效果、吞吐量和延迟统计
+
+        Returns:
+            dict: 统计信息
+        """
+        # 调度线程在持有锁时写入统计，先在锁内复制一份再计算
+        with self._condition:
+            pending = sum(len(group) for group in self._groups.values())
+            class_pending = {priority: 0 for priority in PRIORITY_CLASSES}
+            for group in self._groups.values():
+                for request in group:
+                    class_pending[request.priority] += 1
+            latencies = sorted(self.latencies)
+            sizes = list(self.batch_sizes)
+            completions = list(self.completions)
+            total_requests = self.total_requests
+            total_batches = self.total_batches
+            cancelled_requests = self.cancelled_requests
+            classes = {
+                priority: self._class_stats(priority, class_pending[priority]) for priority in PRIORITY_CLASSES
+            }
+        throughput = 0.0
+        if len(completions) > 1 and completions[-1] > completions[0]:
+            throughput = (len(completions) - 1) / (completions[-1] - completions[0])
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "pending": pending,
+            "total_requests": total_requests,
+            "total_batches": total_batches,
+            "cancelled_requests": cancelled_requests,
+            "avg_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            "throughput_rps": round(throughput, 3),
+            "p50_latency_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p99_latency_ms": round(percentile(latencies, 99) * 1000, 1),
+            "priorities": classes
+        }
+
+    def _class_stats(self, priority: str, pending: int) -> dict:
+        """单个优先级的排队等待和端到端延迟统计，调用方需持有锁"""
+        waits = sorted(self.class_queue_waits[priority])
+        latencies = sorted(self.class_latencies[priority])
+        return {
+            "requests": self.class_requests[priority],
+            "pending": pending,
+            "p50_queue_wait_ms": round(percentile(waits, 50) * 1000, 1),
+            "p95_queue_wait_ms": round(percentile(waits, 95) * 1000, 1),
+            "p95_latency_ms": round(percentile(latencies, 95) * 1000, 1)
+        }
+
+    def shutdown(self, timeout: float = 5.0):
+        """停止调度线程：排队中的请求直接取消，不再推理，只等待正在执行的批次
+
+        服务关闭时排队的片段可能需要数分钟才能推理完；取消后等待结果的任务随之结束，
+        记录在任务库中的任务在重启后续转。
+
+        Args:
+            timeout: 等待正在执行的批次完成的最长时间（秒）
+        """
+        with self._condition:
+            self._stopping = True
+            pending = [request for group in self._groups.values() for request in group]
+            self._groups = {}
+            self.cancelled_requests += sum(1 for request in pending if request.future.cancel())
+            self._condition.notify_all()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout)
+
+    def _ensure_dispatcher(self):
+        """按需启动调度线程"""
+        self._stopping = False
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="micro-batcher", daemon=True)
+            self._dispatcher.start()
+
+    def _next_batch(self) -> list:
+        """等待并取出下一批请求，队列为空且正在停止时返回 None"""
+        with self._condition:
+            while True:
+                if not self._groups:
+                    if self._stopping:
+                        return None
+                    self._condition.wait()
+                    continue
+
+                # 老化后优先级最高的请求所在分组先出批，同等优先级时等待最久的先出
+                now = time.perf_counter()
+                order = lambda request: (effective_priority(request.rank, now - request.enqueued_at, self.aging_seconds),
+                                         request.enqueued_at)
+                head = min((request for group in self._groups.values() for request in group), key=order)
+                group = self._groups[head.key]
+                remaining = min(request.enqueued_at for request in group) + self.max_wait - now
+                if len(group) >= self.max_batch_size or remaining <= 0 or self._stopping:
+                    group.sort(key=order)
+                    batch = group[:self.max_batch_size]
+                    del group[:self.max_batch_size]
+                    if not group:
+                        del self._groups[head.key]
+                    # 标记为执行中，已被取消的请求不再推理
+                    running = [request for request in batch if request.future.set_running_or_notify_cancel()]
+                    self.cancelled_requests += len(batch) - len(running)
+                    for request in running:
+                        self.class_queue_waits[request.priority].append(now - request.enqueued_at)
+                    if running:
+                        return running
+                    continue
+                self._condition.wait(remaining)
+
+    def _dispatch_loop(self):
+        """调度线程主循环"""
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: list):
+        """执行一次合批推理并把结果分发给各请求"""
+        model, hotwords, language, itn = batch[0].key
+        try:
+            # 按需加载的模型由提交片段的任务持有，推理期间不会被卸载
+            service = self.service if model is None else self.registry.get(model)
+            texts = service.transcribe_batch(
+                [request.audio for request in batch],
+                hotwords=list(hotwords),
+                language=language,
+                itn=itn
+            )
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        texts = list(texts or [])
+        if len(texts) != len(batch):
+            print(f"Model returned {len(texts)} results for a batch of {len(batch)}")
+
+        now = time.perf_counter()
+        with self._condition:
+            self.total_batches += 1
+            self.batch_sizes.append(len(batch))
+            for request in batch[:len(texts)]:
+                self.latencies.append(now - request.enqueued_at)
+                self.class_latencies[request.priority].append(now - request.enqueued_at)
+                self.completions.append(now)
+        for request, text in zip(batch, texts):
+            request.future.set_result(text)
+        # 没有对应结果的请求按失败处理，避免等待结果的任务一直挂起
+        for request in batch[len(texts):]:
+            request.future.set_exception(RuntimeError("Model returned no result for this audio"))
+
+
+# 创建全局微批处理实例
+batcher = MicroBatcher(
+    max_batch_size=settings.BATCH_MAX_SIZE,
+    max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+    aging_seconds=settings.PRIORITY_AGING_SECONDS
+)
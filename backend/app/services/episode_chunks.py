@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import threading
+from app.core.config import settings
+
+
+class EpisodeChunkStore:
+    """节目片段库：按节目记录上一版本每个片段的内容哈希和识别文本
+
+    节目重新上传剪辑后的版本时，内容哈希相同的片段直接复用上一版本的文本，只有新增或改动的片段需要推理。
+    每个节目一个 JSON 文件，文件名为节目标识的 SHA-256。
+    """
+
+    def __init__(self, directory: str, enabled: bool = True):
+        self.directory = directory
+        self.enabled = enabled
+        self.reused_chunks = 0
+        self.reused_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, episode: str, key: str) -> dict:
+        """读取节目上一版本的片段
+
+        Args:
+            episode: 节目标识
+            key: 识别配置键，与上一版本不同时文本不能复用
+
+        Returns:
+            dict: 内容哈希 -> 识别文本，没有可复用的版本时为空
+        """
+        if not self.enabled:
+            return {}
+        path = self._path(episode)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Failed to read episode chunks {episode}: {e}")
+            return {}
+        if data.get("key") != key:
+            return {}
+        return {chunk["digest"]: chunk["text"] for chunk in data["chunks"]}
+
+    def save(self, episode: str, key: str, chunks: list):
+        """保存节目当前版本的片段，替换上一版本
+
+        Args:
+            episode: 节目标识
+            key: 识别配置键
+            chunks: [{"digest", "start", "end", "text"}, ...]
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(episode)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"episode": episode, "key": key, "chunks": chunks}, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Failed to write episode chunks {episode}: {e}")
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def record(self, chunks: int, seconds: float):
+        """累计复用的片段数和时长"""
+        with self._lock:
+            self.reused_chunks += chunks
+            self.reused_seconds += seconds
+
+    def stats(self) -> dict:
+        """获取片段复用统计"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "reused_chunks": self.reused_chunks,
+                "reused_seconds": round(self.reused_seconds, 3)
+            }
+
+    def _path(self, episode: str) -> str:
+        """节目片段文件路径"""
+        return os.path.join(self.directory, hashlib.sha256(episode.encode("utf-8")).hexdigest() + ".json")
+
+
+# 创建全局节目片段库实例
+episode_chunks = EpisodeChunkStore(
+    directory=settings.EPISODE_CHUNKS_DIR,
+    enabled=settings.INCREMENTAL_ENABLED
+)
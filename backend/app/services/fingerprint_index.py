@@ -0,0 +1,381 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows 不支持多进程模式，无需跨进程加锁
+    fcntl = None
+
+
+def _gather_ranges(left: np.ndarray, right: np.ndarray) -> tuple:
+    """把若干个 [left, right) 区间展开为下标数组
+
+    Returns:
+        tuple: (下标, 每个下标所属的区间序号)
+    """
+    counts = right - left
+    owners = np.repeat(np.arange(len(left)), counts)
+    starts = np.repeat(left - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+    return starts + np.arange(counts.sum()), owners
+
+
+@contextmanager
+def _file_lock(path: str):
+    """跨进程的排他文件锁，多个工作进程写同一指纹库时串行化"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class FingerprintIndex:
+    """重复音频指纹库：记录已识别片段的 landmark 哈希和识别文本
+
+    片头片尾音乐、赞助口播等在每期节目中重复出现。推理前先用片段指纹查询，
+    命中已识别过的相同片段时直接复用其文本（音乐等无语音片段复用空文本），跳过推理；
+    只有其中一段与已登记片段相同时，由 locate 找出该段的位置，调用方在其边界处切开片段。
+
+    倒排表以按哈希排序的三个数组（哈希、片段编号、锚点帧号）存储，查询时二分定位，全程向量化；
+    新加入的哈希先按哈希排序放在待合并区，flush 时合并并写入磁盘。哈希总数超过上限时淘汰最久未命中的片段。
+    flush 至多每 flush_interval_seconds 写一次磁盘；写入时持有文件锁，磁盘上的指纹库已被其他进程更新时
+    先重新加载，再把本进程新登记的片段并入，多个工作进程不会互相覆盖。
+    """
+
+    def __init__(self, directory: str, enabled: bool = True, max_hashes: int = 10000000,
+                 min_matches: int = 20, min_ratio: float = 0.8, max_drift_seconds: float = 0.5,
+                 frames_per_second: float = 62.5, flush_interval_seconds: float = 60):
+        self.directory = directory
+        self.enabled = enabled
+        self.max_hashes = max_hashes
+        self.min_matches = min_matches
+        self.min_ratio = min_ratio
+        self.max_drift_seconds = max_drift_seconds
+        self.frames_per_second = frames_per_second
+        self.flush_interval_seconds = flush_interval_seconds
+        self.lookups = 0
+        self.hits = 0
+        self.seconds_saved = 0.0
+        self._segments = None  # 片段编号 -> {"key", "duration", "hashes", "text", "hits", "last_used"}
+        self._hashes = self._ids = self._times = None
+        self._pending = []
+        self._next_id = 0
+        self._generation = 0  # 磁盘上指纹库的写入次数，用于发现其他进程的更新
+        self._last_flush = 0.0
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def lookup(self, hashes: np.ndarray, times: np.ndarray, duration: float, key: str):
+        """查找与片段相同的已识别片段
+
+        候选片段需识别配置相同、时长相近，且在同一时间偏移上吻合的哈希同时占查询片段和已登记片段
+        哈希数的 min_ratio 以上；只有一部分内容相同（如共用片头的两个片段）时不命中。
+
+        Args:
+            hashes: 片段的 landmark 哈希
+            times: 哈希的锚点帧号
+            duration: 片段时长（秒）
+            key: 识别配置键，配置不同的文本不能复用
+
+        Returns:
+            str: 命中时返回已识别的文本，否则返回 None
+        """
+        if not self.enabled or len(hashes) < self.min_matches:
+            return None
+        with self._lock:
+            self._load()
+            self.lookups += 1
+            ids, offsets, _ = self._candidates(hashes, times)
+            if len(ids) == 0:
+                return None
+            # 按 (片段, 时间偏移) 计数，取吻合最多的一组
+            pairs, counts = np.unique(np.stack([ids, offsets]), axis=1, return_counts=True)
+            for index in np.argsort(-counts, kind="stable"):
+                count = int(counts[index])
+                if count < self.min_matches or count < self.min_ratio * len(hashes):
+                    break
+                segment_id, offset = int(pairs[0, index]), int(pairs[1, index])
+                segment = self._segments.get(segment_id)
+                if (segment is None or segment["key"] != key
+                        or count < self.min_ratio * segment["hashes"]
+                        or abs(segment["duration"] - duration) > self.max_drift_seconds
+                        or abs(offset) / self.frames_per_second > self.max_drift_seconds):
+                    continue
+                segment["hits"] += 1
+                segment["last_used"] = time.time()
+                self.hits += 1
+                self.seconds_saved += duration
+                self._dirty = True
+                return segment["text"]
+            return None
+
+    def locate(self, hashes: np.ndarray, times: np.ndarray, duration: float, key: str):
+        """查找片段中与已登记片段内容相同的一段，用于在其边界处切开片段
+
+        片头音乐等常与其后的语音合并在同一个片段中，整段查询不会命中。两种情况返回相同的一段：
+        已登记片段的哈希有 min_ratio 以上在同一时间偏移上出现在查询片段中，即已登记片段整段包含在查询片段中，
+        返回其位置和文本；或两者只有一段相同（如共用片头、其后内容不同的两个片段），吻合哈希覆盖的区间内
+        查询片段的哈希有 min_ratio 以上吻合，返回该区间，文本未知，切开后推理并单独登记即可在下次整段命中。
+
+        Args:
+            hashes: 片段的 landmark 哈希
+            times: 哈希的锚点帧号
+            duration: 片段时长（秒）
+            key: 识别配置键
+
+        Returns:
+            dict: {"start": 秒, "end": 秒, "text": 已识别的文本，未知时为 None}，相对片段起点；未找到时返回 None
+        """
+        if not self.enabled or len(hashes) < self.min_matches:
+            return None
+        with self._lock:
+            self._load()
+            ids, offsets, owners = self._candidates(hashes, times)
+            if len(ids) == 0:
+                return None
+            pairs, groups, counts = np.unique(np.stack([ids, offsets]), axis=1, return_inverse=True,
+                                              return_counts=True)
+            groups = groups.reshape(-1)
+            partial = None
+            for index in np.argsort(-counts, kind="stable"):
+                count = int(counts[index])
+                if count < self.min_matches:
+                    break
+                segment_id, offset = int(pairs[0, index]), int(pairs[1, index])
+                segment = self._segments.get(segment_id)
+                if segment is None or segment["key"] != key:
+                    continue
+                if count >= self.min_ratio * segment["hashes"]:
+                    start = -offset / self.frames_per_second
+                    end = start + segment["duration"]
+                    if start < -self.max_drift_seconds or end > duration + self.max_drift_seconds:
+                        continue
+                    segment["hits"] += 1
+                    segment["last_used"] = time.time()
+                    self.hits += 1
+                    self.seconds_saved += segment["duration"]
+                    self._dirty = True
+                    return {"start": max(start, 0.0), "end": min(end, duration), "text": segment["text"]}
+                if partial is not None:
+                    continue
+                # 文本已知的整段包含优先；区间终点取哈希目标点的帧号（锚点帧号加哈希低6位的时间差）
+                aligned = owners[groups == index]
+                first = int(times[aligned].min())
+                last = int((times[aligned].astype(np.int64) + (hashes[aligned] & 0x3f)).max())
+                if count >= self.min_ratio * np.count_nonzero((times >= first) & (times <= last)):
+                    partial = {"start": first / self.frames_per_second,
+                               "end": min(last / self.frames_per_second, duration), "text": None}
+            return partial
+
+    def add(self, hashes: np.ndarray, times: np.ndarray, duration: float, text: str, key: str):
+        """记录已识别片段的指纹和文本
+
+        Args:
+            hashes: 片段的 landmark 哈希
+            times: 哈希的锚点帧号
+            duration: 片段时长（秒）
+            text: 识别文本
+            key: 识别配置键
+        """
+        if not self.enabled or len(hashes) < self.min_matches:
+            return
+        with self._lock:
+            self._load()
+            segment_id = self._next_id
+            self._next_id += 1
+            self._segments[segment_id] = {"key": key, "duration": round(duration, 3), "hashes": len(hashes),
+                                          "text": text, "hits": 0, "last_used": time.time()}
+            hashes = np.asarray(hashes, dtype=np.uint32)
+            order = np.argsort(hashes, kind="stable")
+            self._pending.append((hashes[order], np.full(len(hashes), segment_id, dtype=np.int64),
+                                  np.asarray(times, dtype=np.int32)[order]))
+            self._dirty = True
+
+    def flush(self, force: bool = False):
+        """合并待合并区、按上限淘汰并写入磁盘
+
+        Args:
+            force: 忽略写入间隔立即写入，用于进程退出前
+        """
+        with self._lock:
+            if self._segments is None or not self._dirty:
+                return
+            now = time.time()
+            if not force and now - self._last_flush < self.flush_interval_seconds:
+                return
+            with _file_lock(os.path.join(self.directory, "index.lock")):
+                self._reload_if_changed()
+                self._merge()
+                self._evict()
+                self._save()
+            self._dirty = False
+            self._last_flush = now
+
+    def stats(self) -> dict:
+        """获取指纹库统计"""
+        with self._lock:
+            self._load()
+            return {
+                "enabled": self.enabled,
+                "segments": len(self._segments),
+                "hashes": int(len(self._hashes) + sum(len(h) for h, _, _ in self._pending)),
+                "max_hashes": self.max_hashes,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "seconds_saved": round(self.seconds_saved, 3)
+            }
+
+    def _candidates(self, hashes: np.ndarray, times: np.ndarray) -> tuple:
+        """取出与查询哈希相同的所有条目，返回 (片段编号, 时间偏移, 对应的查询哈希下标)"""
+        ids = []
+        offsets = []
+        queries = []
+        left = np.searchsorted(self._hashes, hashes, side="left")
+        right = np.searchsorted(self._hashes, hashes, side="right")
+        matched, owners = _gather_ranges(left, right)
+        ids.append(self._ids[matched])
+        offsets.append(self._times[matched] - times[owners])
+        queries.append(owners)
+        # 待合并区的每一块在登记时已按哈希排序
+        for pending_hashes, pending_ids, pending_times in self._pending:
+            left = np.searchsorted(pending_hashes, hashes, side="left")
+            right = np.searchsorted(pending_hashes, hashes, side="right")
+            matched, owners = _gather_ranges(left, right)
+            ids.append(pending_ids[matched])
+            offsets.append(pending_times[matched] - times[owners])
+            queries.append(owners)
+        return np.concatenate(ids), np.concatenate(offsets), np.concatenate(queries)
+
+    def _merge(self):
+        """把待合并区并入按哈希排序的倒排表"""
+        if not self._pending:
+            return
+        hashes = np.concatenate([self._hashes] + [h for h, _, _ in self._pending])
+        ids = np.concatenate([self._ids] + [i for _, i, _ in self._pending])
+        times = np.concatenate([self._times] + [t for _, _, t in self._pending])
+        order = np.argsort(hashes, kind="stable")
+        self._hashes, self._ids, self._times = hashes[order], ids[order], times[order]
+        self._pending = []
+
+    def _evict(self):
+        """哈希总数超过上限时按最久未命中的顺序淘汰片段"""
+        if len(self._hashes) <= self.max_hashes:
+            return
+        sizes = np.bincount(self._ids, minlength=self._next_id)
+        excess = len(self._hashes) - self.max_hashes
+        evicted = []
+        for segment_id in sorted(self._segments, key=lambda i: self._segments[i]["last_used"]):
+            if excess <= 0:
+                break
+            evicted.append(segment_id)
+            excess -= int(sizes[segment_id])
+        for segment_id in evicted:
+            del self._segments[segment_id]
+        keep = ~np.isin(self._ids, evicted)
+        self._hashes, self._ids, self._times = self._hashes[keep], self._ids[keep], self._times[keep]
+
+    def _paths(self) -> tuple:
+        """倒排表和片段信息的文件路径"""
+        return os.path.join(self.directory, "index.npz"), os.path.join(self.directory, "segments.json")
+
+    def _load(self):
+        """首次使用时从磁盘加载指纹库"""
+        if self._segments is not None:
+            return
+        self._segments = {}
+        self._hashes = np.zeros(0, dtype=np.uint32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._times = np.zeros(0, dtype=np.int32)
+        index_path, segments_path = self._paths()
+        if not (os.path.exists(index_path) and os.path.exists(segments_path)):
+            return
+        try:
+            with open(segments_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            with np.load(index_path) as index:
+                self._hashes, self._ids, self._times = index["hashes"], index["ids"], index["times"]
+            self._segments = {int(segment_id): segment for segment_id, segment in data["segments"].items()}
+            self._next_id = data["next_id"]
+            self._generation = data.get("generation", 0)
+            # 早期版本未记录片段的哈希数
+            if any("hashes" not in segment for segment in self._segments.values()):
+                sizes = np.bincount(self._ids, minlength=self._next_id)
+                for segment_id, segment in self._segments.items():
+                    segment.setdefault("hashes", int(sizes[segment_id]))
+        except Exception as e:
+            print(f"Failed to load fingerprint index: {e}")
+            self._segments = {}
+            self._hashes = np.zeros(0, dtype=np.uint32)
+            self._ids = np.zeros(0, dtype=np.int64)
+            self._times = np.zeros(0, dtype=np.int32)
+
+    def _disk_generation(self) -> int:
+        """磁盘上指纹库的写入次数，尚未写入时为0"""
+        try:
+            with open(self._paths()[1], "r", encoding="utf-8") as f:
+                return json.load(f).get("generation", 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _reload_if_changed(self):
+        """磁盘上的指纹库已被其他进程更新时重新加载，再并入本进程尚未写入的片段和命中记录"""
+        if self._disk_generation() == self._generation:
+            return
+        segments, pending = self._segments, self._pending
+        unsaved = {int(ids[0]) for _, ids, _ in pending}
+        self._segments = None
+        self._pending = []
+        self._load()
+        for segment_id, segment in self._segments.items():
+            mine = segments.get(segment_id)
+            if mine is not None and segment_id not in unsaved:
+                segment["hits"] = max(segment["hits"], mine["hits"])
+                segment["last_used"] = max(segment["last_used"], mine["last_used"])
+        for hashes, ids, times in pending:
+            segment_id = self._next_id
+            self._next_id += 1
+            self._segments[segment_id] = segments[int(ids[0])]
+            self._pending.append((hashes, np.full(len(hashes), segment_id, dtype=np.int64), times))
+
+    def _save(self):
+        """原子写入倒排表和片段信息，调用方需持有文件锁"""
+        os.makedirs(self.directory, exist_ok=True)
+        index_path, segments_path = self._paths()
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(index_path + suffix, "wb") as f:
+                np.savez(f, hashes=self._hashes, ids=self._ids, times=self._times)
+            with open(segments_path + suffix, "w", encoding="utf-8") as f:
+                json.dump({"next_id": self._next_id, "generation": self._generation + 1,
+                           "segments": self._segments}, f, ensure_ascii=False)
+            os.replace(index_path + suffix, index_path)
+            os.replace(segments_path + suffix, segments_path)
+            self._generation += 1
+        except Exception as e:
+            print(f"Failed to write fingerprint index: {e}")
+            for path in (index_path + suffix, segments_path + suffix):
+                if os.path.exists(path):
+                    os.unlink(path)
+
+
+# 创建全局指纹库实例
+fingerprint_index = FingerprintIndex(
+    directory=settings.FINGERPRINT_DIR,
+    enabled=settings.FINGERPRINT_ENABLED,
+    max_hashes=settings.FINGERPRINT_MAX_HASHES,
+    min_matches=settings.FINGERPRINT_MIN_MATCHES,
+    min_ratio=settings.FINGERPRINT_MIN_RATIO,
+    max_drift_seconds=settings.FINGERPRINT_MAX_DRIFT_SECONDS,
+    frames_per_second=settings.AUDIO_SAMPLE_RATE / 256,
+    flush_interval_seconds=settings.FINGERPRINT_FLUSH_SECONDS
+)
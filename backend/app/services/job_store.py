@@ -0,0 +1,344 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import numpy as np
+from app.core.config import settings
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class JobStore:
+    """转录任务库：在 SQLite 中保存任务状态和长音频已完成片段的结果，服务重启后从第一个未完成的片段继续
+
+    每完成一个片段就在同一事务中写入该片段的句子和进度，WAL 模式下进程崩溃不会留下半写的记录。
+    需要续转的任务另存解码后的 PCM（.npy，来自解码音频缓存时为缓存文件的硬链接），任务结束后删除。
+    任务记录带有执行进程的 PID 和进程令牌，多进程共用任务库时只接管执行进程已退出的任务。
+    """
+
+    def __init__(self, directory: str, enabled: bool = True):
+        self.directory = directory
+        self.enabled = enabled
+        self.checkpointed_chunks = 0
+        self.resumed_jobs = 0
+        self._pid = None
+        self._token = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def token(self) -> str:
+        """当前进程的令牌，派生的子进程各自生成"""
+        self._check_process()
+        return self._token
+
+    def _check_process(self):
+        """派生子进程后重新生成令牌，SQLite 连接不能跨进程使用"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._token = uuid.uuid4().hex
+            self._conn = None
+
+    def create(self, job, request: dict):
+        """登记新任务
+
+        Args:
+            job: 转录任务
+            request: 续转所需的请求参数，如识别参数、缓存键、时间偏移、解码采样率
+        """
+        if not self.enabled:
+            return
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (id, state, priority, metadata, request, owner_pid, owner_token, progress,"
+            " created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.id, job.state, job.priority, json.dumps(job.metadata, ensure_ascii=False),
+             json.dumps(request, ensure_ascii=False), os.getpid(), self.token, job.progress, job.created_at)
+        )
+
+    def update(self, job):
+        """写入任务的状态、进度和结果（任务不需要时不写结果）；任务结束时删除片段结果和PCM
+
+        Args:
+            job: 转录任务
+        """
+        if not self.enabled:
+            return
+        finished = job.state in FINISHED_STATES
+        store_result = job.state == "completed" and job.store_result
+        result = json.dumps(job.result, ensure_ascii=False) if store_result else None
+        self._execute(
+            "UPDATE jobs SET state = ?, progress = ?, metadata = ?, error = ?, result = ?, started_at = ?,"
+            " finished_at = ? WHERE id = ?",
+            (job.state, job.progress, json.dumps(job.metadata, ensure_ascii=False), job.error, result,
+             job.started_at, job.finished_at, job.id),
+            ("DELETE FROM chunks WHERE job_id = ?", (job.id,)) if finished else None
+        )
+        if finished:
+            self._remove_audio(job.id)
+
+    def save_audio(self, job_id: str, audio: np.ndarray):
+        """保存任务的PCM，供重启后续转
+
+        映射自解码音频缓存的PCM（或其中的时间窗口）以硬链接引用缓存文件，不再复制一份；
+        缓存之后淘汰或覆盖该条目时，链接仍指向原文件内容。无法链接时写入副本。
+
+        Args:
+            job_id: 任务ID
+            audio: float32 PCM数组
+        """
+        if not self.enabled:
+            return
+        path = self._audio_path(job_id)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        source = getattr(audio, "filename", None)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if source is not None:
+                try:
+                    os.link(source, temp_path)
+                    os.replace(temp_path, path)
+                    return
+                except OSError:
+                    # 跨文件系统或不支持硬链接时退回复制
+                    if os.path.exists(temp_path):
+                        os.unlink(temp_path)
+            with open(temp_path, "wb") as f:
+                np.save(f, np.asarray(audio, dtype=np.float32))
+            os.replace(temp_path, path)
+        except Exception as e:
+            print(f"Failed to persist audio for job {job_id}: {e}")
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def load_audio(self, job_id: str, start: int = 0, samples: int = None):
+        """以只读内存映射方式打开任务的PCM
+
+        Args:
+            job_id: 任务ID
+            start: 任务音频在保存的数组中的起始采样，引用整段缓存音频的时间窗口任务由此截取
+            samples: 任务音频的采样数
+
+        Returns:
+            np.memmap: float32 PCM数组，不存在时返回 None
+        """
+        try:
+            audio = np.load(self._audio_path(job_id), mmap_mode="r")
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Failed to read audio for job {job_id}: {e}")
+            return None
+        if samples is not None and len(audio) != samples:
+            audio = audio[start:start + samples]
+        return audio
+
+    def add_chunk(self, job_id: str, index: int, items: list, progress: float):
+        """写入一个已完成片段的句子并更新进度
+
+        Args:
+            job_id: 任务ID
+            index: 片段序号，从0开始
+            items: 该片段产生的句子
+            progress: 任务进度百分比
+        """
+        if not self.enabled:
+            return
+        self._execute(
+            "INSERT OR REPLACE INTO chunks (job_id, idx, items) VALUES (?, ?, ?)",
+            (job_id, index, json.dumps(items, ensure_ascii=False)),
+            ("UPDATE jobs SET progress = ? WHERE id = ?", (progress, job_id))
+        )
+        with self._lock:
+            self.checkpointed_chunks += 1
+
+    def load_chunks(self, job_id: str) -> list:
+        """读取任务已完成的连续片段
+
+        Returns:
+            list: 每个片段的句子列表，按片段顺序排列；遇到缺失的序号时截止
+        """
+        rows = self._query("SELECT idx, items FROM chunks WHERE job_id = ? ORDER BY idx", (job_id,))
+        chunks = []
+        for index, items in rows:
+            if index != len(chunks):
+                break
+            chunks.append(json.loads(items))
+        return chunks
+
+    def get(self, job_id: str) -> dict:
+        """读取任务状态，格式同 TranscriptionJob.to_dict
+
+        Returns:
+            dict: 任务状态，不存在时返回 None
+        """
+        if not self.enabled:
+            return None
+        rows = self._query(
+            "SELECT id, state, priority, progress, metadata, created_at, started_at, finished_at, error, result"
+            " FROM jobs WHERE id = ?", (job_id,)
+        )
+        if not rows:
+            return None
+        job_id, state, priority, progress, metadata, created_at, started_at, finished_at, error, result = rows[0]
+        return {
+            "job_id": job_id,
+            "state": state,
+            "priority": priority,
+            "progress": progress,
+            "metadata": json.loads(metadata),
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "error": error,
+            "result": json.loads(result) if result is not None else None
+        }
+
+    def claim_unfinished(self) -> list:
+        """接管执行进程已退出的未完成任务
+
+        Returns:
+            list: [{"id", "priority", "metadata", "request", "created_at"}, ...]，按提交时间排列
+        """
+        if not self.enabled:
+            return []
+        rows = self._query(
+            "SELECT id, priority, metadata, request, created_at, owner_pid, owner_token FROM jobs"
+            " WHERE state IN ('queued', 'running') ORDER BY created_at"
+        )
+        claimed = []
+        for job_id, priority, metadata, request, created_at, owner_pid, owner_token in rows:
+            if owner_token == self.token or self._owner_alive(owner_pid):
+                continue
+            # 多个进程同时启动时只有一个能接管
+            if self._execute("UPDATE jobs SET owner_pid = ?, owner_token = ? WHERE id = ? AND owner_token = ?",
+                             (os.getpid(), self.token, job_id, owner_token)):
+                claimed.append({
+                    "id": job_id,
+                    "priority": priority,
+                    "metadata": json.loads(metadata),
+                    "request": json.loads(request),
+                    "created_at": created_at
+                })
+        return claimed
+
+    def fail(self, job_id: str, error: str):
+        """把无法续转的任务标记为失败"""
+        self._execute("UPDATE jobs SET state = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                      (error, time.time(), job_id),
+                      ("DELETE FROM chunks WHERE job_id = ?", (job_id,)))
+        self._remove_audio(job_id)
+
+    def record_resumed(self):
+        """累计续转的任务数"""
+        with self._lock:
+            self.resumed_jobs += 1
+
+    def prune(self, retention_seconds: float):
+        """删除结束超过保留时间的任务"""
+        if not self.enabled:
+            return
+        self._execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                      (time.time() - retention_seconds,))
+
+    def stats(self) -> dict:
+        """获取任务库统计"""
+        states = {}
+        if self.enabled:
+            states = dict(self._query("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "jobs": states,
+                "checkpointed_chunks": self.checkpointed_chunks,
+                "resumed_jobs": self.resumed_jobs
+            }
+
+    def _connect(self) -> sqlite3.Connection:
+        """首次使用时打开数据库并建表，调用方需持有锁"""
+        self._check_process()
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, "jobs.db"), check_same_thread=False,
+                                   isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, state TEXT NOT NULL, priority TEXT NOT NULL,"
+                " metadata TEXT NOT NULL, request TEXT NOT NULL, owner_pid INTEGER, owner_token TEXT,"
+                " progress REAL NOT NULL DEFAULT 0, error TEXT, result TEXT, created_at REAL, started_at REAL,"
+                " finished_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (job_id TEXT NOT NULL, idx INTEGER NOT NULL, items TEXT NOT NULL,"
+                " PRIMARY KEY (job_id, idx))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = (), then: tuple = None) -> int:
+        """在一个事务中执行写操作，then 为随后执行的 (sql, params)
+
+        Returns:
+            int: 第一条语句影响的行数，失败时为0
+        """
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    rowcount = conn.execute(sql, params).rowcount
+                    if then is not None:
+                        conn.execute(*then)
+                    conn.execute("COMMIT")
+                    return rowcount
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            except Exception as e:
+                print(f"Job store write failed: {e}")
+                return 0
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        """执行查询"""
+        with self._lock:
+            try:
+                return self._connect().execute(sql, params).fetchall()
+            except Exception as e:
+                print(f"Job store query failed: {e}")
+                return []
+
+    @staticmethod
+    def _owner_alive(pid: int) -> bool:
+        """执行进程是否仍在运行；与当前进程PID相同但令牌不同说明是重启前的进程"""
+        if pid is None or pid == os.getpid():
+            return False
+        # Windows 上 os.kill 不能用于探测进程，且不支持多进程模式，其他进程的任务都视为可接管
+        if os.name == "nt":
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _audio_path(self, job_id: str) -> str:
+        """任务PCM文件路径"""
+        return os.path.join(self.directory, "audio", f"{job_id}.npy")
+
+    def _remove_audio(self, job_id: str):
+        """删除任务的PCM"""
+        try:
+            os.unlink(self._audio_path(job_id))
+        except FileNotFoundError:
+            pass
+
+
+# 创建全局任务库实例
+job_store = JobStore(
+    directory=settings.JOB_STORE_DIR,
+    enabled=settings.JOB_STORE_ENABLED
+)
@@ -0,0 +1,239 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from app.core.config import settings
+from app.services.model_service import ModelService, model_service
+from app.utils.metrics import percentile
+
+DEFAULT_MODEL = "default"
+
+
+def _rss_bytes() -> int:
+    """当前进程的常驻内存（字节），不支持 /proc 的平台返回 None"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class ModelRegistry:
+    """模型注册表：按名称按需加载模型，常驻模型超过内存预算时卸载最久未使用的模型
+
+    默认模型由 model_service 在启动时加载（多进程模式下由父进程加载后共享），常驻且不计入预算；
+    其他模型在首次请求时于任务工作线程中加载，执行中的任务持有模型期间不会被卸载。
+    模型占用的内存取权重大小与加载前后进程常驻内存增量中的较大值。
+    所有模型都被占用而仍超出预算时照常加载，计入 over_budget_loads。
+    """
+
+    def __init__(self, models: dict = None, budget_bytes: int = 0, default_service=None, factory=None):
+        self.models = dict(models or {})
+        self.budget_bytes = max(0, budget_bytes)
+        self.default_service = default_service or model_service
+        self._factory = factory or (lambda name, model_dir: ModelService(name, model_dir))
+        self._loaded = OrderedDict()  # 按最近使用排列，最久未使用的在前
+        self._sizes = {}
+        self._pins = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.loads = 0
+        self.evictions = 0
+        self.over_budget_loads = 0
+        self.load_seconds = deque(maxlen=200)
+        self.eviction_seconds = deque(maxlen=200)
+
+    def names(self) -> list:
+        """可选择的模型名称，默认模型在前"""
+        return [DEFAULT_MODEL] + sorted(self.models)
+
+    def has(self, name: str) -> bool:
+        """是否为可选择的模型"""
+        return name == DEFAULT_MODEL or name in self.models
+
+    def acquire(self, name: str) -> ModelService:
+        """取得模型并标记为使用中，未加载时在当前线程中加载
+
+        Args:
+            name: 模型名称
+
+        Returns:
+            ModelService: 已加载的模型服务
+
+        Raises:
+            KeyError: 未知的模型名称
+            RuntimeError: 模型加载失败
+        """
+        return self._get(name, pin=True)
+
+    def release(self, name: str):
+        """结束使用模型，之后可以被卸载"""
+        if name == DEFAULT_MODEL:
+            return
+        with self._lock:
+            if self._pins.get(name, 0) > 0:
+                self._pins[name] -= 1
+
+    def get(self, name: str) -> ModelService:
+        """取得模型并更新最近使用时间，未加载时在当前线程中加载
+
+        Raises:
+            KeyError: 未知的模型名称
+            RuntimeError: 模型加载失败
+        """
+        return self._get(name, pin=False)
+
+    def unload_all(self):
+        """卸载所有按需加载的模型"""
+        with self._lock:
+            names = list(self._loaded)
+        for name in names:
+            with self._lock:
+                service = self._loaded.pop(name, None)
+            if service is not None:
+                service.unload_model()
+
+    def stats(self) -> dict:
+        """获取常驻模型、内存占用以及加载和卸载耗时统计
+
+        Returns:
+            dict: 统计信息
+        """
+        with self._lock:
+            loaded = {
+                name: {
+                    "size_mb": round((self._sizes.get(name) or 0) / 1024 / 1024, 1),
+                    "in_use": self._pins.get(name, 0),
+                    "load_seconds": service.status()["elapsed"]
+                }
+                for name, service in self._loaded.items()
+            }
+            resident = self._resident_bytes()
+        loads = sorted(self.load_seconds)
+        evictions = sorted(self.eviction_seconds)
+        return {
+            "available": self.names(),
+            "budget_mb": round(self.budget_bytes / 1024 / 1024, 1),
+            "resident_mb": round(resident / 1024 / 1024, 1),
+            "loaded": loaded,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "over_budget_loads": self.over_budget_loads,
+            "avg_load_seconds": round(sum(loads) / len(loads), 3) if loads else 0.0,
+            "p95_load_seconds": round(percentile(loads, 95), 3),
+            "avg_eviction_seconds": round(sum(evictions) / len(evictions), 3) if evictions else 0.0,
+            "p95_eviction_seconds": round(percentile(evictions, 95), 3)
+        }
+
+    def _get(self, name: str, pin: bool) -> ModelService:
+        """取得模型，同一模型只由一个线程加载，其他线程等待加载结束"""
+        if name == DEFAULT_MODEL:
+            return self.default_service
+        if name not in self.models:
+            raise KeyError(name)
+        while True:
+            with self._lock:
+                service = self._loaded.get(name)
+                if service is not None:
+                    self._loaded.move_to_end(name)
+                    if pin:
+                        self._pins[name] = self._pins.get(name, 0) + 1
+                    return service
+                loading = self._loading.get(name)
+                if loading is None:
+                    loading = self._loading[name] = threading.Event()
+                    break
+            # 加载失败时由等待的线程重新加载，各自得到加载错误
+            loading.wait()
+
+        try:
+            # 卸载过的模型已知大小，加载前先腾出空间，避免新旧模型同时占用内存
+            self._evict(self._sizes.get(name, 0))
+            service = self._load(name)
+            with self._lock:
+                self._loaded[name] = service
+                if pin:
+                    self._pins[name] = self._pins.get(name, 0) + 1
+            if not self._evict(0, keep=name):
+                with self._lock:
+                    self.over_budget_loads += 1
+            return service
+        finally:
+            with self._lock:
+                del self._loading[name]
+            loading.set()
+
+    def _load(self, name: str) -> ModelService:
+        """加载模型并记录耗时和内存占用"""
+        gc.collect()
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        service = self._factory(name, self.models[name])
+        if not service.load_model() or service.model is None:
+            raise RuntimeError(f"Model {name} failed to load: {service.load_error}")
+        elapsed = time.perf_counter() - started
+
+        rss_after = _rss_bytes()
+        delta = rss_after - rss_before if rss_before is not None and rss_after is not None else 0
+        with self._lock:
+            self._sizes[name] = max(service.memory_bytes() or 0, delta, 0)
+            self.loads += 1
+            self.load_seconds.append(elapsed)
+        print(f"Loaded model {name} in {elapsed:.2f}s ({self._sizes[name] / 1024 / 1024:.0f} MB)")
+        return service
+
+    def _evict(self, incoming: int, keep: str = None) -> bool:
+        """卸载最久未使用且未被占用的模型，直到常驻模型与即将加载的模型不超过预算
+
+        Args:
+            incoming: 即将加载的模型大小（字节）
+            keep: 不卸载的模型，即刚加载的模型
+
+        Returns:
+            bool: 是否已在预算之内
+        """
+        if self.budget_bytes <= 0:
+            return True
+        while True:
+            with self._lock:
+                if self._resident_bytes() + incoming <= self.budget_bytes:
+                    return True
+                victim = next((name for name in self._loaded if name != keep and self._pins.get(name, 0) == 0), None)
+                if victim is None:
+                    return False
+                service = self._loaded.pop(victim)
+            started = time.perf_counter()
+            service.unload_model()
+            del service
+            gc.collect()
+            self._empty_device_cache()
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.evictions += 1
+                self.eviction_seconds.append(elapsed)
+            print(f"Evicted model {victim} in {elapsed:.2f}s")
+
+    def _resident_bytes(self) -> int:
+        """常驻的按需加载模型占用的内存，调用方需持有锁"""
+        return sum(self._sizes.get(name) or 0 for name in self._loaded)
+
+    @staticmethod
+    def _empty_device_cache():
+        """归还GPU缓存的显存"""
+        if not settings.DEVICE.startswith("cuda"):
+            return
+        try:
+            import torch
+            torch.cuda.empty_cache()
+        except Exception:
+            pass
+
+
+# 创建全局模型注册表实例
+model_registry = ModelRegistry(
+    models=settings.MODELS,
+    budget_bytes=settings.MODEL_RAM_BUDGET_MB * 1024 * 1024
+)
@@ -1,10 +1,88 @@
 from funasr import AutoModel
 from app.core.config import settings
+from app.services.onnx_backend import OnnxASRModel
+from typing import Union
+import numpy as np
 import os
+import threading
+import time
+
+# 模型加载失败时返回的模拟转录文本
+MOCK_TRANSCRIPT = "欢迎收听今天的播客节目，今天我们邀请到了一位非常特别的嘉宾。大家好，很高兴能来到这里和大家交流。能否请您介绍一下您最近在做的项目？当然可以，我们最近在开发一个跨平台的语音识别应用，它能够自动区分不同的说话人，并生成准确的文字稿。"
 
 class ModelService:
-    def __init__(self):
+    def __init__(self, name: str = "default", model_dir: str = None):
+        self.name = name
+        # 未指定时使用配置的默认模型
+        self.model_dir = model_dir
         self.model = None
+        # 加载阶段：idle（未加载）/ loading / ready / failed（已回退到模拟模型）
+        self.phase = "idle"
+        self.load_started_at = None
+        self.load_finished_at = None
+        self.load_error = None
+        self.quantization = "none"
+        self._loaded = threading.Event()
+        self._loader = None
+    
+    def start_loading(self):
+        """在后台线程中加载模型，立即返回
+        
+        Returns:
+            threading.Thread: 加载线程，模型已在加载或已加载时返回 None
+        """
+        if self.phase in ("loading", "ready"):
+            return None
+        self.phase = "loading"
+        self.load_started_at = time.time()
+        self._loaded.clear()
+        self._loader = threading.Thread(target=self.load_model, name="model-loader", daemon=True)
+        self._loader.start()
+        return self._loader
+    
+    def wait_until_loaded(self, timeout: float = None) -> bool:
+        """等待正在进行的模型加载结束
+        
+        Args:
+            timeout: 最长等待时间（秒），None 表示一直等待
+            
+        Returns:
+            bool: 加载是否已结束（无论成功或失败）
+        """
+        if self.phase != "loading":
+            return True
+        return self._loaded.wait(timeout)
+    
+    def is_ready(self) -> bool:
+        """真实模型是否已加载完成（模拟模型不算就绪）"""
+        return self.phase == "ready" and self.model is not None
+    
+    def status(self) -> dict:
+        """获取模型加载状态
+        
+        Returns:
+            dict: 包含 phase、backend、elapsed（加载已用或总用时，秒）、error
+        """
+        elapsed = None
+        if self.load_started_at is not None:
+            elapsed = round((self.load_finished_at or time.time()) - self.load_started_at, 3)
+        return {
+            "phase": self.phase,
+            "name": self.name,
+            "model": self.resolved_model_dir(),
+            "backend": settings.MODEL_BACKEND,
+            "device": settings.DEVICE,
+            "elapsed": elapsed,
+            "error": self.load_error,
+            "quantization": self.quantization,
+            "mock": self.model is None
+        }
+    
+    def resolved_model_dir(self) -> str:
+        """实际加载的模型目录"""
+        if self.model_dir is not None:
+            return self.model_dir
+        return settings.ONNX_MODEL_DIR if settings.MODEL_BACKEND == "onnx" else settings.MODEL_DIR
     
     def load_model(self):
         """加载FunASR模型
@@ -12,23 +90,78 @@ class ModelService:
         Returns:
             bool: 模型加载是否成功
         """
-        print("Loading FunASR model...")
+        print(f"Loading FunASR model {self.name}...")
+        self.phase = "loading"
+        if self.load_started_at is None or self.load_finished_at is not None:
+            self.load_started_at = time.time()
+        self.load_finished_at = None
+        self.load_error = None
+        self.quantization = "none"
         try:
-            self.model = AutoModel(
-                model=settings.MODEL_DIR,
-                trust_remote_code=settings.TRUST_REMOTE_CODE,
-                remote_code=settings.REMOTE_CODE,
-                disable_update=settings.DISABLE_UPDATE,
-                device=settings.DEVICE,
-            )
-            print("Model loaded successfully!")
+            if settings.MODEL_BACKEND == "onnx":
+                # 首次使用时导出ONNX图并缓存，之后直接加载
+                self.model = OnnxASRModel(
+                    model_dir=self.resolved_model_dir(),
+                    cache_dir=settings.ONNX_CACHE_DIR,
+                    intra_op_threads=settings.ONNX_INTRA_OP_THREADS,
+                    inter_op_threads=settings.ONNX_INTER_OP_THREADS,
+                    optimization_level=settings.ONNX_GRAPH_OPTIMIZATION,
+                )
+            elif settings.MODEL_BACKEND == "torch":
+                self.model = AutoModel(
+                    model=self.resolved_model_dir(),
+                    trust_remote_code=settings.TRUST_REMOTE_CODE,
+                    remote_code=settings.REMOTE_CODE,
+                    disable_update=settings.DISABLE_UPDATE,
+                    device=settings.DEVICE,
+                    ncpu=settings.NCPU,
+                )
+                self.quantization = self._quantize()
+            else:
+                raise ValueError(f"Unsupported MODEL_BACKEND: {settings.MODEL_BACKEND}")
+            self.phase = "ready"
+            print(f"Model {self.name} loaded successfully!")
             return True
         except Exception as e:
-            print(f"Model loading failed: {e}")
+            print(f"Model {self.name} loading failed: {e}")
             # 如果模型加载失败，使用模拟模型
             self.model = None
+            self.phase = "failed"
+            self.load_error = str(e)
             print("Using mock model instead...")
             return False
+        finally:
+            self.load_finished_at = time.time()
+            self._loaded.set()
+    
+    def _quantize(self) -> str:
+        """按配置对已加载模型的线性层做动态INT8量化
+        
+        Returns:
+            str: 实际生效的量化方式，none 或 int8
+            
+        Raises:
+            ValueError: MODEL_QUANTIZE 取值不受支持时抛出
+        """
+        mode = settings.MODEL_QUANTIZE
+        if mode in ("", "none"):
+            return "none"
+        if mode != "int8":
+            raise ValueError(f"Unsupported MODEL_QUANTIZE: {mode}")
+        if not settings.DEVICE.startswith("cpu"):
+            print("INT8 dynamic quantization only applies to CPU inference, keeping fp32 weights")
+            return "none"
+        try:
+            import torch
+            self.model.model = torch.ao.quantization.quantize_dynamic(
+                self.model.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        except Exception as e:
+            # 量化失败不影响服务，继续使用fp32权重；实际生效的方式见 status()
+            print(f"INT8 quantization failed, keeping fp32 weights: {e}")
+            return "none"
+        print("Applied INT8 dynamic quantization to linear layers")
+        return "int8"
     
     def unload_model(self):
         """卸载模型，释放资源
@@ -40,37 +173,74 @@ class ModelService:
             try:
                 del self.model
                 self.model = None
-                print("Model unloaded successfully!")
+                self.phase = "idle"
+                print(f"Model {self.name} unloaded successfully!")
                 return True
             except Exception as e:
                 print(f"Failed to unload model: {e}")
                 return False
         return True
     
-    def transcribe(self, audio_path: str) -> str:
+    def memory_bytes(self) -> int:
+        """估计已加载模型权重占用的内存（字节）
+        
+        torch 后端统计参数和缓冲区，ONNX 后端统计导出的模型文件大小。
+        
+        Returns:
+            int: 字节数，未加载时为0，无法估计时为 None
+        """
+        if self.model is None:
+            return 0
+        module = getattr(self.model, "model", None)
+        if module is not None and hasattr(module, "parameters"):
+            tensors = list(module.parameters()) + list(module.buffers())
+            return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+        export_dir = getattr(self.model, "export_dir", None)
+        if export_dir is not None and os.path.isdir(export_dir):
+            return sum(os.path.getsize(os.path.join(export_dir, name))
+                       for name in os.listdir(export_dir) if name.endswith(".onnx"))
+        return None
+    
+    def transcribe(self, audio: Union[str, np.ndarray]) -> str:
         """使用模型进行语音识别
         
         Args:
-            audio_path: 音频文件路径
+            audio: 音频文件路径，或16kHz单声道float32 PCM数组
             
         Returns:
             str: 识别结果文本
         """
+        return self.transcribe_batch([audio])[0]
+    
+    def transcribe_batch(self, inputs: list, hotwords: list = None, language: str = None, itn: bool = None) -> list:
+        """在一次 model.generate 调用中识别多段音频
+        
+        Args:
+            inputs: 音频文件路径或PCM数组的列表
+            hotwords: 热词列表，默认使用配置
+            language: 识别语言，默认使用配置
+            itn: 是否进行数字转换，默认使用配置
+            
+        Returns:
+            list: 与输入一一对应的识别结果文本
+        """
+        # 后台加载尚未结束时等待，避免在加载期间返回模拟文本
+        self.wait_until_loaded()
         if self.model is not None:
             # 调用FunASR模型进行语音识别
             res = self.model.generate(
-                input=[audio_path],
+                input=list(inputs),
                 cache={},
-                batch_size=settings.BATCH_SIZE,
-                hotwords=settings.HOTWORDS,
-                language=settings.LANGUAGE,
-                itn=settings.ITN,  # 数字转换
+                batch_size=max(settings.BATCH_SIZE, len(inputs)),
+                hotwords=settings.HOTWORDS if hotwords is None else hotwords,
+                language=settings.LANGUAGE if language is None else language,
+                itn=settings.ITN if itn is None else itn,  # 数字转换
             )
             
-            return res[0]["text"]
+            return [item["text"] for item in res]
         else:
             # 使用模拟数据，模型加载失败时的备选方案
-            return "欢迎收听今天的播客节目，今天我们邀请到了一位非常特别的嘉宾。大家好，很高兴能来到这里和大家交流。能否请您介绍一下您最近在做的项目？当然可以，我们最近在开发一个跨平台的语音识别应用，它能够自动区分不同的说话人，并生成准确的文字稿。"
+            return [MOCK_TRANSCRIPT for _ in inputs]
 
 # 创建全局模型服务实例
 model_service = ModelService()
\ No newline at end of file
@@ -0,0 +1,165 @@
+import os
+import shutil
+import numpy as np
+from app.core.config import settings
+
+# 导出的ONNX图旁需要一并保存的前端与词表文件
+ONNX_SIDECAR_FILES = ("config.yaml", "am.mvn", "tokens.json")
+
+# 配置值到 onnxruntime 图优化级别的映射
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL"
+}
+
+
+def export_dir_for(model_dir: str, cache_dir: str) -> str:
+    """模型对应的ONNX导出目录
+
+    Args:
+        model_dir: 模型名称或本地路径
+        cache_dir: ONNX导出缓存根目录
+
+    Returns:
+        str: 导出目录
+    """
+    name = model_dir.strip("/\\").replace("/", "--").replace("\\", "--")
+    return os.path.join(cache_dir, name)
+
+
+def ensure_exported(model_dir: str, export_dir: str) -> str:
+    """确保模型已导出为ONNX，只在首次使用时导出
+
+    导出先写入临时目录，完成后整体重命名，中途失败不会留下不完整的图。
+
+    Args:
+        model_dir: 模型名称或本地路径
+        export_dir: 导出目录
+
+    Returns:
+        str: model.onnx 的路径
+    """
+    model_file = os.path.join(export_dir, "model.onnx")
+    if os.path.exists(model_file):
+        return model_file
+
+    print(f"Exporting {model_dir} to ONNX (one-time)...")
+    from funasr import AutoModel
+    model = AutoModel(model=model_dir, disable_update=settings.DISABLE_UPDATE, device="cpu", disable_pbar=True)
+    temp_dir = f"{export_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    try:
+        model.export(type="onnx", quantize=False, output_dir=temp_dir)
+        source_dir = os.path.dirname(model.kwargs["init_param"])
+        for name in ONNX_SIDECAR_FILES:
+            source = os.path.join(source_dir, name)
+            if os.path.exists(source):
+                shutil.copy(source, temp_dir)
+        shutil.rmtree(export_dir, ignore_errors=True)
+        os.replace(temp_dir, export_dir)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    print(f"ONNX model exported to {export_dir}")
+    return model_file
+
+
+def make_session_options(intra_op_threads: int, inter_op_threads: int, optimization_level: str):
+    """构建 onnxruntime 会话配置
+
+    Args:
+        intra_op_threads: 单个算子内部的并行线程数
+        inter_op_threads: 算子之间的并行线程数
+        optimization_level: 图优化级别，disable / basic / extended / all
+
+    Returns:
+        onnxruntime.SessionOptions: 会话配置
+
+    Raises:
+        ValueError: 图优化级别不受支持时抛出
+    """
+    import onnxruntime
+
+    if optimization_level not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"Unsupported ONNX graph optimization level: {optimization_level}")
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    # 算子间并行只有在并行执行模式下才生效
+    options.execution_mode = (
+        onnxruntime.ExecutionMode.ORT_PARALLEL if inter_op_threads > 1 else onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    )
+    options.graph_optimization_level = getattr(
+        onnxruntime.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[optimization_level]
+    )
+    options.log_severity_level = 3
+    return options
+
+
+class OnnxASRModel:
+    """基于 onnxruntime 的识别模型，generate 接口与 funasr.AutoModel 一致，可直接替换"""
+
+    def __init__(self, model_dir: str, cache_dir: str, intra_op_threads: int = 4,
+                 inter_op_threads: int = 1, optimization_level: str = "all"):
+        try:
+            import onnxruntime
+            from funasr_onnx import Paraformer
+        except ImportError as e:
+            raise RuntimeError("ONNX backend requires onnxruntime and funasr-onnx: pip install onnxruntime funasr-onnx") from e
+
+        self.export_dir = export_dir_for(model_dir, cache_dir)
+        model_file = ensure_exported(model_dir, self.export_dir)
+        session_options = make_session_options(intra_op_threads, inter_op_threads, optimization_level)
+
+        self.recognizer = Paraformer(self.export_dir, intra_op_num_threads=intra_op_threads)
+        # funasr_onnx 只支持配置 intra-op 线程数，按完整配置重建推理会话
+        self.recognizer.ort_infer.session = onnxruntime.InferenceSession(
+            model_file, sess_options=session_options, providers=["CPUExecutionProvider"]
+        )
+
+    def generate(self, input: list, batch_size: int = 1, **kwargs) -> list:
+        """批量识别PCM音频
+
+        热词、语言、ITN 等参数仅适用于 PyTorch 模型，此处忽略。
+
+        Args:
+            input: 16kHz单声道float32 PCM数组的列表
+            batch_size: 单次推理的最大批大小
+
+        Returns:
+            list: [{"text": "xxx"}, ...]，与输入一一对应
+        """
+        from funasr_onnx.utils.utils import ONNXRuntimeError
+
+        waveforms = [np.asarray(audio, dtype=np.float32) for audio in input]
+        results = []
+        for start in range(0, len(waveforms), max(1, batch_size)):
+            batch = waveforms[start:start + max(1, batch_size)]
+            if len(batch) == 1:
+                results.append(self._recognize_one(batch[0]))
+                continue
+            try:
+                results.extend(self._recognize(batch))
+            except ONNXRuntimeError:
+                # 一条输入出错会使整批推理失败，逐条重试，不影响同批的其他输入
+                results.extend(self._recognize_one(audio) for audio in batch)
+        return results
+
+    def _recognize(self, batch: list) -> list:
+        """对一批PCM音频推理并解码"""
+        from funasr_onnx.utils.postprocess_utils import sentence_postprocess
+
+        feats, feats_len = self.recognizer.extract_feat(batch)
+        outputs = self.recognizer.infer(feats, feats_len)
+        return [{"text": sentence_postprocess(tokens)[0]} for tokens in self.recognizer.decode(outputs[0], outputs[1])]
+
+    def _recognize_one(self, audio: np.ndarray) -> dict:
+        """单独识别一段PCM音频，静音或噪声输入导致推理报错时按空文本处理"""
+        from funasr_onnx.utils.utils import ONNXRuntimeError
+
+        try:
+            return self._recognize([audio])[0]
+        except ONNXRuntimeError as e:
+            print(f"ONNX inference failed on {len(audio) / 16000:.2f}s of audio, returning empty text: {e}")
+            return {"text": ""}
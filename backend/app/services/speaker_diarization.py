@@ -1,4 +1,37 @@
+import threading
+import numpy as np
+from funasr import AutoModel
+from app.core.config import settings
+from app.services.speaker_registry import speaker_registry
+from app.utils.clustering import cluster_embeddings, l2_normalize
+
+
+def speaker_name(index: int) -> str:
+    """按首次发言顺序命名说话人：第一位为主持人，其余依次为嘉宾、嘉宾2、嘉宾3……"""
+    if index == 0:
+        return "主持人"
+    return "嘉宾" if index == 1 else f"嘉宾{index}"
+
+
 class SpeakerDiarizationService:
+    """说话人分离服务
+
+    识别过程中先按句子交替分配临时说话人；整段识别完成后在每个句子的时间范围内滑窗提取
+    CAM++ 说话人嵌入，聚类后按窗口投票为每个句子重新确定说话人。各聚类的中心在声纹库中
+    找到匹配时使用登记的名称。
+    """
+
+    def __init__(self, model_dir: str = None, enabled: bool = True, sample_rate: int = 16000, registry=None):
+        self.model_dir = model_dir or settings.DIARIZATION_MODEL_DIR
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.registry = registry
+        self.model = None
+        self.load_error = None
+        self._load_lock = threading.Lock()
+        # AutoModel.generate 会把本次调用的参数合并进共享配置，并发调用必须串行
+        self._generate_lock = threading.Lock()
+
     @staticmethod
     def separate_speakers(text: str) -> list:
         """分离说话人，将文本分配给不同的说话人
@@ -23,17 +56,241 @@ class SpeakerDiarizationService:
         return transcription
     
     @staticmethod
-    def improve_diarization(transcription: list, audio_features: dict = None) -> list:
+    def assign_speakers(segments: list, turn_offset: int = 0) -> list:
+        """为带时间戳的识别片段分配说话人
+        
+        片段按句号拆分为句子，句子的起止时间按字数在片段内线性插值。
+        
+        Args:
+            segments: 识别片段，格式为 [{"start": 0.0, "end": 12.3, "text": "xxx"}, ...]
+            turn_offset: 之前已分配的句子数，增量处理时用于延续说话人轮换
+            
+        Returns:
+            list: 带有说话人和时间的转录结果，格式为 [{"speaker": "主持人", "text": "xxx", "start": 0.0, "end": 3.2}, ...]
+        """
+        transcription = []
+        for segment in segments:
+            sentences = [sentence.strip() for sentence in segment["text"].split('。') if sentence.strip()]
+            total_chars = sum(len(sentence) for sentence in sentences) or 1
+            duration = segment["end"] - segment["start"]
+            cursor = segment["start"]
+            for sentence in sentences:
+                end = cursor + duration * len(sentence) / total_chars
+                transcription.append({
+                    "speaker": "主持人" if (turn_offset + len(transcription)) % 2 == 0 else "嘉宾",
+                    "text": sentence + "。",
+                    "start": round(cursor, 3),
+                    "end": round(end, 3)
+                })
+                cursor = end
+        
+        return transcription
+    
+    def improve_diarization(self, transcription: list, audio_features: dict = None) -> list:
         """改进说话人分离结果
         
         Args:
             transcription: 初步的说话人分离结果
-            audio_features: 音频特征，如说话人嵌入、语调等
+            audio_features: 音频特征，包含 audio（16kHz单声道float32 PCM）和可选的 offset（音频起始时间，秒）
+            
+        Returns:
+            list: 改进后的说话人分离结果，未提供音频时原样返回
+        """
+        if not audio_features or audio_features.get("audio") is None:
+            return transcription
+        return self.diarize(audio_features["audio"], transcription, audio_features.get("offset", 0.0))
+    
+    def load_model(self) -> bool:
+        """按需加载说话人嵌入模型（幂等），加载失败后不再重试
+        
+        Returns:
+            bool: 模型是否可用
+        """
+        with self._load_lock:
+            if self.model is not None:
+                return True
+            if self.load_error is not None:
+                return False
+            print("Loading speaker embedding model...")
+            try:
+                self.model = AutoModel(
+                    model=self.model_dir,
+                    disable_update=settings.DISABLE_UPDATE,
+                    device=settings.DEVICE,
+                    ncpu=settings.NCPU,
+                    disable_pbar=True,
+                )
+                print("Speaker embedding model loaded successfully!")
+                return True
+            except Exception as e:
+                print(f"Speaker embedding model loading failed: {e}")
+                self.load_error = str(e)
+                return False
+    
+    def make_windows(self, transcription: list, total_samples: int, offset: float = 0.0) -> tuple:
+        """在每个句子的时间范围内划分等长的嵌入窗口
+        
+        短于窗口长度的句子取以其为中心的一个窗口，所有窗口等长，批量提取时无需补零。
+        
+        Args:
+            transcription: 带时间的句子列表，时间为源文件中的绝对时间
+            total_samples: 音频采样数
+            offset: 音频起始时间（秒）
+            
+        Returns:
+            tuple: (bounds, owners)，bounds 为每个窗口的 [起始采样, 结束采样]，owners 为窗口所属句子的下标
+        """
+        window = min(int(settings.DIARIZATION_WINDOW_SECONDS * self.sample_rate), total_samples)
+        step = max(1, int(settings.DIARIZATION_STEP_SECONDS * self.sample_rate))
+        bounds = []
+        owners = []
+        if window <= 0:
+            return np.zeros((0, 2), dtype=np.int64), np.zeros(0, dtype=np.int64)
+        for index, item in enumerate(transcription):
+            first = int(round((item["start"] - offset) * self.sample_rate))
+            last = int(round((item["end"] - offset) * self.sample_rate))
+            first, last = max(0, first), min(total_samples, last)
+            if last <= first:
+                continue
+            if last - first <= window:
+                starts = [(first + last - window) // 2]
+            else:
+                starts = list(range(first, last - window + 1, step))
+                if starts[-1] != last - window:
+                    starts.append(last - window)
+            for start in starts:
+                start = min(max(0, start), total_samples - window)
+                bounds.append((start, start + window))
+                owners.append(index)
+        return np.array(bounds, dtype=np.int64).reshape(-1, 2), np.array(owners, dtype=np.int64)
+    
+    def extract_embeddings(self, audio: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+        """分批提取每个窗口的说话人嵌入
+        
+        Args:
+            audio: 16kHz单声道float32 PCM数组
+            bounds: 窗口的 [起始采样, 结束采样]
+            
+        Returns:
+            np.ndarray: 说话人嵌入，每行对应一个窗口
+        """
+        batch_size = max(1, settings.DIARIZATION_BATCH_SIZE)
+        embeddings = []
+        for start in range(0, len(bounds), batch_size):
+            windows = [np.asarray(audio[first:last], dtype=np.float32) for first, last in bounds[start:start + batch_size]]
+            with self._generate_lock:
+                results = self.model.generate(input=windows, batch_size=len(windows), disable_pbar=True)
+            for result in results:
+                embedding = result["spk_embedding"]
+                if hasattr(embedding, "cpu"):
+                    embedding = embedding.cpu().numpy()
+                embeddings.append(np.asarray(embedding, dtype=np.float32).reshape(-1, np.shape(embedding)[-1]))
+        return np.concatenate(embeddings) if embeddings else np.zeros((0, 0), dtype=np.float32)
+    
+    def embed_audio(self, audio: np.ndarray) -> np.ndarray:
+        """对一段只含单个说话人的音频滑窗提取嵌入，用于登记声纹
+        
+        Args:
+            audio: 16kHz单声道float32 PCM数组
+            
+        Returns:
+            np.ndarray: 每个窗口的说话人嵌入
+            
+        Raises:
+            RuntimeError: 说话人嵌入模型不可用时抛出
+        """
+        if not self.load_model():
+            raise RuntimeError(f"Speaker embedding model unavailable: {self.load_error}")
+        bounds, _ = self.make_windows([{"start": 0.0, "end": len(audio) / self.sample_rate}], len(audio))
+        return self.extract_embeddings(audio, bounds)
+    
+    @staticmethod
+    def cluster_centroids(embeddings: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """计算每个聚类的归一化中心"""
+        x = l2_normalize(embeddings)
+        onehot = (labels[:, None] == np.arange(int(labels.max()) + 1)).astype(np.float32)
+        return l2_normalize(onehot.T @ x)
+    
+    def label_sentences(self, transcription: list, labels: np.ndarray, owners: np.ndarray, names: list = None) -> list:
+        """按窗口投票确定每个句子的说话人，没有窗口的句子沿用上一句的说话人
+        
+        Args:
+            transcription: 句子列表
+            labels: 每个窗口的聚类编号
+            owners: 每个窗口所属句子的下标
+            names: 每个聚类在声纹库中匹配到的名称，未匹配为 None
             
         Returns:
-            list: 改进后的说话人分离结果
+            list: 更新了 speaker 的句子列表（新对象，不修改输入）
         """
-        # 这里可以实现更复杂的说话人分离算法
-        # 例如：基于说话人嵌入的聚类、基于语调的说话人识别等
-        # 目前返回原始结果
-        return transcription
\ No newline at end of file
+        votes = np.zeros((len(transcription), int(labels.max()) + 1 if len(labels) else 1), dtype=np.int64)
+        np.add.at(votes, (owners, labels), 1)
+        sentence_labels = []
+        previous = 0
+        for row in votes:
+            previous = int(np.argmax(row)) if row.any() else previous
+            sentence_labels.append(previous)
+        # 投票后部分簇可能不再出现，按句子中首次出现的顺序重新编号
+        order = {}
+        for label in sentence_labels:
+            order.setdefault(label, len(order))
+        names = names or []
+        speakers = {label: (names[label] if label < len(names) and names[label] else speaker_name(index))
+                    for label, index in order.items()}
+        return [dict(item, speaker=speakers[label]) for item, label in zip(transcription, sentence_labels)]
+    
+    def diarize(self, audio: np.ndarray, transcription: list, offset: float = 0.0, num_speakers: int = None) -> list:
+        """基于说话人嵌入为整段转录重新分配说话人
+        
+        嵌入提取按批进行，聚类时两两相似度分块计算，内存占用与节目时长无关。
+        聚类中心与声纹库批量比对，认出的说话人使用登记的名称。模型不可用或分离失败时保留原有的说话人标注。
+        
+        Args:
+            audio: 16kHz单声道float32 PCM数组
+            transcription: 带时间的句子列表
+            offset: 音频在源文件中的起始时间（秒）
+            num_speakers: 已知说话人数，默认使用配置，为0时自动估计
+            
+        Returns:
+            list: 带有说话人和时间的转录结果
+        """
+        if not self.enabled or not transcription or not self.load_model():
+            return transcription
+        try:
+            bounds, owners = self.make_windows(transcription, len(audio), offset)
+            if len(bounds) == 0:
+                return transcription
+            embeddings = self.extract_embeddings(audio, bounds)
+            labels = cluster_embeddings(
+                embeddings,
+                threshold=settings.DIARIZATION_THRESHOLD,
+                num_clusters=num_speakers or settings.DIARIZATION_NUM_SPEAKERS or None,
+                max_micro_clusters=settings.DIARIZATION_MAX_MICRO_CLUSTERS,
+                block_size=settings.DIARIZATION_BLOCK_SIZE
+            )
+            names = None
+            if self.registry is not None:
+                matches = self.registry.match(self.cluster_centroids(embeddings, labels))
+                names = [match["name"] if match else None for match in matches]
+            return self.label_sentences(transcription, labels, owners, names)
+        except Exception as e:
+            print(f"Speaker diarization failed: {e}")
+            return transcription
+    
+    def stats(self) -> dict:
+        """获取说话人分离状态"""
+        return {
+            "enabled": self.enabled,
+            "model": self.model_dir,
+            "model_loaded": self.model is not None,
+            "error": self.load_error
+        }
+
+
+# 创建全局说话人分离服务实例
+speaker_service = SpeakerDiarizationService(
+    model_dir=settings.DIARIZATION_MODEL_DIR,
+    enabled=settings.DIARIZATION_ENABLED,
+    sample_rate=settings.AUDIO_SAMPLE_RATE,
+    registry=speaker_registry
+)
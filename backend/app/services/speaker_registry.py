@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+import uuid
+import numpy as np
+from app.core.config import settings
+from app.utils.clustering import l2_normalize
+
+
+class SpeakerRegistry:
+    """声纹库：保存已登记说话人的嵌入向量，用于在不同节目中认出同一位主持人
+
+    嵌入以归一化后的 float32 矩阵保存为 embeddings.npy，行号与 speakers.json 中的说话人一一对应；
+    查询时一次矩阵乘法即可得到所有待查向量与所有已登记说话人的余弦相似度。
+    """
+
+    def __init__(self, directory: str, threshold: float = 0.6):
+        self.directory = directory
+        self.threshold = threshold
+        # (嵌入矩阵, 说话人列表)，整体替换，查询时无需加锁
+        self._snapshot = None
+        self._revision = 0
+        self._lock = threading.Lock()
+
+    @property
+    def revision(self) -> int:
+        """声纹库版本号，每次登记或删除后单调递增，参与转录缓存键计算"""
+        self._load()
+        return self._revision
+
+    def list_speakers(self) -> list:
+        """列出已登记的说话人
+
+        Returns:
+            list: [{"id", "name", "metadata", "samples", "enrolled_at", "updated_at"}, ...]
+        """
+        return [dict(entry) for entry in self._load()[1]]
+
+    def enroll(self, name: str, embeddings: np.ndarray, metadata: dict = None) -> dict:
+        """登记说话人；同名说话人已存在时把新样本并入其声纹
+
+        Args:
+            name: 说话人名称
+            embeddings: 一个或多个说话人嵌入
+            metadata: 附加信息，如所属节目
+
+        Returns:
+            dict: 登记后的说话人信息
+
+        Raises:
+            ValueError: 名称为空、嵌入为空或维度与已登记嵌入不一致时抛出
+        """
+        name = (name or "").strip()
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if not name:
+            raise ValueError("Speaker name is required")
+        if embeddings.size == 0:
+            raise ValueError("No speaker embedding to enroll")
+        vector = l2_normalize(l2_normalize(embeddings).mean(axis=0, keepdims=True))[0]
+
+        with self._lock:
+            matrix, entries = self._load()
+            if len(entries) and matrix.shape[1] != len(vector):
+                raise ValueError(f"Embedding dimension {len(vector)} does not match registry ({matrix.shape[1]})")
+            now = time.time()
+            entries = [dict(entry) for entry in entries]
+            index = next((i for i, entry in enumerate(entries) if entry["name"] == name), None)
+            if index is None:
+                entry = {"id": uuid.uuid4().hex, "name": name, "metadata": metadata or {},
+                         "samples": len(embeddings), "enrolled_at": now, "updated_at": now}
+                entries.append(entry)
+                matrix = np.vstack([matrix.reshape(-1, len(vector)), vector[None, :]])
+            else:
+                # 按样本数加权合并新旧声纹
+                entry = entries[index]
+                merged = matrix[index] * entry["samples"] + vector * len(embeddings)
+                matrix = matrix.copy()
+                matrix[index] = l2_normalize(merged[None, :])[0]
+                entry["samples"] += len(embeddings)
+                entry["metadata"] = {**entry["metadata"], **(metadata or {})}
+                entry["updated_at"] = now
+            self._save(matrix, entries)
+            return dict(entry)
+
+    def remove(self, speaker_id: str) -> bool:
+        """删除说话人
+
+        Args:
+            speaker_id: 说话人ID
+
+        Returns:
+            bool: 是否找到并删除
+        """
+        with self._lock:
+            matrix, entries = self._load()
+            keep = [i for i, entry in enumerate(entries) if entry["id"] != speaker_id]
+            if len(keep) == len(entries):
+                return False
+            self._save(matrix[keep], [entries[i] for i in keep])
+            return True
+
+    def match(self, embeddings: np.ndarray, threshold: float = None) -> list:
+        """批量查找与每个嵌入最相似的已登记说话人
+
+        所有查询与所有声纹的相似度由一次矩阵乘法得到；按相似度从高到低分配，同一说话人只分配给一个查询。
+
+        Args:
+            embeddings: 待查的说话人嵌入，每行一个（如各聚类的中心）
+            threshold: 余弦相似度阈值，默认使用实例配置
+
+        Returns:
+            list: 与输入一一对应，匹配时为 {"id", "name", "score"}，否则为 None
+        """
+        threshold = self.threshold if threshold is None else threshold
+        matrix, entries = self._load()
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        results = [None] * len(embeddings)
+        if not entries or embeddings.size == 0 or embeddings.shape[1] != matrix.shape[1]:
+            return results
+
+        sim = l2_normalize(embeddings) @ matrix.T
+        rows, cols = np.nonzero(sim >= threshold)
+        order = np.argsort(-sim[rows, cols], kind="stable")
+        used = set()
+        for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+            if results[row] is not None or col in used:
+                continue
+            used.add(col)
+            results[row] = {"id": entries[col]["id"], "name": entries[col]["name"],
+                            "score": round(float(sim[row, col]), 4)}
+        return results
+
+    def stats(self) -> dict:
+        """获取声纹库统计"""
+        matrix, entries = self._load()
+        return {
+            "speakers": len(entries),
+            "dimension": int(matrix.shape[1]) if len(entries) else None,
+            "threshold": self.threshold,
+            "revision": self._revision
+        }
+
+    def _paths(self) -> tuple:
+        """嵌入矩阵和说话人列表的文件路径"""
+        return os.path.join(self.directory, "embeddings.npy"), os.path.join(self.directory, "speakers.json")
+
+    def _load(self) -> tuple:
+        """加载声纹库；其他进程写入了更新的版本时重新加载，多进程部署下各工作进程看到同一份声纹库
+
+        以 speakers.json 中的版本号判断是否变化，不依赖文件修改时间的精度。
+        """
+        matrix_path, entries_path = self._paths()
+        try:
+            with open(entries_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = None
+        except Exception as e:
+            print(f"Failed to load speaker registry: {e}")
+            data = None
+        revision = data.get("revision", 0) if data is not None else 0
+        snapshot = self._snapshot
+        if snapshot is not None and revision == self._revision:
+            return snapshot
+        matrix, entries = np.zeros((0, 0), dtype=np.float32), []
+        if data is not None:
+            try:
+                entries = data["speakers"]
+                matrix = np.load(matrix_path).astype(np.float32)
+                if len(matrix) != len(entries):
+                    raise ValueError("embedding rows do not match speaker entries")
+            except Exception as e:
+                print(f"Failed to load speaker registry: {e}")
+                matrix, entries = np.zeros((0, 0), dtype=np.float32), []
+                # 可能恰好读到另一进程写入到一半的文件，下次查询时重试
+                self._snapshot = None
+                return matrix, entries
+        self._revision = revision
+        self._snapshot = (matrix, entries)
+        return self._snapshot
+
+    def _save(self, matrix: np.ndarray, entries: list):
+        """原子写入矩阵和列表后替换内存中的快照
+
+        版本号取纳秒时间戳与当前版本加一中的较大值：删除声纹库目录后重新登记时版本号也不会回到已用过的值，
+        不会与旧声纹库下的转录缓存键重复。
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        matrix_path, entries_path = self._paths()
+        revision = max(self._revision + 1, time.time_ns())
+        suffix = f".{os.getpid()}.tmp"
+        with open(matrix_path + suffix, "wb") as f:
+            np.save(f, matrix.astype(np.float32))
+        with open(entries_path + suffix, "w", encoding="utf-8") as f:
+            json.dump({"revision": revision, "speakers": entries}, f, ensure_ascii=False, indent=2)
+        os.replace(matrix_path + suffix, matrix_path)
+        os.replace(entries_path + suffix, entries_path)
+        self._revision = revision
+        self._snapshot = (matrix, entries)
+
+
+# 创建全局声纹库实例
+speaker_registry = SpeakerRegistry(
+    directory=settings.SPEAKER_REGISTRY_DIR,
+    threshold=settings.SPEAKER_MATCH_THRESHOLD
+)
@@ -0,0 +1,187 @@
+import threading
+import numpy as np
+from funasr import AutoModel
+from app.core.config import settings
+from app.utils.vad import frame_energy_db
+
+
+class StreamingSession:
+    """单个连接的流式识别会话，持有独立的 FunASR 流式缓存
+
+    音频帧累积到一个流式块（默认600ms）后送入模型，输出增量识别结果；
+    检测到足够长的尾部静音时以 is_final 结束当前句子并重置缓存。
+    """
+
+    def __init__(self, service, sample_rate: int = 16000):
+        self.service = service
+        self.sample_rate = sample_rate
+        self.cache = {}
+        self.pending = []
+        self.pending_samples = 0
+        self.partial = ""
+        self.samples_received = 0
+        self.sentence_start = 0
+        self.trailing_silence = 0
+        self.voiced = False  # 当前句子是否已有语音
+        self.chunk_stride = int(settings.STREAMING_CHUNK_SIZE[1] * 960)
+        self.endpoint_samples = int(sample_rate * settings.STREAMING_ENDPOINT_SILENCE_MS / 1000)
+        self.frame_size = int(sample_rate * 0.03)
+
+    def accept(self, pcm: np.ndarray) -> list:
+        """接收一段PCM音频
+
+        Args:
+            pcm: 16kHz单声道float32 PCM数组
+
+        Returns:
+            list: 事件列表，{"type": "partial", "text": "xxx"} 或
+                  {"type": "final", "text": "xxx", "start": 0.0, "end": 3.2}
+        """
+        if len(pcm) == 0:
+            return []
+        self.pending.append(pcm)
+        self.pending_samples += len(pcm)
+        self.samples_received += len(pcm)
+        self._update_silence(pcm)
+
+        # 句子已有内容且尾部静音足够长：结束当前句子
+        if self.trailing_silence >= self.endpoint_samples and (
+                self.partial or (self.voiced and self.pending_samples >= self.chunk_stride)):
+            return self._run(is_final=True)
+        if self.pending_samples >= self.chunk_stride:
+            return self._run(is_final=False)
+        return []
+
+    def finish(self) -> list:
+        """流结束，输出最后一个句子
+
+        Returns:
+            list: 事件列表
+        """
+        if self.pending_samples == 0 and not self.partial:
+            return []
+        return self._run(is_final=True)
+
+    def _update_silence(self, pcm: np.ndarray):
+        """更新尾部静音长度"""
+        energy = frame_energy_db(pcm, self.frame_size)
+        voiced = np.flatnonzero(energy > settings.STREAMING_SILENCE_DB)
+        if len(voiced) == 0:
+            self.trailing_silence += len(pcm)
+        else:
+            self.voiced = True
+            self.trailing_silence = len(pcm) - min(len(pcm), (int(voiced[-1]) + 1) * self.frame_size)
+
+    def _run(self, is_final: bool) -> list:
+        """把累积的音频送入模型并生成事件"""
+        audio = np.concatenate(self.pending) if self.pending else np.zeros(0, dtype=np.float32)
+        self.pending = []
+        self.pending_samples = 0
+
+        delta = self.service.generate_chunk(audio, self.cache, is_final)
+        events = []
+        if delta:
+            self.partial += delta
+            if not is_final:
+                events.append({"type": "partial", "text": self.partial})
+        if is_final:
+            if self.partial.strip():
+                events.append({
+                    "type": "final",
+                    "text": self.partial.strip(),
+                    "start": round(self.sentence_start / self.sample_rate, 3),
+                    "end": round(self.samples_received / self.sample_rate, 3)
+                })
+            # is_final 调用后模型已重置缓存，下一句从当前位置开始；
+            # 静音计数和语音标记一并清零，否则持续静音时会反复结束空句子
+            self.partial = ""
+            self.sentence_start = self.samples_received
+            self.trailing_silence = 0
+            self.voiced = False
+        return events
+
+
+class StreamingASRService:
+    """实时流式识别服务：按需加载流式模型，限制并发会话数"""
+
+    def __init__(self, max_sessions: int = 4):
+        self.model = None
+        self.max_sessions = max_sessions
+        self.active_sessions = 0
+        self._slots = threading.BoundedSemaphore(max_sessions)
+        self._load_lock = threading.Lock()
+        # AutoModel.generate 会把本次调用的参数合并进共享配置，不同会话的调用必须串行
+        self._generate_lock = threading.Lock()
+
+    def load_model(self):
+        """加载流式识别模型（幂等）
+
+        Raises:
+            RuntimeError: 模型加载失败时抛出
+        """
+        with self._load_lock:
+            if self.model is not None:
+                return
+            print("Loading FunASR streaming model...")
+            try:
+                self.model = AutoModel(
+                    model=settings.STREAMING_MODEL_DIR,
+                    disable_update=settings.DISABLE_UPDATE,
+                    device=settings.DEVICE,
+                    ncpu=settings.NCPU,
+                    disable_pbar=True,
+                )
+                print("Streaming model loaded successfully!")
+            except Exception as e:
+                print(f"Streaming model loading failed: {e}")
+                raise RuntimeError(f"Streaming model unavailable: {e}")
+
+    def try_acquire(self) -> bool:
+        """申请一个会话名额，达到并发上限时返回 False"""
+        if not self._slots.acquire(blocking=False):
+            return False
+        self.active_sessions += 1
+        return True
+
+    def release(self):
+        """归还会话名额"""
+        self.active_sessions -= 1
+        self._slots.release()
+
+    def create_session(self) -> StreamingSession:
+        """创建新的流式会话"""
+        return StreamingSession(self, sample_rate=settings.AUDIO_SAMPLE_RATE)
+
+    def generate_chunk(self, audio: np.ndarray, cache: dict, is_final: bool) -> str:
+        """对一段音频执行一次流式推理
+
+        Args:
+            audio: float32 PCM数组
+            cache: 会话的流式缓存
+            is_final: 是否为当前句子的最后一段
+
+        Returns:
+            str: 本次新增的识别文本
+        """
+        with self._generate_lock:
+            res = self.model.generate(
+                input=audio,
+                cache=cache,
+                is_final=is_final,
+                chunk_size=settings.STREAMING_CHUNK_SIZE,
+                encoder_chunk_look_back=settings.STREAMING_ENCODER_LOOK_BACK,
+                decoder_chunk_look_back=settings.STREAMING_DECODER_LOOK_BACK,
+            )
+        return res[0]["text"] if res else ""
+
+    def stats(self) -> dict:
+        """获取会话统计"""
+        return {
+            "model_loaded": self.model is not None,
+            "active_sessions": self.active_sessions,
+            "max_sessions": self.max_sessions
+        }
+
+
+# 创建全局流式识别服务实例
+streaming_asr_service = StreamingASRService(max_sessions=settings.STREAMING_MAX_SESSIONS)
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from app.core.config import settings
+from app.services.model_service import model_service
+from app.services.speaker_registry import speaker_registry
+
+
+class TranscriptionCache:
+    """基于内容寻址的转录结果磁盘缓存
+
+    键由音频内容哈希和影响识别结果的设置（推理后端、模型、量化方式、热词、语言、ITN）共同决定，
+    按最近使用顺序淘汰，总大小不超过 max_bytes。
+    """
+
+    def __init__(self, directory: str, max_bytes: int, enabled: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index = None  # key -> 文件大小，按最近使用排序
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def recognition_settings(options: dict = None) -> dict:
+        """影响识别文本的设置（推理后端、模型、量化方式、热词、语言、ITN）
+
+        Args:
+            options: 识别参数，包含 hotwords、language、itn、model，缺省项使用配置
+
+        Returns:
+            dict: 设置项
+        """
+        options = options or {}
+        model_dir = settings.ONNX_MODEL_DIR if settings.MODEL_BACKEND == "onnx" else settings.MODEL_DIR
+        return {
+            "backend": settings.MODEL_BACKEND,
+            "model": settings.MODELS[options["model"]] if options.get("model") else model_dir,
+            # 实际生效的量化方式：GPU 推理或量化失败时即使配置了 int8 也保持 fp32；
+            # 按需加载的模型与默认模型使用相同的量化配置和设备
+            "quantize": model_service.quantization,
+            "hotwords": list(settings.HOTWORDS if options.get("hotwords") is None else options["hotwords"]),
+            "language": settings.LANGUAGE if options.get("language") is None else options["language"],
+            "itn": settings.ITN if options.get("itn") is None else options["itn"]
+        }
+
+    @staticmethod
+    def make_key(audio_hash: str, options: dict = None, time_range: tuple = None) -> str:
+        """生成缓存键
+
+        Args:
+            audio_hash: 音频内容的SHA-256
+            options: 识别参数，包含 hotwords、language、itn，缺省项使用配置
+            time_range: 只转录的时间窗口 (start, end)，None 表示整段音频
+
+        Returns:
+            str: 缓存键（十六进制SHA-256）
+        """
+        material = {
+            "audio": audio_hash,
+            **TranscriptionCache.recognition_settings(options),
+            "diarization": settings.DIARIZATION_MODEL_DIR if settings.DIARIZATION_ENABLED else None,
+            # 声纹库变化后已缓存结果中的说话人名称可能过期
+            "speakers": speaker_registry.revision if settings.DIARIZATION_ENABLED else None
+        }
+        if time_range is not None:
+            # 整段音频不加此项，已有的缓存键保持不变
+            material["range"] = list(time_range)
+        return hashlib.sha256(json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """读取缓存结果
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的转录结果，未命中时返回 None
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    result = json.load(f)
+                os.utime(path)
+            except Exception as e:
+                print(f"Failed to read transcription cache {key}: {e}")
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result):
+        """写入缓存结果，超出容量时淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            result: 可JSON序列化的转录结果
+        """
+        if not self.enabled:
+            return
+        data = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self._load_index()
+            path = self._path(key)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except Exception as e:
+                print(f"Failed to write transcription cache {key}: {e}")
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                return
+            if key in self._index:
+                self._total_bytes -= self._index.pop(key)
+            self._index[key] = len(data)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                self._remove(next(iter(self._index)))
+                self.evictions += 1
+
+    def purge(self) -> int:
+        """清空缓存
+
+        Returns:
+            int: 删除的条目数
+        """
+        with self._lock:
+            self._load_index()
+            removed = len(self._index)
+            for key in list(self._index):
+                self._remove(key)
+            return removed
+
+    def stats(self) -> dict:
+        """获取缓存命中与容量统计
+
+        Returns:
+            dict: 统计信息
+        """
+        with self._lock:
+            self._load_index()
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._index),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+    def _path(self, key: str) -> str:
+        """缓存文件路径"""
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        """首次使用时扫描缓存目录，按修改时间重建最近使用顺序"""
+        if self._index is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(size for _, _, size in entries)
+
+    def _remove(self, key: str):
+        """删除单个缓存条目"""
+        self._total_bytes -= self._index.pop(key, 0)
+        path = self._path(key)
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+# 创建全局转录缓存实例
+transcription_cache = TranscriptionCache(
+    directory=settings.CACHE_DIR,
+    max_bytes=settings.CACHE_MAX_BYTES,
+    enabled=settings.CACHE_ENABLED
+)
@@ -0,0 +1,470 @@
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from app.core.config import settings
+from app.services.job_store import job_store
+from app.utils.cancellation import Cancelled, CancelToken
+from app.utils.metrics import percentile
+from app.utils.priority import PRIORITY_CLASSES, effective_priority, priority_rank
+
+
+class TranscriptionJob:
+    """转录任务，记录状态、进度、耗时和结果"""
+
+    def __init__(self, task, metadata: dict = None, cancel_token: CancelToken = None, priority: str = "normal",
+                 job_id: str = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.task = task
+        self.metadata = metadata or {}
+        self.cancel_token = cancel_token or CancelToken()
+        self.priority = priority
+        self.rank = priority_rank(priority)
+        self.state = "queued"  # queued / running / completed / failed / cancelled
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = Future()
+        self.persistent = False  # 是否记录在任务库中
+        self.store_result = True  # 结束时是否把结果写入任务库，同步返回结果的请求不需要
+        self.key = None  # 合并相同请求使用的转录缓存键
+        self.holders = 1  # 共用该任务的请求数
+        self._published = []
+        self._listeners = []
+        self._closed = False
+        self._listen_lock = threading.Lock()
+
+    def set_progress(self, progress: float):
+        """更新任务进度
+
+        Args:
+            progress: 进度百分比（0-100）
+        """
+        self.progress = round(min(max(float(progress), 0.0), 100.0), 1)
+
+    def cancel(self, reason: str = "cancelled"):
+        """取消任务：排队中的任务不再执行，执行中的任务在下一个片段边界停止
+
+        Args:
+            reason: 取消原因
+        """
+        self.cancel_token.cancel(reason)
+
+    def subscribe(self, callback):
+        """订阅任务产生的句子，先按顺序补发已产生的句子；任务结束后订阅时补发最终结果
+
+        Args:
+            callback: 句子回调，在工作线程或调用线程中调用
+        """
+        with self._listen_lock:
+            if self._closed:
+                # 任务已结束，已推送的句子已释放，按最终结果补发
+                for item in self.result or []:
+                    callback(item)
+                return
+            for item in self._published:
+                callback(item)
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        """取消订阅"""
+        with self._listen_lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def publish(self, item: dict):
+        """把一条句子推送给所有订阅者"""
+        with self._listen_lock:
+            if self._closed:
+                return
+            self._published.append(item)
+            for callback in list(self._listeners):
+                callback(item)
+
+    def close(self):
+        """任务结束后释放已推送的句子和订阅者回调，回调可能引用请求的事件循环和队列"""
+        with self._listen_lock:
+            self._closed = True
+            self._published = []
+            self._listeners = []
+
+    @property
+    def queue_wait(self) -> float:
+        """排队等待时间（秒）"""
+        if self.started_at is None:
+            return time.time() - self.created_at
+        return self.started_at - self.created_at
+
+    @property
+    def run_time(self) -> float:
+        """执行时间（秒），未开始时为 None"""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        """转换为API响应格式
+
+        Args:
+            include_result: 是否包含转录结果
+
+        Returns:
+            dict: 任务状态信息
+        """
+        data = {
+            "job_id": self.id,
+            "state": self.state,
+            "priority": self.priority,
+            "progress": self.progress,
+            "metadata": self.metadata,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "queue_wait": round(self.queue_wait, 3),
+            "run_time": round(self.run_time, 3) if self.run_time is not None else None,
+            "deadline": self.cancel_token.deadline,
+            "error": self.error
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class TranscriptionJobManager:
+    """转录任务管理器：有界优先级队列加固定数量的推理工作线程
+
+    空闲的工作线程取出老化后优先级最高的任务，同等优先级先到先出。
+    reserved_workers 个工作线程只执行 interactive 任务，批量回填占满其余线程时交互任务仍能立即开始。
+    提交时附带续转参数的任务写入任务库，状态变化随之更新，服务重启后可以查询和续转。
+    提交时指定合并键的任务在结束前可被相同请求附着，附着的请求共用同一次推理的结果；
+    任务记录共用它的请求数，只有最后一个请求撤回时才真正取消。
+    工作线程在第一次提交任务时才启动，避免在导入模块或派生子进程前创建线程。
+    """
+
+    def __init__(self, max_workers: int = 1, max_queue_size: int = 0, retention_seconds: float = 3600,
+                 aging_seconds: float = 30, reserved_workers: int = 0, store=None,
+                 store_prune_interval: float = 60):
+        self.max_workers = max_workers
+        self.store = store
+        self.store_prune_interval = store_prune_interval
+        self.max_queue_size = max_queue_size
+        self.retention_seconds = retention_seconds
+        self.aging_seconds = aging_seconds
+        # 至少留一个线程给非交互任务
+        self.reserved_workers = min(max(0, reserved_workers), max_workers - 1)
+        self.jobs = {}
+        self.busy_workers = 0
+        self.busy_background = 0
+        self.recent_timings = deque(maxlen=200)
+        self.coalesced_requests = 0
+        self._active = {}
+        self._pending = []
+        self._reserved = 0
+        self._store_pruned_at = 0.0
+        self._workers = []
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._stopping = False
+        self._generation = 0
+
+    def submit(self, task, metadata: dict = None, cancel_token: CancelToken = None,
+               priority: str = "normal", record: dict = None, job_id: str = None,
+               key: str = None, store_result: bool = True) -> TranscriptionJob:
+        """提交转录任务
+
+        Args:
+            task: 可调用对象，接收任务对象作为参数并返回转录结果
+            metadata: 任务附加信息，如文件名
+            cancel_token: 取消令牌，携带请求的截止时间
+            priority: 调度优先级 interactive / normal / bulk
+            record: 续转所需的请求参数，提供时任务写入任务库
+            job_id: 续转任务库中已有的任务时沿用其ID
+            key: 合并键，任务结束前相同键的请求可通过 attach 附着到该任务
+            store_result: 任务写入任务库时是否同时写入结果
+
+        Returns:
+            TranscriptionJob: 新建的任务
+
+        Raises:
+            queue.Full: 队列已满时抛出
+            ValueError: 未知的优先级
+        """
+        job = TranscriptionJob(task, metadata, cancel_token, priority, job_id)
+        job.store_result = store_result
+        self._prune_store()
+        with self._condition:
+            self._prune()
+            if self.max_queue_size > 0 and len(self._pending) + self._reserved >= self.max_queue_size:
+                raise queue.Full
+            # 写任务库期间不持有锁，先占住队列位置
+            self._reserved += 1
+        try:
+            if self.store is not None and self.store.enabled and record is not None:
+                job.persistent = True
+                if job_id is None:
+                    self.store.create(job, record)
+                else:
+                    self.store.update(job)
+        except BaseException:
+            with self._condition:
+                self._reserved -= 1
+            raise
+        with self._condition:
+            self._reserved -= 1
+            self._ensure_workers()
+            self._pending.append(job)
+            self.jobs[job.id] = job
+            if key is not None:
+                job.key = key
+                self._active[key] = job
+            self._condition.notify_all()
+        return job
+
+    def attach(self, key: str, priority: str = None) -> TranscriptionJob:
+        """附着到相同合并键的未结束任务，不再重复推理
+
+        附着请求的优先级更高且任务仍在排队时，任务提升到该优先级。
+
+        Args:
+            key: 合并键
+            priority: 附着请求的调度优先级
+
+        Returns:
+            TranscriptionJob: 附着的任务，没有可附着的任务时返回 None
+        """
+        with self._condition:
+            job = self._active.get(key)
+            # 最后一个请求已撤回的任务即将取消，不再附着
+            if job is None or job.holders <= 0 or job.future.done() or job.cancel_token.cancelled:
+                return None
+            job.holders += 1
+            self.coalesced_requests += 1
+            if priority is not None and priority_rank(priority) < job.rank and job in self._pending:
+                job.priority = priority
+                job.rank = priority_rank(priority)
+                self._condition.notify_all()
+            return job
+
+    def release(self, job: TranscriptionJob, reason: str = "cancelled"):
+        """撤回一个共用任务的请求，没有请求等待时取消任务
+
+        Args:
+            job: 转录任务
+            reason: 取消原因
+        """
+        with self._condition:
+            job.holders -= 1
+            # 在锁内取消，避免其他请求在计数归零与取消之间附着到即将取消的任务
+            if job.holders <= 0:
+                job.cancel(reason)
+
+    def add_completed(self, result, metadata: dict = None) -> TranscriptionJob:
+        """登记一个无需执行即已完成的任务，例如命中转录缓存
+
+        Args:
+            result: 任务结果
+            metadata: 任务附加信息
+
+        Returns:
+            TranscriptionJob: 已完成的任务
+        """
+        job = TranscriptionJob(None, metadata)
+        job.state = "completed"
+        job.result = result
+        job.set_progress(100)
+        job.started_at = job.finished_at = job.created_at
+        job.future.set_result(result)
+        self._prune_store()
+        with self._lock:
+            self._prune()
+            self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> TranscriptionJob:
+        """按ID获取任务，不存在时返回 None"""
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> TranscriptionJob:
+        """撤回一个提交该任务的请求，任务不存在时返回 None；多个请求共用的任务在最后一个请求撤回时取消"""
+        job = self.jobs.get(job_id)
+        if job is not None and not job.future.done():
+            self.release(job)
+        return job
+
+    def stats(self) -> dict:
+        """获取队列深度、工作线程占用和任务耗时统计
+
+        Returns:
+            dict: 统计信息
+        """
+        states = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "cancelled": 0}
+        classes = {priority: {"queued": 0, "running": 0} for priority in PRIORITY_CLASSES}
+        for job in list(self.jobs.values()):
+            states[job.state] = states.get(job.state, 0) + 1
+            if job.state in ("queued", "running"):
+                classes[job.priority][job.state] += 1
+
+        timings = list(self.recent_timings)
+        waits = sorted(t[0] for t in timings)
+        runs = sorted(t[1] for t in timings)
+
+        return {
+            "workers": self.max_workers,
+            "busy_workers": self.busy_workers,
+            "reserved_workers": self.reserved_workers,
+            "queue_depth": len(self._pending),
+            "jobs": states,
+            "coalesced_requests": self.coalesced_requests,
+            "timings": {
+                "samples": len(timings),
+                "avg_queue_wait": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p95_queue_wait": round(percentile(waits, 95), 3),
+                "avg_run_time": round(sum(runs) / len(runs), 3) if runs else 0.0,
+                "p95_run_time": round(percentile(runs, 95), 3)
+            },
+            "priorities": {
+                priority: dict(classes[priority], **self._class_waits([t[0] for t in timings if t[2] == priority]))
+                for priority in PRIORITY_CLASSES
+            }
+        }
+
+    @staticmethod
+    def _class_waits(waits: list) -> dict:
+        """单个优先级的排队等待统计"""
+        waits = sorted(waits)
+        return {
+            "avg_queue_wait": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95_queue_wait": round(percentile(waits, 95), 3)
+        }
+
+    def shutdown(self):
+        """停止工作线程，未开始的任务保留在队列中"""
+        with self._condition:
+            self._stopping = True
+            self._generation += 1
+            self._workers = []
+            self._condition.notify_all()
+
+    def _ensure_workers(self):
+        """按需启动工作线程"""
+        self._stopping = False
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, args=(self._generation,),
+                                      name=f"transcription-worker-{len(self._workers)}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _worker_loop(self, generation: int):
+        """工作线程主循环：逐个取出任务并执行，shutdown 之后启动的新一代线程接替时退出"""
+        while True:
+            with self._condition:
+                job = None
+                while not self._stopping and generation == self._generation:
+                    job = self._take()
+                    if job is not None:
+                        break
+                    self._condition.wait()
+                if job is None:
+                    return
+                self.busy_workers += 1
+                if job.priority != "interactive":
+                    self.busy_background += 1
+            self._run(job)
+
+    def _take(self) -> TranscriptionJob:
+        """取出老化后优先级最高的可执行任务，没有时返回 None
+
+        非交互任务最多占用 max_workers - reserved_workers 个工作线程。
+        """
+        background_full = self.busy_background >= self.max_workers - self.reserved_workers
+        candidates = [job for job in self._pending if job.priority == "interactive" or not background_full]
+        if not candidates:
+            return None
+        now = time.time()
+        job = min(candidates, key=lambda j: (effective_priority(j.rank, now - j.created_at, self.aging_seconds),
+                                              j.created_at))
+        self._pending.remove(job)
+        return job
+
+    def _run(self, job: TranscriptionJob):
+        """执行单个任务并记录耗时"""
+        job.state = "running"
+        job.started_at = time.time()
+        self._persist(job)
+        try:
+            # 排队期间已取消或超时的任务不再执行
+            job.cancel_token.check()
+            job.result = job.task(job)
+            job.state = "completed"
+            job.set_progress(100)
+            job.future.set_result(job.result)
+        except Cancelled as e:
+            print(f"Transcription job {job.id} {e.reason}")
+            job.state = "cancelled"
+            job.error = e.reason
+            job.future.set_exception(e)
+        except Exception as e:
+            print(f"Transcription job {job.id} failed: {e}")
+            job.state = "failed"
+            job.error = str(getattr(e, "detail", e))
+            job.future.set_exception(e)
+        finally:
+            # 释放任务闭包中引用的音频数据，以及已推送的句子和订阅者
+            job.task = None
+            job.close()
+            job.finished_at = time.time()
+            # 服务关闭时撤回了排队中的片段，由此失败的任务在任务库中保持未完成状态，重启后续转
+            if not (job.state == "failed" and self._stopping):
+                self._persist(job)
+            with self._condition:
+                if job.key is not None and self._active.get(job.key) is job:
+                    del self._active[job.key]
+                self.busy_workers -= 1
+                if job.priority != "interactive":
+                    self.busy_background -= 1
+                # 释放的线程可能可以执行此前受保留限制的任务
+                self._condition.notify_all()
+            self.recent_timings.append((job.queue_wait, job.run_time, job.priority))
+
+    def _prune(self):
+        """移除超过保留时间的已结束任务"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.retention_seconds
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def _prune_store(self):
+        """按间隔删除任务库中结束超过保留时间的任务，在锁外执行，不阻塞提交和出队"""
+        if self.store is None:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._store_pruned_at < self.store_prune_interval:
+                return
+            self._store_pruned_at = now
+        self.store.prune(self.retention_seconds)
+
+    def _persist(self, job: TranscriptionJob):
+        """把任务状态写入任务库"""
+        if job.persistent:
+            self.store.update(job)
+
+
+# 创建全局任务管理器实例
+job_manager = TranscriptionJobManager(
+    max_workers=settings.TRANSCRIPTION_WORKERS,
+    max_queue_size=settings.JOB_QUEUE_MAX_SIZE,
+    retention_seconds=settings.JOB_RETENTION_SECONDS,
+    aging_seconds=settings.PRIORITY_AGING_SECONDS,
+    reserved_workers=settings.INTERACTIVE_RESERVED_WORKERS,
+    store=job_store
+)
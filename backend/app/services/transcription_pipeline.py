@@ -0,0 +1,225 @@
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import hashlib
+import json
+import numpy as np
+from app.core.config import settings
+from app.services.batching import batcher
+from app.services.fingerprint_index import fingerprint_index
+from app.services.episode_chunks import episode_chunks
+from app.services.model_service import model_service
+from app.services.transcription_cache import TranscriptionCache
+from app.utils.cancellation import Cancelled
+from app.utils.chunking import chunk_digest, content_defined_chunks
+from app.utils.fingerprint import landmark_hashes
+from app.utils.vad import split_into_chunks
+
+
+class TranscriptionPipeline:
+    """转录流水线：长音频先经语音活动检测切分为有界片段，片段并行推理后按时间顺序拼接"""
+
+    def __init__(self, batcher_instance=None, sample_rate: int = 16000, long_audio_seconds: float = 60,
+                 max_chunk_seconds: float = 30, max_inflight: int = 16, fingerprints=None,
+                 fingerprint_edge_seconds: float = 0, episodes=None, min_chunk_seconds: float = 10,
+                 ready=None, fingerprint_min_split_seconds: float = 0.5):
+        self.batcher = batcher_instance or batcher
+        # 默认模型未就绪时微批处理层返回模拟文本，不能登记为可复用的结果
+        self.ready = ready or (lambda: True)
+        self.episodes = episodes
+        self.min_chunk_seconds = min_chunk_seconds
+        self.fingerprints = fingerprints
+        self.fingerprint_edge_seconds = fingerprint_edge_seconds
+        # 片段中与已登记片段相同的一段两侧剩余不足该时长时不切开，并入相同的一段
+        self.fingerprint_min_split_seconds = fingerprint_min_split_seconds
+        self.sample_rate = sample_rate
+        self.long_audio_seconds = long_audio_seconds
+        self.max_chunk_seconds = max_chunk_seconds
+        self.max_inflight = max(1, max_inflight)
+
+    def plan_chunks(self, audio: np.ndarray, content_defined: bool = False) -> list:
+        """确定推理片段，短音频作为单个片段处理
+
+        Args:
+            audio: 16kHz单声道float32 PCM数组
+            content_defined: 按内容定义的切分点分片，剪辑前后未改动部分的片段边界一致
+
+        Returns:
+            list: 片段区间 [(start_sample, end_sample), ...]
+        """
+        if len(audio) <= self.long_audio_seconds * self.sample_rate:
+            return [(0, len(audio))] if len(audio) else []
+        if content_defined:
+            return content_defined_chunks(audio, self.sample_rate, min_chunk_seconds=self.min_chunk_seconds,
+                                          max_chunk_seconds=self.max_chunk_seconds)
+        return split_into_chunks(audio, self.sample_rate, max_chunk_seconds=self.max_chunk_seconds)
+
+    def _fingerprinted(self, start: int, end: int, total: int) -> bool:
+        """片段是否参与指纹查询和登记：片头片尾等重复内容集中在节目开头和结尾"""
+        if self.fingerprints is None or not self.fingerprints.enabled:
+            return False
+        if self.fingerprint_edge_seconds <= 0:
+            return True
+        edge = self.fingerprint_edge_seconds * self.sample_rate
+        return start < edge or end > total - edge
+
+    def transcribe(self, audio: np.ndarray, options: dict = None, progress=None, on_segment=None,
+                   skip_chunks: int = 0, offset: float = 0.0, report: dict = None, episode: str = None,
+                   cancel_token=None, priority: str = None) -> list:
+        """转录音频，返回带时间偏移的片段
+
+        片段以滑动窗口方式提交给微批处理层：同时在途的片段不超过 max_inflight，
+        多个片段合并为一次批量推理，内存占用与单个片段长度相关而与节目总长无关。
+        提交前先查询指纹库，与已识别片段吻合的片段（片头片尾、广告音乐等）直接复用其文本；
+        片段中只有一段与已识别片段吻合时在其边界处切开，吻合的一段复用文本，其余部分分别推理。
+        指定节目标识时按内容定义的切分点分片，与该节目上一版本内容相同的片段复用上一版本的文本。
+
+        Args:
+            audio: 16kHz单声道float32 PCM数组
+            options: 识别参数，包含 hotwords、language、itn、model
+            progress: 进度回调，参数为 (已完成片段数, 片段总数)
+            on_segment: 片段回调，每个片段识别完成后按时间顺序立即调用
+            skip_chunks: 跳过前若干个已完成的片段，用于从检查点续转
+            offset: 音频在源文件中的起始时间（秒），加到片段时间上得到绝对时间戳
+            report: 传入字典时写入复用统计：片段数、指纹命中片段数、从上一版本复用的片段数、节省的推理时长（秒）
+            episode: 节目标识，用于增量转录
+            cancel_token: 取消令牌，在片段边界检查，取消后未开始推理的片段不再推理
+            priority: 片段在微批处理层的调度优先级，默认 normal
+
+        Returns:
+            list: 片段列表，格式为 [{"start": 0.0, "end": 12.3, "text": "xxx"}, ...]，时间单位为秒
+
+        Raises:
+            Cancelled: 令牌已取消时抛出
+        """
+        options = options or {}
+        incremental = episode is not None and self.episodes is not None and self.episodes.enabled
+        chunks = self.plan_chunks(audio, content_defined=incremental)
+        pending = deque(chunks[skip_chunks:])
+        inflight = deque()
+        segments = []
+        stats = {"chunks": len(pending), "matched_chunks": 0, "reused_chunks": 0, "inference_seconds_saved": 0.0}
+        key = hashlib.sha256(json.dumps(TranscriptionCache.recognition_settings(options), sort_keys=True,
+                                        ensure_ascii=False).encode("utf-8")).hexdigest()
+        previous = self.episodes.load(episode, key) if incremental else {}
+        records = []
+        # 按需加载的模型加载失败时直接抛出异常，不会产生模拟文本
+        real = options.get("model") is not None or self.ready()
+
+        def completed(text):
+            future = Future()
+            future.set_result(text)
+            return future
+
+        def infer(start, end, fingerprint=None):
+            return (start, end), self.batcher.submit(audio[start:end], priority=priority, **options), fingerprint
+
+        def match(start, end):
+            """查询指纹库，返回片段各部分的 [(区间, Future, 待登记的指纹), ...]"""
+            duration = (end - start) / self.sample_rate
+            hashes, times = landmark_hashes(audio[start:end], self.sample_rate)
+            text = self.fingerprints.lookup(hashes, times, duration, key)
+            if text is not None:
+                stats["matched_chunks"] += 1
+                stats["inference_seconds_saved"] += duration
+                return [((start, end), completed(text), None)]
+            span = self.fingerprints.locate(hashes, times, duration, key)
+            if span is None:
+                return [infer(start, end, (hashes, times, duration))]
+            margin = self.fingerprint_min_split_seconds * self.sample_rate
+            first = start + int(span["start"] * self.sample_rate)
+            last = min(start + int(span["end"] * self.sample_rate), end)
+            first = start if first - start < margin else first
+            last = end if end - last < margin else last
+            if span["text"] is None and (first, last) == (start, end):
+                return [infer(start, end, (hashes, times, duration))]
+            # 在相同的一段的边界处切开：文本已知时直接复用，否则推理后单独登记，两侧剩余部分再分别查询
+            parts = match(start, first) if first > start else []
+            if span["text"] is None:
+                parts += match(first, last)
+            else:
+                stats["matched_chunks"] += 1
+                stats["inference_seconds_saved"] += (last - first) / self.sample_rate
+                parts.append(((first, last), completed(span["text"]), None))
+            return parts + (match(last, end) if last < end else [])
+
+        def submit(start, end):
+            """提交片段，返回片段各部分的 [(区间, Future, 待登记的指纹), ...] 及片段内容哈希，可复用的部分为已完成的 Future"""
+            duration = (end - start) / self.sample_rate
+            digest = chunk_digest(audio[start:end]) if incremental else None
+            if digest in previous:
+                stats["reused_chunks"] += 1
+                stats["inference_seconds_saved"] += duration
+                self.episodes.record(1, duration)
+                return [((start, end), completed(previous[digest]), None)], digest
+            if not self._fingerprinted(start, end, len(audio)):
+                return [infer(start, end)], digest
+            return match(start, end), digest
+
+        def collect():
+            (start, end), parts, digest = inflight[0]
+            texts = []
+            for (part_start, part_end), future, fingerprint in parts:
+                while True:
+                    try:
+                        text = future.result(timeout=None if cancel_token is None else 0.2).strip()
+                        break
+                    except FutureTimeout:
+                        cancel_token.check()
+                if fingerprint is not None and real:
+                    self.fingerprints.add(*fingerprint, text, key)
+                if text:
+                    texts.append((part_start, part_end, text))
+            inflight.popleft()
+            if digest is not None:
+                records.append({"digest": digest, "start": round(start / self.sample_rate, 3),
+                                "end": round(end / self.sample_rate, 3), "text": " ".join(t for _, _, t in texts)})
+            for part_start, part_end, text in texts:
+                segment = {
+                    "start": round(offset + part_start / self.sample_rate, 3),
+                    "end": round(offset + part_end / self.sample_rate, 3),
+                    "text": text
+                }
+                segments.append(segment)
+                if on_segment is not None:
+                    on_segment(segment)
+            if progress is not None:
+                progress(len(chunks) - len(pending) - len(inflight), len(chunks))
+
+        try:
+            while pending or inflight:
+                while pending and len(inflight) < self.max_inflight:
+                    if cancel_token is not None:
+                        cancel_token.check()
+                    start, end = pending.popleft()
+                    inflight.append(((start, end),) + submit(start, end))
+                collect()
+        except Cancelled:
+            # 已在微批处理层排队的片段一并撤回
+            for _, parts, _ in inflight:
+                for _, future, _ in parts:
+                    future.cancel()
+            raise
+        finally:
+            if self.fingerprints is not None:
+                self.fingerprints.flush()
+        # 从检查点续转时缺少之前片段的文本，模拟模型的文本不可复用，均不更新片段库
+        if incremental and skip_chunks == 0 and real:
+            self.episodes.save(episode, key, records)
+        if report is not None:
+            stats["inference_seconds_saved"] = round(stats["inference_seconds_saved"], 3)
+            report.update(stats)
+        return segments
+
+
+# 创建全局转录流水线实例
+transcription_pipeline = TranscriptionPipeline(
+    sample_rate=settings.AUDIO_SAMPLE_RATE,
+    long_audio_seconds=settings.LONG_AUDIO_SECONDS,
+    max_chunk_seconds=settings.VAD_MAX_CHUNK_SECONDS,
+    max_inflight=settings.CHUNK_MAX_INFLIGHT,
+    fingerprints=fingerprint_index,
+    fingerprint_edge_seconds=settings.FINGERPRINT_EDGE_SECONDS,
+    episodes=episode_chunks,
+    min_chunk_seconds=settings.CDC_MIN_CHUNK_SECONDS,
+    ready=model_service.is_ready
+)
@@ -1,9 +1,305 @@
 import tempfile
 import os
+import struct
+import subprocess
+import threading
+import numpy as np
 import ffmpeg
 from fastapi import HTTPException
+from app.utils.cancellation import Cancelled, CancelToken
+
+# 这些容器格式的索引（moov）可能位于文件末尾，无法从不可寻址的管道中解码
+SEEKABLE_INPUT_FORMATS = {".mp4", ".m4a", ".mov", ".3gp"}
+
+# 探测WAV头时最多缓冲的字节数，data 块之前的 LIST 等元数据块通常远小于该值
+WAV_PROBE_BYTES = 64 * 1024
+
+# 可直接取出采样的WAV编码：(格式码, 位深)，1为整数PCM，3为IEEE浮点
+PASSTHROUGH_WAV_ENCODINGS = {(1, 16), (3, 32)}
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def parse_wav_header(data: bytes):
+    """解析RIFF/WAVE文件头，定位 data 块
+
+    Args:
+        data: 文件开头的字节
+
+    Returns:
+        dict: {"format", "channels", "sample_rate", "bits", "data_offset", "data_size"}，
+              不是WAV或字节不足以解析到 data 块时返回 None
+    """
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        size = struct.unpack("<I", data[offset + 4:offset + 8])[0]
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            if size < 16 or body + 16 > len(data):
+                return None
+            audio_format, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", data[body:body + 16])
+            # WAVE_FORMAT_EXTENSIBLE 的实际编码在子格式GUID的前两个字节
+            if audio_format == WAVE_FORMAT_EXTENSIBLE:
+                if size < 40 or body + 26 > len(data):
+                    return None
+                audio_format = struct.unpack("<H", data[body + 24:body + 26])[0]
+            fmt = {"format": audio_format, "channels": channels, "sample_rate": sample_rate, "bits": bits}
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            return {**fmt, "data_offset": body, "data_size": size}
+        # RIFF 块按偶数字节对齐
+        offset = body + size + (size & 1)
+    return None
+
+
+def is_passthrough_wav(header: dict, sample_rate: int, channels: int) -> bool:
+    """WAV是否已是目标采样率、声道数的16位整数或32位浮点PCM，可跳过转码"""
+    return (header is not None
+            and header["sample_rate"] == sample_rate
+            and header["channels"] == channels
+            and (header["format"], header["bits"]) in PASSTHROUGH_WAV_ENCODINGS)
+
+
+def pcm_to_float32(data, bits: int) -> np.ndarray:
+    """把WAV采样字节转换为float32数组，16位整数按 1/32768 缩放（与ffmpeg一致）"""
+    width = bits // 8
+    usable = len(data) - len(data) % width
+    if bits == 16:
+        return np.frombuffer(data, dtype="<i2", count=usable // 2).astype(np.float32) / 32768.0
+    return np.frombuffer(data, dtype="<f4", count=usable // 4)
+
+
+def wav_window(header: dict, start: float = None, end: float = None) -> tuple:
+    """计算时间窗口在WAV data 块中的字节范围
+
+    Args:
+        header: parse_wav_header 的结果
+        start: 窗口起点（秒），默认从头开始
+        end: 窗口终点（秒），默认到结尾
+
+    Returns:
+        tuple: (相对 data 块起点的字节偏移, 最多读取的字节数)，字节数为 None 表示读到结尾
+    """
+    frame = header["channels"] * header["bits"] // 8
+    start_frame = int(round((start or 0) * header["sample_rate"]))
+    offset = start_frame * frame
+    # data 块之后可能还有其他块；边录边写的WAV大小字段可能为0，此时读到结尾
+    limit = max(0, header["data_size"] - offset) if header["data_size"] else None
+    if end is not None:
+        window = max(0, int(round(end * header["sample_rate"])) - start_frame) * frame
+        limit = window if limit is None else min(limit, window)
+    return offset, limit
+
+
+def wait_process(process, cancel_token: CancelToken = None, poll_interval: float = 0.2) -> int:
+    """等待子进程退出；令牌取消时立即终止进程
+
+    Args:
+        process: subprocess.Popen 对象
+        cancel_token: 取消令牌
+        poll_interval: 检查令牌的间隔（秒）
+
+    Returns:
+        int: 进程退出码
+
+    Raises:
+        Cancelled: 令牌已取消时抛出，进程已被终止
+    """
+    while True:
+        if cancel_token is not None and cancel_token.cancelled:
+            process.kill()
+            process.wait()
+            raise Cancelled(cancel_token.reason)
+        try:
+            return process.wait(timeout=None if cancel_token is None else poll_interval)
+        except subprocess.TimeoutExpired:
+            pass
+
+
+class WavPassthroughDecoder:
+    """直通解码器：输入已是目标格式的PCM WAV时直接取出采样，不启动ffmpeg
+
+    接口与 PipedDecoder 相同。指定时间窗口时只保留窗口内的采样。
+    """
+
+    def __init__(self, header: dict, start: float = None, end: float = None):
+        self.header = header
+        offset, self._limit = wav_window(header, start, end)
+        self._skip = header["data_offset"] + offset
+        self._data = bytearray()
+
+    def feed(self, data: bytes):
+        """写入一段原始WAV字节，跳过文件头和窗口之前的采样"""
+        if self._skip:
+            cut = min(self._skip, len(data))
+            data = data[cut:]
+            self._skip -= cut
+        if self._limit is not None:
+            data = data[:max(0, self._limit - len(self._data))]
+        self._data.extend(data)
+
+    def finish(self, cancel_token: CancelToken = None) -> np.ndarray:
+        """结束输入并返回采样
+
+        Args:
+            cancel_token: 取消令牌，直通解码无需等待，不检查
+
+        Returns:
+            np.ndarray: float32 PCM 采样数组
+        """
+        AudioProcessor.record_ingest("passthrough")
+        return pcm_to_float32(self._data, self.header["bits"])
+
+    def abort(self):
+        """释放缓冲区"""
+        self._data = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.abort()
+
+
+def window_input_args(start: float = None, end: float = None) -> dict:
+    """时间窗口对应的ffmpeg输入选项
+
+    Args:
+        start: 窗口起点（秒）
+        end: 窗口终点（秒）
+
+    Returns:
+        dict: 传给 ffmpeg.input 的 ss、t 参数
+    """
+    args = {}
+    if start:
+        args["ss"] = start
+    if end is not None:
+        args["t"] = end - (start or 0)
+    return args
+
+
+class PipedDecoder:
+    """管道解码器：音频字节通过stdin送入ffmpeg，16kHz单声道float32 PCM从stdout读回
+
+    上传数据到达时即可调用 feed 写入，ffmpeg 边接收边解码，全程不产生中间文件。
+    管道无法定位（WAV解复用器在管道上做输入端 -ss 会得到空输出），指定时间窗口时 -t 作为输入选项，
+    读到窗口终点后ffmpeg即退出；-ss 作为输出选项，窗口之前的采样解码后直接丢弃，不进入模型。
+    """
+
+    def __init__(self, sample_rate: int = 16000, channels: int = 1, start: float = None, end: float = None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._pcm = bytearray()
+        self._stderr = bytearray()
+        self._finished = False
+        self._input_closed = False
+        self.process = (ffmpeg
+                        .input("pipe:0", **({"t": end} if end is not None else {}))
+                        .output("pipe:1", format="f32le", acodec="pcm_f32le", ac=channels, ar=sample_rate,
+                                **({"ss": start} if start else {}))
+                        .global_args("-loglevel", "error")
+                        .run_async(pipe_stdin=True, pipe_stdout=True, pipe_stderr=True))
+        # stdout和stderr必须持续读取，否则管道写满后ffmpeg会阻塞
+        self._stdout_reader = threading.Thread(target=self._drain, args=(self.process.stdout, self._pcm), daemon=True)
+        self._stderr_reader = threading.Thread(target=self._drain, args=(self.process.stderr, self._stderr), daemon=True)
+        self._stdout_reader.start()
+        self._stderr_reader.start()
+
+    @staticmethod
+    def _drain(stream, buffer: bytearray):
+        """持续读取管道数据到缓冲区"""
+        for block in iter(lambda: stream.read(1 << 16), b""):
+            buffer.extend(block)
+
+    def feed(self, data: bytes):
+        """写入一段原始音频字节
+
+        Args:
+            data: 音频文件的一段字节
+
+        Raises:
+            HTTPException: ffmpeg提前退出时抛出
+        """
+        if self._input_closed:
+            return
+        try:
+            self.process.stdin.write(data)
+        except (BrokenPipeError, ValueError):
+            if self.process.wait() == 0:
+                # 只解码时间窗口时ffmpeg读完窗口后正常退出，其余输入直接丢弃
+                self._input_closed = True
+                return
+            self._stderr_reader.join()
+            print(f"FFmpeg error: {self._stderr.decode(errors='replace')}")
+            raise HTTPException(status_code=500, detail="Audio conversion failed")
+
+    def finish(self, cancel_token: CancelToken = None) -> np.ndarray:
+        """结束输入并等待解码完成
+
+        Args:
+            cancel_token: 取消令牌，等待期间被取消时立即终止ffmpeg
+
+        Returns:
+            np.ndarray: float32 PCM 采样数组（多声道时为交错排列）
+
+        Raises:
+            HTTPException: 解码失败时抛出
+            Cancelled: 令牌已取消时抛出
+        """
+        try:
+            self.process.stdin.close()
+        except (BrokenPipeError, ValueError):
+            pass
+        try:
+            returncode = wait_process(self.process, cancel_token)
+        except Cancelled:
+            self.abort()
+            raise
+        self._stdout_reader.join()
+        self._stderr_reader.join()
+        self._finished = True
+
+        if returncode != 0:
+            print(f"FFmpeg error: {self._stderr.decode(errors='replace')}")
+            raise HTTPException(status_code=500, detail="Audio conversion failed")
+
+        # 丢弃不足一个采样的尾部字节，bytearray 可直接零拷贝转换为数组
+        usable = len(self._pcm) - len(self._pcm) % 4
+        del self._pcm[usable:]
+        AudioProcessor.record_ingest("transcoded")
+        return np.frombuffer(self._pcm, dtype=np.float32)
+
+    def abort(self):
+        """终止ffmpeg进程并释放管道"""
+        if self._finished:
+            return
+        self._finished = True
+        if self.process.poll() is None:
+            self.process.kill()
+        for stream in (self.process.stdin, self.process.stdout, self.process.stderr):
+            try:
+                stream.close()
+            except Exception:
+                pass
+        self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.abort()
+
 
 class AudioProcessor:
+    # 解码路径计数：passthrough 为跳过ffmpeg的WAV直通，transcoded 为经ffmpeg转码
+    _ingest_counts = {"passthrough": 0, "transcoded": 0}
+    _ingest_lock = threading.Lock()
+
     @staticmethod
     def convert_to_wav(input_path: str, sample_rate: int = 16000, channels: int = 1) -> str:
         """将音频文件转换为WAV格式
@@ -37,6 +333,143 @@ class AudioProcessor:
             print(f"Audio conversion error: {e}")
             raise HTTPException(status_code=500, detail=f"Audio conversion failed: {str(e)}")
     
+    @classmethod
+    def record_ingest(cls, path: str):
+        """记录一次解码所走的路径
+
+        Args:
+            path: passthrough 或 transcoded
+        """
+        with cls._ingest_lock:
+            cls._ingest_counts[path] += 1
+
+    @classmethod
+    def ingest_stats(cls) -> dict:
+        """获取解码路径统计
+
+        Returns:
+            dict: {"passthrough": n, "transcoded": n, "passthrough_rate": 0.0}
+        """
+        with cls._ingest_lock:
+            total = sum(cls._ingest_counts.values())
+            return {
+                **cls._ingest_counts,
+                "passthrough_rate": round(cls._ingest_counts["passthrough"] / total, 3) if total else 0.0
+            }
+
+    @staticmethod
+    def header_probe_complete(head: bytes) -> bool:
+        """已缓冲的文件开头是否足以判断能否走WAV直通
+
+        Args:
+            head: 已接收的文件开头字节
+
+        Returns:
+            bool: 不是WAV、已解析到 data 块或已达到探测上限时返回 True
+        """
+        if len(head) >= WAV_PROBE_BYTES:
+            return True
+        if len(head) >= 4 and head[:4] != b"RIFF":
+            return True
+        return parse_wav_header(head) is not None
+
+    @staticmethod
+    def open_decoder(sample_rate: int = 16000, channels: int = 1, head: bytes = b"",
+                     start: float = None, end: float = None):
+        """创建解码器，用于边上传边解码
+
+        文件开头表明输入已是目标格式的PCM WAV时返回直通解码器，否则启动ffmpeg管道解码器。
+        调用方仍需通过 feed 写入包括文件头在内的全部字节。
+
+        Args:
+            sample_rate: 输出采样率，默认为16000Hz
+            channels: 输出声道数，默认为1（单声道）
+            head: 已接收的文件开头字节，用于探测WAV头
+            start: 只解码该时间点（秒）之后的音频
+            end: 只解码该时间点（秒）之前的音频
+
+        Returns:
+            WavPassthroughDecoder 或 PipedDecoder
+
+        Raises:
+            HTTPException: ffmpeg无法启动时抛出
+        """
+        header = parse_wav_header(head)
+        # 解码路径在 finish 成功时计数，命中缓存后中止或失败后回退的解码不计入
+        if is_passthrough_wav(header, sample_rate, channels):
+            return WavPassthroughDecoder(header, start=start, end=end)
+        try:
+            return PipedDecoder(sample_rate=sample_rate, channels=channels, start=start, end=end)
+        except Exception as e:
+            print(f"Audio conversion error: {e}")
+            raise HTTPException(status_code=500, detail=f"Audio conversion failed: {str(e)}")
+
+    @staticmethod
+    def decode_to_array(input_path: str, sample_rate: int = 16000, channels: int = 1,
+                        start: float = None, end: float = None, cancel_token: CancelToken = None) -> np.ndarray:
+        """将音频文件直接解码为内存中的PCM数组，不写WAV文件
+
+        指定时间窗口时在输入端定位（-ss 位于 -i 之前），只读取和解码窗口内的数据。
+
+        Args:
+            input_path: 输入音频文件路径
+            sample_rate: 输出采样率，默认为16000Hz
+            channels: 输出声道数，默认为1（单声道）
+            start: 只解码该时间点（秒）之后的音频
+            end: 只解码该时间点（秒）之前的音频
+            cancel_token: 取消令牌，解码期间被取消时立即终止ffmpeg
+
+        Returns:
+            np.ndarray: float32 PCM 采样数组
+
+        Raises:
+            HTTPException: 解码失败时抛出
+            Cancelled: 令牌已取消时抛出
+        """
+        # 已是目标格式的PCM WAV直接读取采样，不启动ffmpeg
+        try:
+            with open(input_path, "rb") as f:
+                header = parse_wav_header(f.read(WAV_PROBE_BYTES))
+                if is_passthrough_wav(header, sample_rate, channels):
+                    offset, limit = wav_window(header, start, end)
+                    f.seek(header["data_offset"] + offset)
+                    data = f.read() if limit is None else f.read(limit)
+                    AudioProcessor.record_ingest("passthrough")
+                    return pcm_to_float32(data, header["bits"])
+        except OSError:
+            pass
+
+        try:
+            process = (ffmpeg
+                       .input(input_path, **window_input_args(start, end))
+                       .output("pipe:1", format="f32le", acodec="pcm_f32le", ac=channels, ar=sample_rate)
+                       .global_args("-loglevel", "error")
+                       .run_async(pipe_stdout=True, pipe_stderr=True))
+        except Exception as e:
+            print(f"Audio conversion error: {e}")
+            raise HTTPException(status_code=500, detail=f"Audio conversion failed: {str(e)}")
+
+        # stdout和stderr由读取线程持续读取，主线程等待进程退出期间检查取消令牌
+        out = bytearray()
+        err = bytearray()
+        readers = [threading.Thread(target=PipedDecoder._drain, args=(stream, buffer), daemon=True)
+                   for stream, buffer in ((process.stdout, out), (process.stderr, err))]
+        for reader in readers:
+            reader.start()
+        try:
+            returncode = wait_process(process, cancel_token)
+        finally:
+            for reader in readers:
+                reader.join()
+            process.stdout.close()
+            process.stderr.close()
+        if returncode != 0:
+            print(f"FFmpeg error: {err.decode(errors='replace')}")
+            raise HTTPException(status_code=500, detail="Audio conversion failed")
+        del out[len(out) - len(out) % 4:]
+        AudioProcessor.record_ingest("transcoded")
+        return np.frombuffer(out, dtype=np.float32)
+
     @staticmethod
     def cleanup_temp_files(file_paths: list):
         """清理临时文件
@@ -0,0 +1,51 @@
+import threading
+import time
+
+
+class Cancelled(Exception):
+    """操作被取消或超过截止时间"""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(f"Operation {reason}")
+        self.reason = reason
+
+
+class CancelToken:
+    """取消令牌：请求的截止时间和取消状态，可在事件循环和工作线程之间共享
+
+    解码、推理等耗时步骤在边界处检查令牌，已取消时抛出 Cancelled 并释放各自的资源。
+
+    reason:
+        - cancelled: 主动取消
+        - disconnected: 客户端断开连接
+        - deadline: 超过截止时间
+    """
+
+    def __init__(self, timeout: float = None):
+        self.deadline = time.time() + timeout if timeout else None
+        self.reason = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "cancelled"):
+        """取消操作，已取消时保留最初的原因"""
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        """是否已取消；超过截止时间时自动以 deadline 为原因取消"""
+        if not self._event.is_set() and self.deadline is not None and time.time() >= self.deadline:
+            self.cancel("deadline")
+        return self._event.is_set()
+
+    def remaining(self) -> float:
+        """距截止时间的秒数，没有截止时间时为 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.time())
+
+    def check(self):
+        """已取消时抛出 Cancelled"""
+        if self.cancelled:
+            raise Cancelled(self.reason)
@@ -0,0 +1,112 @@
+import hashlib
+import numpy as np
+from app.utils.vad import frame_energy_db
+
+# 16 位采样值到随机 64 位整数的映射表，固定种子保证不同进程、不同版本间切分点一致
+_GEAR = np.random.default_rng(0x5EED).integers(0, 2 ** 63, size=65536, dtype=np.uint64)
+
+
+def to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """把 float32 PCM 量化为 int16，与 ffmpeg 输出的 s16le 精度一致"""
+    return np.round(np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def _windowed_sum(values: np.ndarray, window: int, carry: np.ndarray) -> np.ndarray:
+    """以前一块末尾的 window - 1 个值为前缀，求每个位置结尾的长度为 window 的窗口和"""
+    cumsum = np.cumsum(np.concatenate((carry, values)))
+    cumsum = np.concatenate((np.zeros(1, dtype=cumsum.dtype), cumsum))
+    return cumsum[window:] - cumsum[:-window]
+
+
+def cut_candidates(audio: np.ndarray, sample_rate: int = 16000, hash_window: int = 64, mask_bits: int = 12,
+                   quiet_ms: int = 20, quiet_db: float = -40.0, block_size: int = 1 << 20) -> tuple:
+    """计算内容定义的候选切分点
+
+    对每个采样计算以其结尾的 hash_window 个采样的滚动哈希（映射表取值的窗口和，64 位回绕），
+    低 mask_bits 位全为 0 且局部能量低于 quiet_db 的位置为候选点。候选点只取决于附近的采样值，
+    在前面插入或删除音频后，未改动部分的候选点随内容一起平移。
+
+    按块计算，内存占用与 block_size 相关而与音频总长无关。
+
+    Args:
+        audio: float32 PCM 采样数组
+        sample_rate: 采样率
+        hash_window: 滚动哈希的窗口（采样数）
+        mask_bits: 哈希低位掩码的位数，决定候选点密度
+        quiet_ms: 局部能量的窗口（毫秒）
+        quiet_db: 候选点要求的局部能量上限（dBFS），使切分点落在停顿处
+        block_size: 每块的采样数
+
+    Returns:
+        tuple: (候选点, 哈希值)，候选点为切分位置的采样下标
+    """
+    quiet_window = max(1, int(sample_rate * quiet_ms / 1000))
+    mask = np.uint64((1 << mask_bits) - 1)
+    candidates = []
+    values = []
+    threshold = 10 ** (quiet_db / 10)
+    gear_carry = np.zeros(hash_window - 1, dtype=np.uint64)
+    power_carry = np.zeros(quiet_window - 1, dtype=np.float64)
+    for start in range(0, len(audio), block_size):
+        block = to_pcm16(audio[start:start + block_size])
+        gear = _GEAR[block.astype(np.int64) + 32768]
+        hashes = _windowed_sum(gear, hash_window, gear_carry)
+        samples = block.astype(np.float64) / 32768
+        power = _windowed_sum(samples * samples, quiet_window, power_carry) / quiet_window
+        hits = np.flatnonzero(((hashes & mask) == 0) & (power < threshold))
+        candidates.append(hits + start + 1)
+        values.append(hashes[hits])
+        gear_carry = np.concatenate((gear_carry, gear))[-(hash_window - 1):] if hash_window > 1 else gear_carry
+        power_carry = (np.concatenate((power_carry, samples * samples))[-(quiet_window - 1):]
+                       if quiet_window > 1 else power_carry)
+    if not candidates:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+    return np.concatenate(candidates), np.concatenate(values)
+
+
+def content_defined_chunks(audio: np.ndarray, sample_rate: int = 16000, min_chunk_seconds: float = 10,
+                           max_chunk_seconds: float = 30, **kwargs) -> list:
+    """按内容定义的切分点把音频分为有长度上限的片段
+
+    候选点中哈希值在前后 min_chunk_seconds 内最小的作为切分点，相邻切分点间距不小于 min_chunk_seconds。
+    切分点只由附近内容决定，与前面的切分结果无关，剪辑处之外的片段边界与剪辑前一致；
+    相邻切分点相距超过 max_chunk_seconds 时，在后半段能量最低的帧处补充切分。
+
+    Args:
+        audio: float32 PCM 采样数组
+        sample_rate: 采样率
+        min_chunk_seconds: 切分点的最小间距
+        max_chunk_seconds: 片段最长时长
+        **kwargs: 传给 cut_candidates 的参数
+
+    Returns:
+        list: 片段区间 [(start_sample, end_sample), ...]，覆盖整段音频
+    """
+    candidates, values = cut_candidates(audio, sample_rate, **kwargs)
+    radius = int(min_chunk_seconds * sample_rate)
+    left = np.searchsorted(candidates, candidates - radius, side="left")
+    right = np.searchsorted(candidates, candidates + radius, side="right")
+    cuts = [int(candidates[i]) for i in range(len(candidates)) if np.argmin(values[left[i]:right[i]]) == i - left[i]]
+
+    frame_size = max(1, int(sample_rate * 0.02))
+    max_len = int(max_chunk_seconds * sample_rate)
+    chunks = []
+    start = 0
+    for end in cuts + [len(audio)]:
+        while end - start > max_len:
+            # 相对上一个切分点的固定帧网格上取能量最低帧的起点
+            search_start = start + max_len // 2
+            energy = frame_energy_db(audio[search_start:start + max_len], frame_size)
+            cut = search_start + int(np.argmin(energy)) * frame_size
+            cut = min(max(cut, search_start + 1), start + max_len)
+            chunks.append((start, cut))
+            start = cut
+        if end > start:
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def chunk_digest(audio: np.ndarray) -> str:
+    """片段内容的 SHA-256，按 int16 量化后计算"""
+    return hashlib.sha256(to_pcm16(audio).tobytes()).hexdigest()
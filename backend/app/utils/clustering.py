@@ -0,0 +1,167 @@
+import numpy as np
+
+
+def l2_normalize(x: np.ndarray) -> np.ndarray:
+    """按行做L2归一化，归一化后的内积即余弦相似度
+
+    Args:
+        x: 二维数组，每行一个向量
+
+    Returns:
+        np.ndarray: float32 归一化结果
+    """
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def iter_similarity_blocks(x: np.ndarray, y: np.ndarray, block_size: int = 4096):
+    """分块计算 x 与 y 的两两内积，内存占用为 block_size * len(y)，与 len(x) 无关
+
+    Args:
+        x: 二维数组，按行分块
+        y: 二维数组
+        block_size: 每块的行数
+
+    Yields:
+        tuple: (块起始行, 该块与 y 的内积矩阵)
+    """
+    for start in range(0, len(x), block_size):
+        yield start, x[start:start + block_size] @ y.T
+
+
+def farthest_point_init(x: np.ndarray, k: int) -> np.ndarray:
+    """确定性的最远点初始化：每次选取与已选中心最不相似的点
+
+    每一步只计算一个 len(x) 的相似度向量，不构造两两矩阵。
+
+    Args:
+        x: 已归一化的向量
+        k: 中心数
+
+    Returns:
+        np.ndarray: 选中的行号
+    """
+    chosen = [0]
+    best = x @ x[0]
+    for _ in range(1, min(k, len(x))):
+        index = int(np.argmin(best))
+        chosen.append(index)
+        np.maximum(best, x @ x[index], out=best)
+    return np.array(chosen)
+
+
+def spherical_kmeans(x: np.ndarray, k: int, iterations: int = 10, block_size: int = 4096) -> tuple:
+    """余弦距离下的k均值，把大量向量压缩为 k 个微簇
+
+    Args:
+        x: 已归一化的向量
+        k: 微簇数
+        iterations: 最大迭代次数
+        block_size: 分块计算相似度时每块的行数
+
+    Returns:
+        tuple: (centroids, labels, counts)，中心已归一化，counts 为每个微簇的成员数
+    """
+    centroids = x[farthest_point_init(x, k)].copy()
+    k = len(centroids)
+    labels = np.full(len(x), -1, dtype=np.int64)
+    for _ in range(iterations):
+        previous = labels.copy()
+        sums = np.zeros_like(centroids)
+        for start, sim in iter_similarity_blocks(x, centroids, block_size):
+            block = np.argmax(sim, axis=1)
+            labels[start:start + len(sim)] = block
+            # 用独热矩阵乘法按簇累加成员向量
+            sums += (block[:, None] == np.arange(k)).astype(np.float32).T @ x[start:start + len(sim)]
+        counts = np.bincount(labels, minlength=k)
+        # 空簇保留原中心
+        nonempty = counts > 0
+        centroids[nonempty] = l2_normalize(sums[nonempty])
+        if np.array_equal(labels, previous):
+            break
+    return centroids, labels, np.bincount(labels, minlength=k)
+
+
+def agglomerative_cluster(x: np.ndarray, weights: np.ndarray = None, threshold: float = 0.5,
+                          num_clusters: int = None) -> np.ndarray:
+    """加权平均链接的凝聚层次聚类（余弦相似度）
+
+    按 Lance-Williams 公式整行更新相似度矩阵，每次合并的代价为 O(n)，适用于微簇中心这类小规模输入。
+
+    Args:
+        x: 已归一化的向量
+        weights: 每个向量代表的样本数，默认全为1
+        threshold: 簇间平均相似度低于该值时停止合并
+        num_clusters: 指定簇数时合并到该数目为止，忽略 threshold
+
+    Returns:
+        np.ndarray: 每个向量的簇编号（0 起连续编号）
+    """
+    n = len(x)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64).copy()
+    sim = (x @ x.T).astype(np.float64)
+    np.fill_diagonal(sim, -np.inf)
+    parent = np.arange(n)
+    remaining = n
+    while remaining > 1:
+        if num_clusters is not None and remaining <= num_clusters:
+            break
+        index = int(np.argmax(sim))
+        i, j = divmod(index, n)
+        if num_clusters is None and sim[i, j] < threshold:
+            break
+        # 合并 j 到 i：新簇与其他簇的平均相似度按成员数加权
+        merged = (weights[i] * sim[i] + weights[j] * sim[j]) / (weights[i] + weights[j])
+        sim[i] = merged
+        sim[:, i] = merged
+        sim[i, i] = -np.inf
+        sim[j] = -np.inf
+        sim[:, j] = -np.inf
+        weights[i] += weights[j]
+        parent[parent == j] = i
+        remaining -= 1
+    _, labels = np.unique(parent, return_inverse=True)
+    return labels
+
+
+def relabel_by_first_appearance(labels: np.ndarray) -> np.ndarray:
+    """按首次出现的顺序重新编号簇"""
+    _, first = np.unique(labels, return_index=True)
+    order = np.argsort(np.argsort(first))
+    _, inverse = np.unique(labels, return_inverse=True)
+    return order[inverse]
+
+
+def cluster_embeddings(embeddings: np.ndarray, threshold: float = 0.5, num_clusters: int = None,
+                       max_micro_clusters: int = 256, block_size: int = 4096) -> np.ndarray:
+    """对说话人嵌入聚类
+
+    向量数超过 max_micro_clusters 时先用分块的球面k均值压缩为微簇，再对微簇中心做凝聚聚类，
+    两两相似度矩阵的大小只取决于 max_micro_clusters 和 block_size，与音频时长无关。
+
+    Args:
+        embeddings: 说话人嵌入，每行一个窗口
+        threshold: 凝聚聚类的合并阈值（余弦相似度）
+        num_clusters: 已知说话人数时直接指定
+        max_micro_clusters: 微簇数上限
+        block_size: 分块计算相似度时每块的行数
+
+    Returns:
+        np.ndarray: 每个窗口的说话人编号，按首次出现的顺序从0编号
+    """
+    if len(embeddings) == 0:
+        return np.zeros(0, dtype=np.int64)
+    x = l2_normalize(embeddings)
+    if len(x) <= max_micro_clusters:
+        centroids, assignment, counts = x, np.arange(len(x)), np.ones(len(x))
+    else:
+        centroids, assignment, counts = spherical_kmeans(x, max_micro_clusters, block_size=block_size)
+        # 丢弃空微簇，避免其中心参与合并
+        keep = counts > 0
+        remap = np.cumsum(keep) - 1
+        centroids, counts, assignment = centroids[keep], counts[keep], remap[assignment]
+    labels = agglomerative_cluster(centroids, counts, threshold, num_clusters)[assignment]
+    return relabel_by_first_appearance(labels)
@@ -0,0 +1,97 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def log_spectrogram(audio: np.ndarray, n_fft: int = 512, hop: int = 256) -> np.ndarray:
+    """计算对数幅度谱
+
+    Args:
+        audio: float32 PCM 采样数组
+        n_fft: 帧长
+        hop: 帧移
+
+    Returns:
+        np.ndarray: 形状为 (帧数, n_fft // 2 + 1) 的对数幅度（dB）
+    """
+    if len(audio) < n_fft:
+        return np.zeros((0, n_fft // 2 + 1), dtype=np.float32)
+    frames = sliding_window_view(np.asarray(audio, dtype=np.float32), n_fft)[::hop]
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(n_fft).astype(np.float32), axis=1))
+    return (20 * np.log10(magnitude + 1e-6)).astype(np.float32)
+
+
+def _sliding_max(x: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """沿一个轴求 2 * radius + 1 邻域内的最大值"""
+    pad = [(0, 0)] * x.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(x, pad, constant_values=-np.inf)
+    return sliding_window_view(padded, 2 * radius + 1, axis=axis).max(axis=-1)
+
+
+def find_peaks(spec: np.ndarray, time_radius: int = 10, freq_radius: int = 10, peaks_per_second: int = 10,
+               frames_per_second: float = 62.5, floor_db: float = 60.0) -> tuple:
+    """在时频图上挑选局部最大值作为特征点
+
+    邻域最大值按时间、频率两个方向分别求出，全程向量化；每秒只保留幅度最大的若干个点，
+    使特征点密度与内容无关，且不低于最大幅度以下 floor_db 的点才参与。
+
+    Args:
+        spec: 对数幅度谱，(帧数, 频点数)
+        time_radius: 时间方向的邻域半径（帧）
+        freq_radius: 频率方向的邻域半径（频点）
+        peaks_per_second: 每秒保留的特征点数
+        frames_per_second: 每秒帧数
+        floor_db: 相对最大幅度的下限
+
+    Returns:
+        tuple: (帧号, 频点)，按时间排序
+    """
+    if spec.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    local_max = _sliding_max(_sliding_max(spec, time_radius, 0), freq_radius, 1)
+    times, freqs = np.nonzero((spec == local_max) & (spec > spec.max() - floor_db))
+    amplitudes = spec[times, freqs]
+
+    # 每秒按幅度从大到小保留前 peaks_per_second 个
+    seconds = (times / frames_per_second).astype(np.int64)
+    order = np.lexsort((-amplitudes, seconds))
+    seconds = seconds[order]
+    first = np.searchsorted(seconds, seconds, side="left")
+    keep = order[np.arange(len(order)) - first < peaks_per_second]
+    keep = keep[np.lexsort((freqs[keep], times[keep]))]
+    return times[keep], freqs[keep]
+
+
+def landmark_hashes(audio: np.ndarray, sample_rate: int = 16000, n_fft: int = 512, hop: int = 256,
+                    fan_out: int = 3, max_delta: int = 63, peaks_per_second: int = 10) -> tuple:
+    """计算音频的特征点对哈希（landmark 指纹）
+
+    每个特征点与其后 fan_out 个特征点配对，哈希由两个点的频点和时间差组成：
+    锚点频点 9 位、目标频点 9 位、时间差 6 位，共 24 位。
+
+    Args:
+        audio: 16kHz单声道float32 PCM数组
+        sample_rate: 采样率
+        n_fft: 帧长
+        hop: 帧移
+        fan_out: 每个锚点配对的特征点数
+        max_delta: 配对的最大时间差（帧）
+        peaks_per_second: 每秒保留的特征点数
+
+    Returns:
+        tuple: (hashes, times)，uint32 哈希及其锚点帧号
+    """
+    spec = log_spectrogram(audio, n_fft, hop)
+    times, freqs = find_peaks(spec, peaks_per_second=peaks_per_second, frames_per_second=sample_rate / hop)
+    hashes = []
+    anchors = []
+    for k in range(1, fan_out + 1):
+        if len(times) <= k:
+            break
+        delta = times[k:] - times[:-k]
+        valid = (delta > 0) & (delta <= max_delta)
+        hashes.append((freqs[:-k][valid] << 15) | (freqs[k:][valid] << 6) | delta[valid])
+        anchors.append(times[:-k][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int32)
+    return np.concatenate(hashes).astype(np.uint32), np.concatenate(anchors).astype(np.int32)
@@ -0,0 +1,18 @@
+import hashlib
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """流式计算文件的SHA-256
+
+    Args:
+        path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        str: 十六进制哈希
+    """
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
@@ -0,0 +1,74 @@
+import unicodedata
+
+
+def percentile(values: list, percent: float) -> float:
+    """计算已排序列表的百分位数（最近秩法）
+
+    Args:
+        values: 已升序排列的数值列表
+        percent: 百分位，如 95、99
+
+    Returns:
+        float: 百分位数，列表为空时返回 0.0
+    """
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def normalize_text(text: str) -> str:
+    """去掉空白和标点，用于字错误率计算
+
+    Args:
+        text: 识别文本或参考文本
+
+    Returns:
+        str: 规范化后的文本
+    """
+    return "".join(
+        char for char in unicodedata.normalize("NFKC", text or "").lower()
+        if not char.isspace() and not unicodedata.category(char).startswith("P")
+    )
+
+
+def edit_distance(reference: str, hypothesis: str) -> int:
+    """计算两段文本的字符级编辑距离（替换、插入、删除）
+
+    Args:
+        reference: 参考文本
+        hypothesis: 识别文本
+
+    Returns:
+        int: 编辑距离
+    """
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_char in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_char in enumerate(hypothesis, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_char != hyp_char)
+            )
+        previous = current
+    return previous[-1]
+
+
+def character_error_rate(references: list, hypotheses: list) -> float:
+    """计算语料级字错误率（CER）：总编辑距离除以参考文本总字数
+
+    Args:
+        references: 参考文本列表
+        hypotheses: 与参考文本一一对应的识别文本列表
+
+    Returns:
+        float: 字错误率，参考文本为空时返回 0.0
+    """
+    errors = 0
+    total = 0
+    for reference, hypothesis in zip(references, hypotheses):
+        reference = normalize_text(reference)
+        errors += edit_distance(reference, normalize_text(hypothesis))
+        total += len(reference)
+    return errors / total if total else 0.0
@@ -0,0 +1,35 @@
+# 调度优先级，从高到低
+PRIORITY_CLASSES = ("interactive", "normal", "bulk")
+
+
+def priority_rank(priority: str) -> int:
+    """优先级名称对应的序号，越小越优先
+
+    Args:
+        priority: 优先级名称
+
+    Returns:
+        int: 优先级序号
+
+    Raises:
+        ValueError: 未知的优先级
+    """
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority {priority!r}, expected one of {', '.join(PRIORITY_CLASSES)}")
+    return PRIORITY_CLASSES.index(priority)
+
+
+def effective_priority(rank: int, waited: float, aging_seconds: float) -> float:
+    """老化后的优先级：排队每满 aging_seconds 提升一级，低优先级请求不会一直被插队
+
+    Args:
+        rank: 优先级序号
+        waited: 已排队时间（秒）
+        aging_seconds: 提升一级所需的排队时间，0 表示不老化
+
+    Returns:
+        float: 有效优先级，越小越优先
+    """
+    if aging_seconds <= 0:
+        return float(rank)
+    return rank - waited / aging_seconds
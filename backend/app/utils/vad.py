@@ -0,0 +1,137 @@
+import numpy as np
+
+
+def frame_energy_db(audio: np.ndarray, frame_size: int) -> np.ndarray:
+    """计算逐帧能量（dBFS），不足一帧的尾部单独成帧
+
+    Args:
+        audio: float32 PCM 采样数组
+        frame_size: 每帧采样数
+
+    Returns:
+        np.ndarray: 每帧的能量（dB）
+    """
+    num_frames = int(np.ceil(len(audio) / frame_size))
+    if num_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    # 整帧部分直接重塑后按行求均方，避免逐帧循环
+    full = len(audio) // frame_size
+    power = np.empty(num_frames, dtype=np.float64)
+    if full:
+        frames = audio[:full * frame_size].reshape(full, frame_size).astype(np.float64)
+        power[:full] = np.mean(frames * frames, axis=1)
+    if num_frames > full:
+        tail = audio[full * frame_size:].astype(np.float64)
+        power[full] = np.mean(tail * tail)
+    return (10 * np.log10(power + 1e-10)).astype(np.float32)
+
+
+def _runs(mask: np.ndarray) -> list:
+    """返回布尔数组中连续为 True 的区间 [(start, end), ...]"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def detect_speech_regions(audio: np.ndarray, sample_rate: int = 16000, frame_ms: int = 30,
+                          threshold_db: float = None, min_silence_ms: int = 300,
+                          min_speech_ms: int = 200, pad_ms: int = 100) -> list:
+    """基于能量的语音活动检测
+
+    阈值默认取噪声底（能量的第10百分位）以上15dB；语音占比很高时噪声底不可靠，
+    阈值不超过峰值能量以下20dB，且始终不低于-50dBFS。
+
+    Args:
+        audio: float32 PCM 采样数组
+        sample_rate: 采样率
+        frame_ms: 帧长（毫秒）
+        threshold_db: 语音能量阈值，默认自适应
+        min_silence_ms: 短于该时长的静音视为语音的一部分
+        min_speech_ms: 短于该时长的语音片段被丢弃
+        pad_ms: 每个语音区间两侧保留的余量
+
+    Returns:
+        list: 语音区间 [(start_sample, end_sample), ...]
+    """
+    frame_size = max(1, int(sample_rate * frame_ms / 1000))
+    energy = frame_energy_db(audio, frame_size)
+    if len(energy) == 0:
+        return []
+
+    if threshold_db is None:
+        noise_floor = float(np.percentile(energy, 10))
+        threshold_db = max(min(noise_floor + 15.0, float(energy.max()) - 20.0), -50.0)
+    mask = energy > threshold_db
+
+    # 填补短静音
+    min_silence_frames = max(1, min_silence_ms // frame_ms)
+    for start, end in _runs(~mask):
+        if start > 0 and end < len(mask) and end - start < min_silence_frames:
+            mask[start:end] = True
+
+    min_speech_frames = max(1, min_speech_ms // frame_ms)
+    pad = int(sample_rate * pad_ms / 1000)
+    regions = []
+    for start, end in _runs(mask):
+        if end - start < min_speech_frames:
+            continue
+        start_sample = max(0, start * frame_size - pad)
+        end_sample = min(len(audio), end * frame_size + pad)
+        if regions and start_sample <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end_sample)
+        else:
+            regions.append((start_sample, end_sample))
+    return regions
+
+
+def split_into_chunks(audio: np.ndarray, sample_rate: int = 16000, max_chunk_seconds: float = 30,
+                      max_merge_gap_ms: int = 1000, frame_ms: int = 30, regions: list = None) -> list:
+    """按静音将音频切分为有长度上限的片段
+
+    相邻语音区间在间隔较短且总长不超限时合并；超长区间在后半段能量最低的帧处切开。
+
+    Args:
+        audio: float32 PCM 采样数组
+        sample_rate: 采样率
+        max_chunk_seconds: 单个片段的最大时长（秒）
+        max_merge_gap_ms: 合并相邻语音区间时允许的最大静音间隔
+        frame_ms: 寻找切分点时的帧长（毫秒）
+        regions: 预先检测的语音区间，默认自动检测
+
+    Returns:
+        list: 片段区间 [(start_sample, end_sample), ...]，按时间顺序排列
+    """
+    if regions is None:
+        regions = detect_speech_regions(audio, sample_rate, frame_ms=frame_ms)
+    max_len = int(max_chunk_seconds * sample_rate)
+    max_gap = int(sample_rate * max_merge_gap_ms / 1000)
+    frame_size = max(1, int(sample_rate * frame_ms / 1000))
+
+    chunks = []
+
+    def emit(start: int, end: int):
+        # 超长区间在 [start + max_len/2, start + max_len] 内能量最低处切分
+        while end - start > max_len:
+            search_start = start + max_len // 2
+            window = audio[search_start:start + max_len]
+            energy = frame_energy_db(window, frame_size)
+            cut = search_start + int(np.argmin(energy)) * frame_size if len(energy) else start + max_len
+            cut = min(max(cut, search_start + 1), start + max_len)
+            chunks.append((start, cut))
+            start = cut
+        if end > start:
+            chunks.append((start, end))
+
+    current = None
+    for start, end in regions:
+        if current is None:
+            current = [start, end]
+        elif start - current[1] <= max_gap and end - current[0] <= max_len:
+            current[1] = end
+        else:
+            emit(*current)
+            current = [start, end]
+    if current is not None:
+        emit(*current)
+    return chunks
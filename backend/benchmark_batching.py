@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+微批处理基准测试脚本：对比不同合批参数下的吞吐量与p99延迟
+
+用法:
+    python benchmark_batching.py clip.wav --concurrency 8 --requests 64
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.services.batching import MicroBatcher
+from app.services.model_service import model_service
+from app.utils.audio_processor import AudioProcessor
+
+
+def run_config(audio, max_batch_size: int, max_wait_ms: float, concurrency: int, requests: int) -> dict:
+    """在给定合批参数下并发发送请求，返回统计结果"""
+    batcher = MicroBatcher(model_service, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: batcher.transcribe(audio), range(requests)))
+    elapsed = time.perf_counter() - start
+    stats = batcher.stats()
+    batcher.shutdown()
+    stats["wall_throughput_rps"] = round(requests / elapsed, 3)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="微批处理吞吐量/延迟基准测试")
+    parser.add_argument("audio", help="测试用短音频文件")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求数")
+    parser.add_argument("--requests", type=int, default=64, help="每组参数的请求总数")
+    parser.add_argument("--batch-sizes", default="1,4,8", help="逗号分隔的最大批大小")
+    parser.add_argument("--waits", default="0,5,10,25", help="逗号分隔的最长等待时间（毫秒）")
+    args = parser.parse_args()
+
+    model_service.load_model()
+    audio = AudioProcessor.decode_to_array(args.audio, sample_rate=settings.AUDIO_SAMPLE_RATE, channels=settings.AUDIO_CHANNELS)
+
+    print(f"{'batch':>6} {'wait_ms':>8} {'avg_batch':>10} {'rps':>8} {'p50_ms':>9} {'p99_ms':>9}")
+    for max_batch_size in [int(v) for v in args.batch_sizes.split(",")]:
+        for max_wait_ms in [float(v) for v in args.waits.split(",")]:
+            stats = run_config(audio, max_batch_size, max_wait_ms, args.concurrency, args.requests)
+            print(f"{max_batch_size:>6} {max_wait_ms:>8.1f} {stats['avg_batch_size']:>10.2f} "
+                  f"{stats['wall_throughput_rps']:>8.2f} {stats['p50_latency_ms']:>9.1f} {stats['p99_latency_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+推理基准测试脚本：在参考集上对比 PyTorch fp32、INT8 动态量化与 ONNX Runtime 的实时率、峰值内存和字错误率
+
+参考集为制表符分隔的清单文件，每行一条：音频路径<TAB>参考文本（相对路径相对于清单所在目录）。
+每种推理方式在独立子进程中运行，峰值内存互不干扰。
+
+用法:
+    python benchmark_inference.py refset.tsv --variants torch,int8,onnx
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# 推理方式对应的环境变量
+VARIANTS = {
+    "torch": {"MODEL_BACKEND": "torch", "MODEL_QUANTIZE": "none"},
+    "int8": {"MODEL_BACKEND": "torch", "MODEL_QUANTIZE": "int8"},
+    "onnx": {"MODEL_BACKEND": "onnx", "MODEL_QUANTIZE": "none"}
+}
+
+
+def load_manifest(path: str) -> list:
+    """读取参考集清单
+
+    Args:
+        path: 清单文件路径
+
+    Returns:
+        list: [(音频路径, 参考文本), ...]
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            audio_path, _, reference = line.partition("\t")
+            items.append((os.path.join(base, audio_path), reference))
+    return items
+
+
+def run_variant(manifest: str) -> dict:
+    """在当前进程中按 MODEL_BACKEND/MODEL_QUANTIZE 环境变量加载模型并转录参考集（由子进程调用）"""
+    from app.core.config import settings
+    from app.services.model_service import model_service
+    from app.services.transcription_pipeline import transcription_pipeline
+    from app.utils.audio_processor import AudioProcessor
+    from app.utils.metrics import character_error_rate
+
+    items = load_manifest(manifest)
+    load_start = time.perf_counter()
+    model_service.load_model()
+    load_seconds = time.perf_counter() - load_start
+    status = model_service.status()
+    if status["mock"]:
+        raise RuntimeError(f"Model failed to load: {status['error']}")
+
+    clips = [
+        AudioProcessor.decode_to_array(path, sample_rate=settings.AUDIO_SAMPLE_RATE, channels=settings.AUDIO_CHANNELS)
+        for path, _ in items
+    ]
+    # 预热一次，排除首次推理的初始化开销
+    transcription_pipeline.transcribe(clips[0])
+
+    hypotheses = []
+    inference_seconds = 0.0
+    for audio in clips:
+        start = time.perf_counter()
+        segments = transcription_pipeline.transcribe(audio)
+        inference_seconds += time.perf_counter() - start
+        hypotheses.append("".join(segment["text"] for segment in segments))
+
+    audio_seconds = sum(len(audio) for audio in clips) / settings.AUDIO_SAMPLE_RATE
+    # Linux 下 ru_maxrss 单位为KB，macOS 下为字节
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+    return {
+        "backend": status["backend"],
+        "quantization": status["quantization"],
+        "clips": len(clips),
+        "audio_seconds": round(audio_seconds, 2),
+        "load_seconds": round(load_seconds, 2),
+        "rtf": round(inference_seconds / audio_seconds, 4) if audio_seconds else 0.0,
+        "peak_rss_mb": round(peak_rss_mb, 1),
+        "cer": round(character_error_rate([reference for _, reference in items], hypotheses), 4)
+    }
+
+
+def benchmark(manifest: str, variant: str) -> dict:
+    """在子进程中运行一种推理方式，返回其统计结果"""
+    env = os.environ.copy()
+    env.update(VARIANTS[variant])
+    # 关闭所有复用已识别结果的机制，否则预热登记的片段和之前运行写入磁盘的指纹会跳过推理
+    env["TRANSCRIPTION_CACHE"] = "false"
+    env["FINGERPRINT_INDEX"] = "false"
+    env["INCREMENTAL_TRANSCRIPTION"] = "false"
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), manifest, "--worker"],
+        env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.PIPE, check=True
+    )
+    # 子进程最后一行输出为JSON结果，之前的是模型加载日志
+    return json.loads(result.stdout.decode("utf-8").strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PyTorch/INT8/ONNX 推理基准测试")
+    parser.add_argument("manifest", help="参考集清单（音频路径<TAB>参考文本）")
+    parser.add_argument("--variants", default="torch,int8,onnx", help=f"逗号分隔的推理方式：{', '.join(VARIANTS)}")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_variant(args.manifest)))
+        return
+
+    results = {variant: benchmark(args.manifest, variant) for variant in args.variants.split(",")}
+    print(f"{'variant':>8} {'backend':>8} {'quant':>6} {'clips':>6} {'audio_s':>8} {'load_s':>7} {'rtf':>7} {'peak_mb':>9} {'cer':>7}")
+    for variant, stats in results.items():
+        print(f"{variant:>8} {stats['backend']:>8} {stats['quantization']:>6} {stats['clips']:>6} {stats['audio_seconds']:>8.1f} "
+              f"{stats['load_seconds']:>7.1f} {stats['rtf']:>7.3f} {stats['peak_rss_mb']:>9.1f} {stats['cer']:>7.2%}")
+
+
+if __name__ == "__main__":
+    main()
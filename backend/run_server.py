@@ -28,46 +28,87 @@ def start_server():
     # 设置环境变量，使用CPU运行（如需GPU，将USE_GPU设为true）
     env = os.environ.copy()
     env["USE_GPU"] = "false"
+    # 只监听本机，供同机的桌面应用访问；需要局域网访问时设置 SERVER_HOST
+    host = env.get("SERVER_HOST", "127.0.0.1")
     
-    # 启动服务器
-    server_process = subprocess.Popen([
-        sys.executable, "-m", "uvicorn", 
-        "app.main:app", 
-        "--host", "0.0.0.0",
-        "--port", "8000",
-        "--workers", "1"
-    ], env=env)
+    # 启动服务器：SERVER_WORKERS 大于1时由父进程加载模型后派生多个共享权重的工作进程
+    workers = int(env.get("SERVER_WORKERS", "1"))
+    if workers > 1:
+        command = [
+            sys.executable, "-m", "app.prefork",
+            "--host", host,
+            "--port", "8000",
+            "--workers", str(workers)
+        ]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", 
+            "app.main:app", 
+            "--host", host,
+            "--port", "8000",
+            "--workers", "1"
+        ]
+    server_process = subprocess.Popen(command, env=env)
     
-    # 增加模型加载时间，FunASR模型较大，需要更多时间加载
+    # 轮询就绪检查，模型加载完成即返回，不再固定等待
     print("正在加载FunASR模型，这可能需要几分钟...")
-    time.sleep(60)  # 增加到60秒，给模型足够的加载时间
-    
-    # 检查服务器是否启动成功
-    try:
-        response = requests.get("http://localhost:8000/health", timeout=10)  # 增加超时时间到10秒
-        if response.status_code == 200:
-            print("✅ FunASR backend server started successfully!")
-            print("   API地址: http://localhost:8000")
-            print("   健康检查: http://localhost:8000/health")
-            print("   Swagger文档: http://localhost:8000/docs")
-            return server_process
-        else:
-            print(f"❌ Server started but health check failed with status: {response.status_code}!")
-            print(f"   Response: {response.text}")
-            server_process.terminate()
-            return None
-    except requests.exceptions.ConnectionError:
-        print("❌ Failed to connect to server!")
-        print("   可能的原因: 模型加载时间过长或服务器启动失败")
-        print("   解决方法: 增加sleep时间或检查模型下载是否完整")
-        # 不立即终止，让服务器继续运行，用户可以手动检查
-        print("   服务器仍在后台运行，您可以手动访问 http://localhost:8000/health 检查状态")
-        return server_process
-    except requests.exceptions.Timeout:
-        print("❌ Health check timed out!")
-        print("   模型可能仍在加载中，请稍等几分钟后手动检查")
-        # 不立即终止，让服务器继续运行
+    if wait_for_ready(server_process):
+        print("✅ FunASR backend server started successfully!")
+        print("   API地址: http://localhost:8000")
+        print("   就绪检查: http://localhost:8000/health/ready")
+        print("   Swagger文档: http://localhost:8000/docs")
         return server_process
+    
+    server_process.terminate()
+    return None
+
+# 等待服务就绪
+def wait_for_ready(server_process, url="http://localhost:8000/health/ready", timeout=None):
+    """以指数退避轮询就绪检查接口，直到模型加载完成、加载失败或超时
+    
+    Args:
+        server_process: 服务器进程，进程退出时立即停止等待
+        url: 就绪检查地址
+        timeout: 最长等待时间（秒），默认读取环境变量 MODEL_LOAD_TIMEOUT（1800秒）
+        
+    Returns:
+        bool: 服务是否就绪
+    """
+    if timeout is None:
+        timeout = float(os.environ.get("MODEL_LOAD_TIMEOUT", "1800"))
+    deadline = time.time() + timeout
+    delay = 0.5
+    last_phase = None
+    
+    while time.time() < deadline:
+        if server_process.poll() is not None:
+            print(f"❌ Server exited with code {server_process.returncode}!")
+            return False
+        
+        try:
+            response = requests.get(url, timeout=5)
+            status = response.json()
+            if response.status_code == 200:
+                print(f"   模型加载完成，用时 {status.get('elapsed')} 秒")
+                return True
+            
+            phase = status.get("phase")
+            if phase == "failed":
+                print(f"❌ Model loading failed: {status.get('error')}")
+                return False
+            if phase != last_phase:
+                print(f"   模型状态: {phase}")
+                last_phase = phase
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, ValueError):
+            # 服务尚未开始监听或暂时无响应，继续等待
+            pass
+        
+        time.sleep(min(delay, max(0.0, deadline - time.time())))
+        delay = min(delay * 2, 2.0)
+    
+    print(f"❌ Server not ready after {timeout:.0f} seconds!")
+    print("   模型可能仍在下载或加载中，请检查控制台输出")
+    return False
 
 # 主函数
 def main():
@@ -0,0 +1,34 @@
+import threading
+from concurrent.futures import Future
+
+class FakeModelService:
+    """记录每次 transcribe_batch 调用的模拟模型服务"""
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+    
+    def transcribe_batch(self, inputs, hotwords=None, language=None, itn=None):
+        with self.lock:
+            self.calls.append((list(inputs), hotwords, language, itn))
+        return [f"{language}:{audio}" for audio in inputs]
+
+class FakeBatcher:
+    """立即返回片段起始位置文本的模拟微批处理层"""
+    def __init__(self):
+        self.calls = 0
+    
+    def submit(self, audio, **options):
+        self.calls += 1
+        future = Future()
+        future.set_result(f"片段{self.calls}")
+        return future
+
+class PendingBatcher:
+    """返回永不完成的 Future 的模拟微批处理层"""
+    def __init__(self):
+        self.futures = []
+    
+    def submit(self, audio, **options):
+        future = Future()
+        self.futures.append(future)
+        return future
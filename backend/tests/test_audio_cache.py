@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import pytest
+from app.services.audio_cache import DecodedAudioCache
+
+class TestDecodedAudioCache:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_put_and_get_memmap(self):
+        """测试写入后以只读内存映射方式读回，内容一致"""
+        cache = DecodedAudioCache(self.temp_dir, max_bytes=1024 * 1024)
+        audio = np.linspace(-1, 1, 16000, dtype=np.float32)
+        key = cache.make_key("abc")
+        
+        assert cache.get(key) is None
+        cache.put(key, audio)
+        cached = cache.get(key)
+        
+        assert isinstance(cached, np.memmap)
+        assert cached.dtype == np.float32
+        assert not cached.flags.writeable
+        np.testing.assert_array_equal(cached, audio)
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+    
+    def test_key_includes_format(self):
+        """测试不同采样率、声道数的解码结果分别缓存"""
+        assert DecodedAudioCache.make_key("abc", 16000, 1) != DecodedAudioCache.make_key("abc", 8000, 1)
+        assert DecodedAudioCache.make_key("abc", 16000, 1) != DecodedAudioCache.make_key("abc", 16000, 2)
+    
+    def test_lru_eviction_by_bytes(self):
+        """测试超出字节预算时淘汰最久未使用的条目"""
+        audio = np.zeros(1000, dtype=np.float32)
+        cache = DecodedAudioCache(self.temp_dir, max_bytes=2 * 4200)
+        cache.put("a", audio)
+        cache.put("b", audio)
+        cache.get("a")
+        cache.put("c", audio)
+        
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+    
+    def test_index_rebuilt_from_disk(self):
+        """测试新实例从缓存目录恢复条目，并可清空"""
+        DecodedAudioCache(self.temp_dir, max_bytes=1024 * 1024).put("a", np.ones(10, dtype=np.float32))
+        cache = DecodedAudioCache(self.temp_dir, max_bytes=1024 * 1024)
+        
+        assert cache.stats()["entries"] == 1
+        assert cache.purge() == 1
+        assert os.listdir(self.temp_dir) == []
+    
+    def test_disabled(self):
+        """测试禁用时不读写磁盘"""
+        cache = DecodedAudioCache(self.temp_dir, max_bytes=1024 * 1024, enabled=False)
+        cache.put("a", np.ones(10, dtype=np.float32))
+        
+        assert cache.get("a") is None
+        assert os.listdir(self.temp_dir) == []
@@ -1,7 +1,24 @@
 import pytest
 import tempfile
 import os
-from app.utils.audio_processor import AudioProcessor
+import io
+import shutil
+import wave
+import struct
+import numpy as np
+from app.utils.audio_processor import AudioProcessor, PipedDecoder, WavPassthroughDecoder, parse_wav_header
+from app.utils.cancellation import Cancelled, CancelToken
+
+def make_wav(sample_rate=16000, channels=1, frames=16000, seed=0):
+    """生成16位PCM WAV字节"""
+    samples = np.random.default_rng(seed).integers(-20000, 20000, frames * channels, dtype=np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples.tobytes())
+    return buffer.getvalue()
 
 class TestAudioProcessor:
     def setup_method(self):
@@ -45,4 +62,153 @@ class TestAudioProcessor:
     def test_cleanup_nonexistent_files(self):
         """测试清理不存在的文件"""
         # 调用清理函数清理不存在的文件，应该不会抛出异常
-        self.audio_processor.cleanup_temp_files(["nonexistent_file.txt"])
\ No newline at end of file
+        self.audio_processor.cleanup_temp_files(["nonexistent_file.txt"])
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_piped_decoder(self):
+        """测试管道解码：分块写入WAV字节，得到16kHz单声道float32 PCM"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(2)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(44100)
+            wav_file.writeframes(b"\x00\x10" * 2 * 44100)
+        data = buffer.getvalue()
+        
+        with self.audio_processor.open_decoder(sample_rate=16000, channels=1) as decoder:
+            for i in range(0, len(data), 4096):
+                decoder.feed(data[i:i + 4096])
+            audio = decoder.finish()
+        
+        assert audio.dtype == np.float32
+        assert abs(len(audio) - 16000) < 100
+    
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_piped_decoder_invalid_input(self):
+        """测试管道解码无效输入时抛出异常"""
+        with self.audio_processor.open_decoder() as decoder:
+            decoder.feed(b"test audio content")
+            with pytest.raises(Exception):
+                decoder.finish()
+    
+    def test_parse_wav_header(self):
+        """测试解析WAV头，跳过 data 块之前的 LIST 元数据块"""
+        data = make_wav(frames=100)
+        list_chunk = b"LIST" + struct.pack("<I", 5) + b"INFOx\x00"
+        fmt_end = data.index(b"data")
+        with_list = data[:fmt_end] + list_chunk + data[fmt_end:]
+        
+        header = parse_wav_header(with_list)
+        assert header["format"] == 1
+        assert header["sample_rate"] == 16000
+        assert header["channels"] == 1
+        assert header["bits"] == 16
+        assert header["data_size"] == 200
+        assert with_list[header["data_offset"] - 8:header["data_offset"] - 4] == b"data"
+        assert parse_wav_header(data[:30]) is None
+        assert parse_wav_header(b"ID3" + b"\x00" * 100) is None
+    
+    def test_passthrough_decoder(self):
+        """测试16kHz单声道PCM WAV走直通解码，不启动ffmpeg"""
+        data = make_wav()
+        before = AudioProcessor.ingest_stats()["passthrough"]
+        
+        with self.audio_processor.open_decoder(sample_rate=16000, channels=1, head=data[:1024]) as decoder:
+            assert isinstance(decoder, WavPassthroughDecoder)
+            for i in range(0, len(data), 1000):
+                decoder.feed(data[i:i + 1000])
+            audio = decoder.finish()
+        
+        expected = np.frombuffer(data[44:], dtype=np.int16).astype(np.float32) / 32768.0
+        np.testing.assert_array_equal(audio, expected)
+        assert AudioProcessor.ingest_stats()["passthrough"] == before + 1
+    
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_passthrough_matches_ffmpeg(self):
+        """测试直通解码与ffmpeg转码得到相同的采样"""
+        data = make_wav(frames=8000)
+        passthrough = WavPassthroughDecoder(parse_wav_header(data))
+        passthrough.feed(data)
+        with PipedDecoder(sample_rate=16000, channels=1) as decoder:
+            decoder.feed(data)
+            transcoded = decoder.finish()
+        
+        np.testing.assert_allclose(passthrough.finish(), transcoded, atol=1e-6)
+    
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_mismatched_wav_is_transcoded(self):
+        """测试采样率或声道数不符的WAV仍经ffmpeg转码，解码完成时才计数"""
+        for data in (make_wav(sample_rate=44100), make_wav(channels=2)):
+            before = AudioProcessor.ingest_stats()["transcoded"]
+            with self.audio_processor.open_decoder(sample_rate=16000, channels=1, head=data[:1024]) as decoder:
+                assert isinstance(decoder, PipedDecoder)
+                decoder.feed(data)
+                decoder.finish()
+            assert AudioProcessor.ingest_stats()["transcoded"] == before + 1
+    
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_aborted_decoder_not_counted(self):
+        """测试打开后中止的解码器（如命中缓存）不计入转码次数"""
+        data = make_wav(sample_rate=44100)
+        before = AudioProcessor.ingest_stats()
+        with self.audio_processor.open_decoder(sample_rate=16000, channels=1, head=data[:1024]) as decoder:
+            decoder.feed(data[:1024])
+        
+        assert AudioProcessor.ingest_stats() == before
+    
+    def test_decode_to_array_passthrough(self):
+        """测试从文件解码时符合格式的WAV直接读取采样"""
+        data = make_wav(frames=1600)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
+            temp_file.write(data)
+        try:
+            before = AudioProcessor.ingest_stats()["passthrough"]
+            audio = self.audio_processor.decode_to_array(temp_file.name, sample_rate=16000, channels=1)
+            assert len(audio) == 1600
+            assert AudioProcessor.ingest_stats()["passthrough"] == before + 1
+        finally:
+            os.unlink(temp_file.name)
+    
+    def test_passthrough_time_range(self):
+        """测试直通解码只保留时间窗口内的采样"""
+        data = make_wav(frames=16000)
+        samples = np.frombuffer(data[44:], dtype=np.int16).astype(np.float32) / 32768.0
+        decoder = WavPassthroughDecoder(parse_wav_header(data), start=0.25, end=0.5)
+        for i in range(0, len(data), 1000):
+            decoder.feed(data[i:i + 1000])
+        
+        np.testing.assert_array_equal(decoder.finish(), samples[4000:8000])
+    
+    def test_decode_to_array_time_range(self):
+        """测试从文件解码时只读取窗口内的采样，终点超出时长时截至结尾"""
+        data = make_wav(frames=16000)
+        samples = np.frombuffer(data[44:], dtype=np.int16).astype(np.float32) / 32768.0
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
+            temp_file.write(data)
+        try:
+            audio = self.audio_processor.decode_to_array(temp_file.name, start=0.5, end=5.0)
+            np.testing.assert_array_equal(audio, samples[8000:])
+        finally:
+            os.unlink(temp_file.name)
+    
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_piped_decoder_time_range(self):
+        """测试管道解码在输入端定位，读完窗口后丢弃其余输入"""
+        data = make_wav(sample_rate=44100, frames=44100 * 4)
+        with PipedDecoder(sample_rate=16000, channels=1, start=1.0, end=1.5) as decoder:
+            for i in range(0, len(data), 4096):
+                decoder.feed(data[i:i + 4096])
+            audio = decoder.finish()
+        
+        assert abs(len(audio) - 8000) < 100
+    
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_piped_decoder_cancelled(self):
+        """测试令牌已取消时终止ffmpeg进程"""
+        token = CancelToken()
+        token.cancel("disconnected")
+        decoder = PipedDecoder(sample_rate=16000, channels=1)
+        decoder.feed(make_wav(frames=16000))
+        
+        with pytest.raises(Cancelled):
+            decoder.finish(token)
+        assert decoder.process.poll() is not None
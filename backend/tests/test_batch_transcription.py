@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pytest
+import app.services.batch_transcription as batch_module
+import transcribe_dir
+from app.services.batch_transcription import BatchManifest, find_audio_files, transcribe_file
+from app.services.transcription_cache import TranscriptionCache
+from app.services.audio_cache import DecodedAudioCache
+
+class FakePipeline:
+    """每秒音频为一个片段，可在指定片段处模拟中断"""
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.skipped = []
+    
+    def transcribe(self, audio, options=None, progress=None, on_segment=None, skip_chunks=0, report=None, episode=None,
+                   priority=None):
+        self.skipped.append(skip_chunks)
+        total = len(audio) // 16000
+        for index in range(skip_chunks, total):
+            if index == self.fail_at:
+                raise RuntimeError("interrupted")
+            on_segment({"start": float(index), "end": float(index + 1), "text": f"第{index}句。"})
+            progress(index + 1, total)
+
+class TestBatchTranscription:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.temp_dir, "episodes")
+        self.output_dir = os.path.join(self.temp_dir, "out")
+        os.makedirs(os.path.join(self.input_dir, "season1"))
+        for relpath in ("a.mp3", os.path.join("season1", "b.m4a")):
+            with open(os.path.join(self.input_dir, relpath), "wb") as f:
+                f.write(relpath.encode("utf-8"))
+        open(os.path.join(self.input_dir, "notes.txt"), "w").close()
+    
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    @pytest.fixture(autouse=True)
+    def fake_services(self, monkeypatch):
+        self.pipeline = FakePipeline()
+        monkeypatch.setattr(batch_module, "transcription_pipeline", self.pipeline)
+        monkeypatch.setattr(batch_module, "transcription_cache", TranscriptionCache(os.path.join(self.temp_dir, "cache"), 1024 * 1024, enabled=False))
+        monkeypatch.setattr(batch_module, "audio_cache", DecodedAudioCache(os.path.join(self.temp_dir, "audio"), 1024 * 1024 * 1024, enabled=False))
+        monkeypatch.setattr(batch_module.model_service, "is_ready", lambda: True)
+        monkeypatch.setattr(batch_module.speaker_service, "enabled", False)
+        monkeypatch.setattr(transcribe_dir.model_service, "load_model", lambda: True)
+        monkeypatch.setattr(batch_module.AudioProcessor, "decode_to_array",
+                            staticmethod(lambda path, sample_rate, channels: np.zeros(3 * 16000, dtype=np.float32)))
+    
+    def test_find_audio_files(self):
+        """测试递归查找音频文件并忽略其他文件"""
+        assert find_audio_files(self.input_dir) == ["a.mp3", os.path.join("season1", "b.m4a")]
+    
+    def test_resume_from_checkpoint(self):
+        """测试中断后从检查点之后的片段继续，结果完整且按顺序"""
+        source = os.path.join(self.input_dir, "a.mp3")
+        transcript = os.path.join(self.output_dir, "a.mp3.json")
+        checkpoint = os.path.join(self.output_dir, "a.mp3.checkpoint.json")
+        
+        self.pipeline.fail_at = 2
+        with pytest.raises(RuntimeError):
+            transcribe_file(source, transcript, checkpoint)
+        with open(checkpoint, "r", encoding="utf-8") as f:
+            assert json.load(f)["chunks_done"] == 2
+        
+        self.pipeline.fail_at = None
+        result = transcribe_file(source, transcript, checkpoint)
+        
+        assert result["resumed_chunks"] == 2
+        assert self.pipeline.skipped == [0, 2]
+        assert not os.path.exists(checkpoint)
+        with open(transcript, "r", encoding="utf-8") as f:
+            texts = [item["text"] for item in json.load(f)["transcription"]]
+        assert texts == ["第0句。", "第1句。", "第2句。"]
+    
+    def test_second_run_skips_completed(self):
+        """测试第二次运行跳过已完成且未修改的文件，修改过的文件重新转录"""
+        summary = transcribe_dir.run(self.input_dir, self.output_dir, workers=1)
+        assert summary["completed"] == 2
+        assert os.path.exists(os.path.join(self.output_dir, "season1", "b.m4a.json"))
+        manifest = BatchManifest(os.path.join(self.output_dir, "manifest.json"))
+        assert manifest.counts() == {"completed": 2}
+        assert all(len(entry["sha256"]) == 64 for entry in manifest.files.values())
+        
+        summary = transcribe_dir.run(self.input_dir, self.output_dir, workers=1)
+        assert summary["completed"] == 0
+        assert summary["skipped"] == 2
+        
+        with open(os.path.join(self.input_dir, "a.mp3"), "ab") as f:
+            f.write(b"edited")
+        summary = transcribe_dir.run(self.input_dir, self.output_dir, workers=1)
+        assert summary["completed"] == 1
+        assert summary["skipped"] == 1
+    
+    def test_failures_are_recorded(self, monkeypatch):
+        """测试单个文件失败时记录错误，不影响其他文件"""
+        def decode(path, sample_rate, channels):
+            if path.endswith(".m4a"):
+                raise ValueError("corrupt file")
+            return np.zeros(16000, dtype=np.float32)
+        monkeypatch.setattr(batch_module.AudioProcessor, "decode_to_array", staticmethod(decode))
+        
+        summary = transcribe_dir.run(self.input_dir, self.output_dir, workers=1)
+        
+        assert summary["completed"] == 1
+        assert summary["failed"] == 1
+        manifest = BatchManifest(os.path.join(self.output_dir, "manifest.json"))
+        assert manifest.files[os.path.join("season1", "b.m4a")]["error"] == "corrupt file"
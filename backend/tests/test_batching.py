@@ -0,0 +1,128 @@
+import pytest
+import threading
+import time
+from app.services.batching import MicroBatcher
+from tests.conftest import FakeModelService
+
+class TestMicroBatcher:
+    def setup_method(self):
+        self.service = FakeModelService()
+        self.batcher = MicroBatcher(self.service, max_batch_size=4, max_wait_ms=200)
+    
+    def teardown_method(self):
+        self.batcher.shutdown()
+    
+    def test_concurrent_requests_are_batched(self):
+        """测试并发请求合并为一次调用，结果按调用方分发"""
+        futures = [self.batcher.submit(f"clip{i}", language="中文") for i in range(4)]
+        results = [future.result(timeout=5) for future in futures]
+        
+        assert results == [f"中文:clip{i}" for i in range(4)]
+        assert len(self.service.calls) == 1
+        assert self.service.calls[0][0] == ["clip0", "clip1", "clip2", "clip3"]
+        
+        stats = self.batcher.stats()
+        assert stats["total_requests"] == 4
+        assert stats["total_batches"] == 1
+        assert stats["avg_batch_size"] == 4
+    
+    def test_incompatible_settings_not_batched(self):
+        """测试不同语言的请求不会合入同一批次"""
+        zh = self.batcher.submit("a", language="中文")
+        en = self.batcher.submit("b", language="英文")
+        
+        assert zh.result(timeout=5) == "中文:a"
+        assert en.result(timeout=5) == "英文:b"
+        assert len(self.service.calls) == 2
+        assert {call[2] for call in self.service.calls} == {"中文", "英文"}
+    
+    def test_max_batch_size(self):
+        """测试单批请求数不超过上限"""
+        futures = [self.batcher.submit(i, language="中文") for i in range(6)]
+        for future in futures:
+            future.result(timeout=5)
+        
+        assert [len(call[0]) for call in self.service.calls] == [4, 2]
+    
+    def test_error_propagates(self):
+        """测试推理异常传递给批次内的所有调用方"""
+        def fail(inputs, **kwargs):
+            raise RuntimeError("inference failed")
+        self.service.transcribe_batch = fail
+        
+        with pytest.raises(RuntimeError):
+            self.batcher.transcribe("a")
+    
+    def test_missing_results_fail(self):
+        """测试模型返回的结果少于输入时，没有结果的请求收到异常而不是一直等待"""
+        self.service.transcribe_batch = lambda inputs, **kwargs: ["only"]
+        futures = [self.batcher.submit(f"clip{i}", language="中文") for i in range(3)]
+        
+        assert futures[0].result(timeout=5) == "only"
+        for future in futures[1:]:
+            with pytest.raises(RuntimeError):
+                future.result(timeout=5)
+    
+    def test_cancelled_request_skipped(self):
+        """测试组批前已取消的请求不进入模型"""
+        cancelled = self.batcher.submit("a", language="中文")
+        kept = self.batcher.submit("b", language="中文")
+        assert cancelled.cancel()
+        
+        assert kept.result(timeout=5) == "中文:b"
+        assert self.service.calls[0][0] == ["b"]
+        assert self.batcher.stats()["cancelled_requests"] == 1
+    
+    def test_shutdown_cancels_pending(self):
+        """测试关闭时排队中的请求直接取消，只等待正在执行的批次"""
+        gate = threading.Event()
+        transcribe_batch = self.service.transcribe_batch
+        def blocking(inputs, **kwargs):
+            gate.wait(5)
+            return transcribe_batch(inputs, **kwargs)
+        self.service.transcribe_batch = blocking
+        batcher = MicroBatcher(self.service, max_batch_size=1, max_wait_ms=0)
+        running = batcher.submit("running", language="中文")
+        while batcher.stats()["pending"]:
+            time.sleep(0.01)
+        queued = [batcher.submit(f"clip{i}", language="中文") for i in range(3)]
+        
+        batcher.shutdown(timeout=0.1)
+        assert all(future.cancelled() for future in queued)
+        assert batcher.stats()["cancelled_requests"] == 3
+        gate.set()
+        assert running.result(timeout=5) == "中文:running"
+        assert [call[0] for call in self.service.calls] == [["running"]]
+    
+    def test_interactive_overtakes_bulk(self):
+        """测试交互请求插到排队的批量请求之前，批量请求排队过久后优先级提升"""
+        gate = threading.Event()
+        transcribe_batch = self.service.transcribe_batch
+        def blocking(inputs, **kwargs):
+            gate.wait(5)
+            return transcribe_batch(inputs, **kwargs)
+        self.service.transcribe_batch = blocking
+        batcher = MicroBatcher(self.service, max_batch_size=1, max_wait_ms=0, aging_seconds=0.05)
+        try:
+            futures = [batcher.submit("running", priority="bulk")]
+            while batcher.stats()["pending"]:
+                time.sleep(0.01)
+            futures.append(batcher.submit("aged", priority="bulk"))
+            time.sleep(0.2)
+            futures += [batcher.submit("backfill", priority="bulk"), batcher.submit("clip", priority="interactive")]
+            gate.set()
+            for future in futures:
+                future.result(timeout=5)
+            
+            assert [call[0][0] for call in self.service.calls] == ["running", "aged", "clip", "backfill"]
+            priorities = batcher.stats()["priorities"]
+            assert priorities["interactive"]["requests"] == 1
+            assert priorities["bulk"]["requests"] == 3
+            assert priorities["bulk"]["p95_queue_wait_ms"] >= priorities["interactive"]["p95_queue_wait_ms"]
+        finally:
+            batcher.shutdown()
+    
+    def test_unknown_priority(self):
+        """测试未知的优先级被拒绝"""
+        with pytest.raises(ValueError):
+            self.batcher.submit("a", priority="urgent")
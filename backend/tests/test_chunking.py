@@ -0,0 +1,51 @@
+import pytest
+import numpy as np
+from app.utils.chunking import chunk_digest, content_defined_chunks, cut_candidates
+
+SAMPLE_RATE = 16000
+
+def make_speech(seconds: float, seed: int) -> np.ndarray:
+    """生成语句与短停顿交替的测试音频"""
+    rng = np.random.default_rng(seed)
+    parts = []
+    total = 0
+    while total < seconds * SAMPLE_RATE:
+        n = int(rng.uniform(1, 4) * SAMPLE_RATE)
+        t = np.arange(n) / SAMPLE_RATE
+        parts.append(0.3 * np.sin(2 * np.pi * rng.uniform(100, 300) * t) + 0.003 * rng.standard_normal(n))
+        pause = int(rng.uniform(0.2, 0.8) * SAMPLE_RATE)
+        parts.append(0.003 * rng.standard_normal(pause))
+        total += n + pause
+    return np.concatenate(parts).astype(np.float32)
+
+class TestContentDefinedChunks:
+    def test_chunks_cover_audio_within_bounds(self):
+        """测试片段首尾相接覆盖整段音频，不超过最长时长，平均时长不小于切分点间距"""
+        audio = make_speech(300, seed=0)
+        chunks = content_defined_chunks(audio, SAMPLE_RATE, min_chunk_seconds=10, max_chunk_seconds=30)
+
+        assert chunks[0][0] == 0
+        assert chunks[-1][1] == len(audio)
+        for (_, end), (start, _) in zip(chunks, chunks[1:]):
+            assert end == start
+        assert all(end - start <= 30 * SAMPLE_RATE for start, end in chunks)
+        assert len(audio) / len(chunks) >= 10 * SAMPLE_RATE
+
+    def test_candidates_independent_of_block_size(self):
+        """测试分块计算的候选点与块大小无关"""
+        audio = make_speech(60, seed=0)
+
+        assert np.array_equal(cut_candidates(audio, SAMPLE_RATE, block_size=1 << 20),
+                              cut_candidates(audio, SAMPLE_RATE, block_size=12345))
+
+    def test_insertion_keeps_other_chunks(self):
+        """测试在中间插入一段音频后，插入点前后的片段内容不变"""
+        audio = make_speech(300, seed=0)
+        position = 100 * SAMPLE_RATE + 123
+        edited = np.concatenate([audio[:position], make_speech(7, seed=1), audio[position:]])
+
+        before = {chunk_digest(audio[s:e]) for s, e in content_defined_chunks(audio, SAMPLE_RATE)}
+        after = [chunk_digest(edited[s:e]) for s, e in content_defined_chunks(edited, SAMPLE_RATE)]
+
+        changed = [digest for digest in after if digest not in before]
+        assert 1 <= len(changed) <= 3
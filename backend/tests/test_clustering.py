@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+from app.utils.clustering import (
+    agglomerative_cluster,
+    cluster_embeddings,
+    iter_similarity_blocks,
+    l2_normalize,
+    spherical_kmeans
+)
+
+def make_speakers(num_speakers=3, windows=600, dim=32, noise=0.3, seed=0):
+    """生成围绕若干说话人中心的嵌入和真实标签"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_speakers, dim))
+    labels = rng.integers(0, num_speakers, windows)
+    return centers[labels] + noise * rng.normal(size=(windows, dim)), labels
+
+def same_partition(a, b):
+    """两组标签是否为同一划分（编号可不同）"""
+    pairs = set(zip(a.tolist(), b.tolist()))
+    return len(pairs) == len(set(a.tolist())) == len(set(b.tolist()))
+
+class TestClustering:
+    def test_similarity_blocks_match_full_matrix(self):
+        """测试分块计算的相似度与整体计算一致"""
+        x = l2_normalize(np.random.default_rng(0).normal(size=(50, 8)))
+        full = x @ x.T
+        blocks = np.zeros_like(full)
+        for start, sim in iter_similarity_blocks(x, x, block_size=16):
+            assert sim.shape[0] <= 16
+            blocks[start:start + len(sim)] = sim
+        np.testing.assert_allclose(blocks, full, atol=1e-6)
+    
+    def test_agglomerative_threshold_and_num_clusters(self):
+        """测试凝聚聚类按阈值停止合并，或合并到指定簇数"""
+        x, labels = make_speakers(windows=60)
+        x = l2_normalize(x)
+        
+        assert same_partition(agglomerative_cluster(x, threshold=0.5), labels)
+        assert len(set(agglomerative_cluster(x, num_clusters=2).tolist())) == 2
+    
+    def test_spherical_kmeans_counts(self):
+        """测试微簇成员数之和等于向量数"""
+        x, _ = make_speakers(windows=500)
+        centroids, labels, counts = spherical_kmeans(l2_normalize(x), 20, block_size=64)
+        
+        assert len(centroids) == 20
+        assert counts.sum() == 500
+        np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-5)
+    
+    def test_cluster_embeddings_with_micro_clusters(self):
+        """测试窗口数超过微簇上限时先压缩再聚类，结果按首次出现的顺序编号"""
+        x, labels = make_speakers(windows=2000)
+        result = cluster_embeddings(x, threshold=0.5, max_micro_clusters=32, block_size=128)
+        
+        assert same_partition(result, labels)
+        assert result[0] == 0
+        assert len(cluster_embeddings(np.zeros((0, 32)))) == 0
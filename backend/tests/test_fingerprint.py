@@ -0,0 +1,230 @@
+import pytest
+import numpy as np
+from app.utils.fingerprint import landmark_hashes
+from app.services.fingerprint_index import FingerprintIndex
+from app.services.transcription_pipeline import TranscriptionPipeline
+from tests.conftest import FakeBatcher
+from tests.test_chunking import make_speech
+
+SAMPLE_RATE = 16000
+
+def make_jingle(seconds: float, seed: int) -> np.ndarray:
+    """生成由衰减的随机音符组成的片段，模拟片头音乐"""
+    rng = np.random.default_rng(seed)
+    notes = []
+    for _ in range(int(seconds * 8)):
+        t = np.arange(SAMPLE_RATE // 8) / SAMPLE_RATE
+        freqs = rng.uniform(200, 4000, size=3)
+        notes.append(sum(np.sin(2 * np.pi * f * t) for f in freqs) / 3 * np.exp(-20 * t))
+    return (0.5 * np.concatenate(notes)).astype(np.float32)
+
+class TestLandmarkHashes:
+    def test_same_audio_same_hashes(self):
+        """测试相同音频得到相同指纹"""
+        audio = make_jingle(5, seed=1)
+        hashes, times = landmark_hashes(audio, SAMPLE_RATE)
+        again, _ = landmark_hashes(audio.copy(), SAMPLE_RATE)
+
+        assert len(hashes) > 100
+        assert len(hashes) == len(times)
+        assert np.array_equal(hashes, again)
+
+    def test_noise_keeps_most_hashes(self):
+        """测试加入轻微噪声后大部分哈希不变"""
+        audio = make_jingle(5, seed=1)
+        noisy = audio + 0.01 * np.random.default_rng(0).standard_normal(len(audio)).astype(np.float32)
+        hashes, _ = landmark_hashes(audio, SAMPLE_RATE)
+        noisy_hashes, _ = landmark_hashes(noisy, SAMPLE_RATE)
+
+        assert len(np.intersect1d(hashes, noisy_hashes)) > 0.8 * len(np.unique(hashes))
+
+    def test_silence_has_no_hashes(self):
+        """测试静音和过短音频没有指纹"""
+        assert len(landmark_hashes(np.zeros(SAMPLE_RATE, dtype=np.float32))[0]) == 0
+        assert len(landmark_hashes(np.zeros(100, dtype=np.float32))[0]) == 0
+
+class TestFingerprintIndex:
+    def setup_method(self):
+        self.audio = make_jingle(5, seed=1)
+        self.hashes, self.times = landmark_hashes(self.audio, SAMPLE_RATE)
+
+    def make_index(self, tmp_path, **kwargs):
+        return FingerprintIndex(str(tmp_path / "fingerprints"), frames_per_second=SAMPLE_RATE / 256, **kwargs)
+
+    def test_lookup_after_add(self, tmp_path):
+        """测试登记后相同片段命中，返回已识别文本"""
+        index = self.make_index(tmp_path)
+        assert index.lookup(self.hashes, self.times, 5.0, "k") is None
+        index.add(self.hashes, self.times, 5.0, "欢迎收听本节目", "k")
+
+        assert index.lookup(self.hashes, self.times, 5.0, "k") == "欢迎收听本节目"
+        stats = index.stats()
+        assert stats["hits"] == 1
+        assert stats["seconds_saved"] == 5.0
+
+    def test_different_audio_misses(self, tmp_path):
+        """测试不同内容、不同识别配置、时长不符时都不命中"""
+        index = self.make_index(tmp_path)
+        index.add(self.hashes, self.times, 5.0, "欢迎收听本节目", "k")
+        other_hashes, other_times = landmark_hashes(make_jingle(5, seed=2), SAMPLE_RATE)
+
+        assert index.lookup(other_hashes, other_times, 5.0, "k") is None
+        assert index.lookup(self.hashes, self.times, 5.0, "other") is None
+        assert index.lookup(self.hashes, self.times, 8.0, "k") is None
+
+    def test_empty_text_marks_non_speech(self, tmp_path):
+        """测试无语音的音乐片段登记为空文本，命中时返回空字符串"""
+        index = self.make_index(tmp_path)
+        index.add(self.hashes, self.times, 5.0, "", "k")
+
+        assert index.lookup(self.hashes, self.times, 5.0, "k") == ""
+
+    def test_flush_persists(self, tmp_path):
+        """测试flush后新实例从磁盘加载指纹库"""
+        index = self.make_index(tmp_path)
+        index.add(self.hashes, self.times, 5.0, "欢迎收听本节目", "k")
+        index.flush()
+
+        reloaded = self.make_index(tmp_path)
+        assert reloaded.lookup(self.hashes, self.times, 5.0, "k") == "欢迎收听本节目"
+        assert reloaded.stats()["segments"] == 1
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """测试超过哈希上限时淘汰最久未命中的片段"""
+        index = self.make_index(tmp_path, max_hashes=int(len(self.hashes) * 1.5))
+        index.add(self.hashes, self.times, 5.0, "旧片段", "k")
+        other_hashes, other_times = landmark_hashes(make_jingle(5, seed=2), SAMPLE_RATE)
+        index.add(other_hashes, other_times, 5.0, "新片段", "k")
+        index.flush()
+
+        assert index.lookup(self.hashes, self.times, 5.0, "k") is None
+        assert index.lookup(other_hashes, other_times, 5.0, "k") == "新片段"
+        assert index.stats()["hashes"] <= index.max_hashes
+
+    def test_shared_intro_only_misses(self, tmp_path):
+        """测试只共用片头的两个片段不命中，避免返回上一期节目的文本"""
+        index = self.make_index(tmp_path)
+        intro = make_jingle(8, seed=1)
+        first = np.concatenate([intro, make_jingle(22, seed=2)])
+        second = np.concatenate([intro, make_jingle(22, seed=3)])
+        index.add(*landmark_hashes(first, SAMPLE_RATE), 30.0, "第一期", "k")
+
+        assert index.lookup(*landmark_hashes(second, SAMPLE_RATE), 30.0, "k") is None
+        assert index.lookup(*landmark_hashes(first, SAMPLE_RATE), 30.0, "k") == "第一期"
+
+    def test_flush_interval(self, tmp_path):
+        """测试写入间隔内的 flush 不写磁盘，force 时立即写入"""
+        index = self.make_index(tmp_path, flush_interval_seconds=3600)
+        index.add(self.hashes, self.times, 5.0, "欢迎收听本节目", "k")
+        index.flush()
+        other_hashes, other_times = landmark_hashes(make_jingle(5, seed=2), SAMPLE_RATE)
+        index.add(other_hashes, other_times, 5.0, "广告", "k")
+        index.flush()
+        assert self.make_index(tmp_path).stats()["segments"] == 1
+
+        index.flush(force=True)
+        assert self.make_index(tmp_path).stats()["segments"] == 2
+
+    def test_concurrent_writers_merge(self, tmp_path):
+        """测试两个进程各自登记的片段在写盘时合并，不互相覆盖"""
+        first = self.make_index(tmp_path)
+        second = self.make_index(tmp_path)
+        other_hashes, other_times = landmark_hashes(make_jingle(5, seed=2), SAMPLE_RATE)
+        first.stats()
+        second.stats()
+        first.add(self.hashes, self.times, 5.0, "片头", "k")
+        second.add(other_hashes, other_times, 5.0, "广告", "k")
+        first.flush()
+        second.flush()
+
+        reloaded = self.make_index(tmp_path)
+        assert reloaded.lookup(self.hashes, self.times, 5.0, "k") == "片头"
+        assert reloaded.lookup(other_hashes, other_times, 5.0, "k") == "广告"
+        assert reloaded.stats()["segments"] == 2
+
+
+class TestPipelineFingerprints:
+    def test_repeated_intro_skips_inference(self, tmp_path):
+        """测试第二期节目的相同片头复用文本，不再推理，并报告节省的推理时长"""
+        batcher = FakeBatcher()
+        index = FingerprintIndex(str(tmp_path / "fingerprints"), frames_per_second=SAMPLE_RATE / 256)
+        pipeline = TranscriptionPipeline(batcher, sample_rate=SAMPLE_RATE, long_audio_seconds=60,
+                                         fingerprints=index)
+        intro = make_jingle(5, seed=1)
+
+        first = {}
+        segments = pipeline.transcribe(intro, report=first)
+        second = {}
+        repeated = pipeline.transcribe(intro, report=second)
+
+        assert batcher.calls == 1
+        assert repeated == segments
+        assert first == {"chunks": 1, "matched_chunks": 0, "reused_chunks": 0, "inference_seconds_saved": 0.0}
+        assert second == {"chunks": 1, "matched_chunks": 1, "reused_chunks": 0, "inference_seconds_saved": 5.0}
+
+    def test_mock_model_output_not_registered(self, tmp_path):
+        """测试模型未就绪时模拟文本不登记到指纹库"""
+        batcher = FakeBatcher()
+        index = FingerprintIndex(str(tmp_path / "fingerprints"), frames_per_second=SAMPLE_RATE / 256)
+        pipeline = TranscriptionPipeline(batcher, sample_rate=SAMPLE_RATE, long_audio_seconds=60,
+                                         fingerprints=index, ready=lambda: False)
+        intro = make_jingle(5, seed=1)
+
+        pipeline.transcribe(intro)
+        report = {}
+        pipeline.transcribe(intro, report=report)
+
+        assert batcher.calls == 2
+        assert report["matched_chunks"] == 0
+        assert index.stats()["segments"] == 0
+
+    def test_edge_seconds_limits_fingerprinting(self, tmp_path):
+        """测试只对开头和结尾范围内的片段做指纹"""
+        index = FingerprintIndex(str(tmp_path / "fingerprints"))
+        pipeline = TranscriptionPipeline(FakeBatcher(), sample_rate=SAMPLE_RATE, fingerprints=index,
+                                         fingerprint_edge_seconds=60)
+        total = SAMPLE_RATE * 600
+
+        assert pipeline._fingerprinted(0, SAMPLE_RATE * 30, total)
+        assert pipeline._fingerprinted(total - SAMPLE_RATE * 30, total, total)
+        assert not pipeline._fingerprinted(SAMPLE_RATE * 300, SAMPLE_RATE * 330, total)
+
+    def test_repeated_intro_followed_by_speech_in_same_chunk(self, tmp_path):
+        """测试片头与其后的新语音在同一片段中时在片头边界处切开，片头复用文本，只推理其后的语音"""
+        batcher = FakeBatcher()
+        index = FingerprintIndex(str(tmp_path / "fingerprints"), frames_per_second=SAMPLE_RATE / 256)
+        pipeline = TranscriptionPipeline(batcher, sample_rate=SAMPLE_RATE, long_audio_seconds=60,
+                                         fingerprints=index)
+        intro = make_jingle(5, seed=1)
+        pipeline.transcribe(intro)
+
+        report = {}
+        segments = pipeline.transcribe(np.concatenate([intro, make_speech(10, seed=2)]), report=report)
+
+        assert batcher.calls == 2
+        assert [segment["text"] for segment in segments] == ["片段1", "片段2"]
+        assert segments[0] == {"start": 0.0, "end": 5.0, "text": "片段1"}
+        assert segments[1]["start"] == 5.0
+        assert report["matched_chunks"] == 1
+        assert report["inference_seconds_saved"] == 5.0
+
+    def test_shared_intro_split_and_registered(self, tmp_path):
+        """测试两期节目只共用片头时切开片头单独推理并登记，第三期的片头整段复用"""
+        batcher = FakeBatcher()
+        index = FingerprintIndex(str(tmp_path / "fingerprints"), frames_per_second=SAMPLE_RATE / 256)
+        pipeline = TranscriptionPipeline(batcher, sample_rate=SAMPLE_RATE, long_audio_seconds=60,
+                                         fingerprints=index)
+        intro = make_jingle(5, seed=1)
+
+        pipeline.transcribe(np.concatenate([intro, make_speech(10, seed=2)]))
+        assert batcher.calls == 1
+        second = pipeline.transcribe(np.concatenate([intro, make_speech(10, seed=3)]))
+        assert batcher.calls == 3
+        assert len(second) == 2
+        assert abs(second[0]["end"] - 5.0) < 0.5
+
+        report = {}
+        third = pipeline.transcribe(np.concatenate([intro, make_speech(10, seed=4)]), report=report)
+        assert batcher.calls == 4
+        assert report["matched_chunks"] == 1
+        assert third[0] == {"start": 0.0, "end": second[0]["end"], "text": second[0]["text"]}
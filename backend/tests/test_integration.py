@@ -3,6 +3,10 @@ from fastapi.testclient import TestClient
 from app.main import app
 import tempfile
 import os
+import io
+import json
+import shutil
+import wave
 
 client = TestClient(app)
 
@@ -19,6 +23,17 @@ class TestIntegration:
         assert response.status_code == 200
         assert response.json()["status"] == "healthy"
     
+    def test_liveness_and_readiness(self):
+        """测试存活检查始终可用，模型未加载时就绪检查返回503"""
+        response = client.get("/health/live")
+        assert response.status_code == 200
+        assert response.json()["status"] == "alive"
+        
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "not_ready"
+        assert "phase" in response.json()
+    
     def test_thinking_process_analyze(self):
         """测试思考过程分析端点"""
         # 准备测试数据
@@ -132,4 +147,202 @@ class TestIntegration:
             assert response.status_code == 500
         finally:
             # 清理测试文件
-            os.unlink(temp_file_path)
\ No newline at end of file
+            os.unlink(temp_file_path)
+    
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_transcribe_stream_endpoint(self):
+        """测试流式转录端点按SSE推送句子和汇总事件"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(16000)
+            wav_file.writeframes(b"\x00\x10" * 16000)
+        
+        with client.stream(
+            "POST",
+            "/api/v1/transcription/transcribe/stream",
+            files={"file": ("test.wav", buffer.getvalue(), "audio/wav")}
+        ) as response:
+            assert response.status_code == 200
+            lines = [line for line in response.iter_lines() if line]
+        
+        events = [line.split(": ", 1)[1] for line in lines if line.startswith("event: ")]
+        payloads = [json.loads(line.split(": ", 1)[1]) for line in lines if line.startswith("data: ")]
+        assert events[-2:] == ["speakers", "summary"]
+        assert payloads[-1]["segments"] == events.count("segment")
+        assert len(payloads[-2]["speakers"]) == events.count("segment")
+        for payload in payloads[:-2]:
+            assert {"speaker", "text", "start", "end"} <= set(payload)
+    
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_decoded_audio_reused_across_settings(self, monkeypatch, tmp_path):
+        """测试同一音频换热词重新转录时复用已解码的PCM"""
+        import app.api.v1.transcription as transcription_module
+        from app.services.audio_cache import DecodedAudioCache
+        from app.services.transcription_cache import TranscriptionCache
+        audio_cache = DecodedAudioCache(str(tmp_path / "audio"), 1024 * 1024 * 1024)
+        monkeypatch.setattr(transcription_module, "audio_cache", audio_cache)
+        monkeypatch.setattr(transcription_module, "transcription_cache",
+                            TranscriptionCache(str(tmp_path / "transcriptions"), 1024 * 1024))
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(16000)
+            wav_file.writeframes(os.urandom(32000))
+        
+        for hotwords in ("播客", "嘉宾"):
+            response = client.post(
+                f"/api/v1/transcription/transcribe?hotwords={hotwords}",
+                files={"file": ("test.wav", buffer.getvalue(), "audio/wav")}
+            )
+            assert response.status_code == 200
+        
+        assert audio_cache.stats()["hits"] == 1
+    
+    def test_transcribe_time_range(self):
+        """测试只转录时间窗口，结果时间戳为源文件中的绝对时间"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(16000)
+            wav_file.writeframes(os.urandom(16000 * 2 * 4))
+        
+        url = "/api/v1/transcription/transcribe"
+        response = client.post(url, params={"start": 1.5, "end": 3.0},
+                               files={"file": ("test.wav", buffer.getvalue(), "audio/wav")})
+        assert response.status_code == 200
+        transcription = response.json()["transcription"]
+        assert transcription[0]["start"] == 1.5
+        assert transcription[-1]["end"] == 3.0
+        
+        for params in ({"start": -1}, {"start": 3, "end": 2}):
+            response = client.post(url, params=params, files={"file": ("test.wav", buffer.getvalue(), "audio/wav")})
+            assert response.status_code == 400
+    
+    @pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+    def test_speaker_registry_endpoints(self, monkeypatch):
+        """测试登记、列出和删除声纹"""
+        import numpy as np
+        import app.api.v1.speakers as speakers_module
+        from app.services.speaker_registry import SpeakerRegistry
+        temp_dir = tempfile.mkdtemp()
+        monkeypatch.setattr(speakers_module, "speaker_registry", SpeakerRegistry(temp_dir))
+        monkeypatch.setattr(speakers_module.speaker_service, "embed_audio",
+                            lambda audio: np.ones((max(1, len(audio) // 16000), 8), dtype=np.float32))
+        
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(16000)
+            wav_file.writeframes(os.urandom(16000 * 2 * 4))
+        
+        try:
+            response = client.post("/api/v1/speakers", params={"name": "张三", "start": 1, "end": 3,
+                                                               "metadata": json.dumps({"show": "科技早知道"})},
+                                   files={"file": ("host.wav", buffer.getvalue(), "audio/wav")})
+            assert response.status_code == 200
+            speaker = response.json()["speaker"]
+            assert speaker["name"] == "张三"
+            assert speaker["samples"] == 2
+            
+            response = client.post("/api/v1/speakers", params={"name": "张三", "metadata": "[1]"},
+                                   files={"file": ("host.wav", buffer.getvalue(), "audio/wav")})
+            assert response.status_code == 400
+            
+            listed = client.get("/api/v1/speakers").json()
+            assert [s["name"] for s in listed["speakers"]] == ["张三"]
+            assert client.delete(f"/api/v1/speakers/{speaker['id']}").status_code == 200
+            assert client.delete(f"/api/v1/speakers/{speaker['id']}").status_code == 404
+        finally:
+            shutil.rmtree(temp_dir)
+    
+    def test_local_path_on_other_drive(self, monkeypatch):
+        """测试无法与允许目录比较的路径（Windows 上不同盘符）返回403"""
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "LOCAL_INGEST_DIRS", [tempfile.gettempdir()])
+        
+        def different_drives(paths):
+            raise ValueError("Paths don't have the same drive")
+        
+        monkeypatch.setattr(os.path, "commonpath", different_drives)
+        response = client.post("/api/v1/transcription/transcribe/local", params={"path": __file__})
+        assert response.status_code == 403
+    
+    def test_transcribe_local_path(self, monkeypatch):
+        """测试本地路径转录只允许读取配置目录内的文件"""
+        from app.core.config import settings
+        allowed_dir = tempfile.mkdtemp()
+        outside_dir = tempfile.mkdtemp()
+        monkeypatch.setattr(settings, "LOCAL_INGEST_DIRS", [allowed_dir])
+        
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(16000)
+            wav_file.writeframes(os.urandom(32000))
+        for directory in (allowed_dir, outside_dir):
+            with open(os.path.join(directory, "episode.wav"), "wb") as f:
+                f.write(buffer.getvalue())
+        os.symlink(os.path.join(outside_dir, "episode.wav"), os.path.join(allowed_dir, "link.wav"))
+        
+        try:
+            url = "/api/v1/transcription/transcribe/local"
+            response = client.post(url, params={"path": os.path.join(allowed_dir, "episode.wav")})
+            assert response.status_code == 200
+            assert response.json()["status"] == "success"
+            
+            for path in (os.path.join(outside_dir, "episode.wav"),
+                         os.path.join(allowed_dir, "..", os.path.basename(outside_dir), "episode.wav"),
+                         os.path.join(allowed_dir, "link.wav")):
+                assert client.post(url, params={"path": path}).status_code == 403
+            assert client.post(url, params={"path": os.path.join(allowed_dir, "missing.wav")}).status_code == 404
+        finally:
+            shutil.rmtree(allowed_dir)
+            shutil.rmtree(outside_dir)
+    
+    def test_cancellation_endpoints(self):
+        """测试超时参数校验和取消不存在的任务"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(16000)
+            wav_file.writeframes(os.urandom(32000))
+        
+        response = client.post("/api/v1/transcription/transcribe", params={"timeout": -1},
+                               files={"file": ("test.wav", buffer.getvalue(), "audio/wav")})
+        assert response.status_code == 400
+        assert client.delete("/api/v1/transcription/jobs/missing").status_code == 404
+    
+    def test_priority_parameter(self):
+        """测试按优先级提交任务，未知的优先级返回400"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(16000)
+            wav_file.writeframes(os.urandom(32000))
+        
+        url = "/api/v1/transcription/jobs"
+        files = {"file": ("test.wav", buffer.getvalue(), "audio/wav")}
+        assert client.post(url, params={"priority": "urgent"}, files=files).status_code == 400
+        response = client.post(url, params={"priority": "bulk"}, files=files)
+        assert response.status_code == 202
+        
+        job = client.get(f"/api/v1/transcription/jobs/{response.json()['job_id']}").json()["job"]
+        assert job["priority"] == "bulk"
+        assert "priorities" in client.get("/api/v1/transcription/stats").json()["batching"]
+    
+    def test_model_parameter(self):
+        """测试未知的模型返回400，统计中列出可选择的模型"""
+        response = client.post("/api/v1/transcription/transcribe/raw", params={"model": "missing"}, content=b"RIFF")
+        assert response.status_code == 400
+        
+        models = client.get("/api/v1/transcription/stats").json()["models"]
+        assert models["available"][0] == "default"
+        assert "evictions" in models and "avg_load_seconds" in models
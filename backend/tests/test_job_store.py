@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+import numpy as np
+import pytest
+from concurrent.futures import CancelledError, Future
+import app.api.v1.transcription as transcription_module
+from app.services.job_store import JobStore
+from app.services.transcription_jobs import TranscriptionJob, TranscriptionJobManager
+from app.services.transcription_pipeline import TranscriptionPipeline
+from tests.conftest import FakeBatcher, PendingBatcher
+
+SAMPLE_RATE = 16000
+
+class StallingBatcher(FakeBatcher):
+    """前 limit 个片段立即完成，之后的片段一直不完成，模拟推理中途进程崩溃"""
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+
+    def submit(self, audio, **options):
+        if self.calls >= self.limit:
+            return Future()
+        return super().submit(audio, **options)
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+class TestJobStore:
+    def setup_method(self):
+        self.job = TranscriptionJob(None, {"filename": "ep.wav"}, priority="bulk")
+
+    def test_status_roundtrip(self, tmp_path):
+        """测试任务状态写入后可由新实例查询，结束后删除片段结果和PCM"""
+        store = JobStore(str(tmp_path))
+        store.create(self.job, {"samples": 16000})
+        store.save_audio(self.job.id, np.ones(16000, dtype=np.float32))
+        store.add_chunk(self.job.id, 0, [{"text": "你好。"}], 40.0)
+
+        record = JobStore(str(tmp_path)).get(self.job.id)
+        assert record["state"] == "queued"
+        assert record["priority"] == "bulk"
+        assert record["progress"] == 40.0
+        assert record["metadata"] == {"filename": "ep.wav"}
+        assert len(store.load_audio(self.job.id)) == 16000
+
+        self.job.state = "completed"
+        self.job.result = [{"speaker": "说话人1", "text": "你好。"}]
+        self.job.finished_at = time.time()
+        store.update(self.job)
+
+        assert store.get(self.job.id)["result"] == self.job.result
+        assert store.load_chunks(self.job.id) == []
+        assert store.load_audio(self.job.id) is None
+        assert store.get("missing") is None
+
+    def test_cached_audio_linked_not_copied(self, tmp_path):
+        """测试映射自解码音频缓存的PCM以硬链接保存，缓存淘汰后仍可读取，时间窗口按起点截取"""
+        from app.services.audio_cache import DecodedAudioCache
+        cache = DecodedAudioCache(str(tmp_path / "audio"), max_bytes=1 << 30)
+        audio = np.arange(SAMPLE_RATE * 4, dtype=np.float32)
+        cache.put("ep", audio)
+        mapped = cache.get("ep")
+        store = JobStore(str(tmp_path / "jobs"))
+        store.create(self.job, {"samples": SAMPLE_RATE})
+
+        store.save_audio(self.job.id, mapped[SAMPLE_RATE:SAMPLE_RATE * 2])
+        assert os.path.samefile(store._audio_path(self.job.id), mapped.filename)
+        cache.purge()
+        loaded = store.load_audio(self.job.id, SAMPLE_RATE, SAMPLE_RATE)
+
+        np.testing.assert_array_equal(loaded, audio[SAMPLE_RATE:SAMPLE_RATE * 2])
+
+    def test_manager_store_prune_throttled(self, tmp_path):
+        """测试提交任务时按间隔清理任务库，不在每次提交时执行"""
+        class CountingStore(JobStore):
+            prunes = 0
+
+            def prune(self, retention_seconds):
+                CountingStore.prunes += 1
+
+        manager = TranscriptionJobManager(store=CountingStore(str(tmp_path)), store_prune_interval=3600)
+        try:
+            for _ in range(3):
+                manager.submit(lambda job: None)
+            assert CountingStore.prunes == 1
+        finally:
+            manager.shutdown()
+
+    def test_load_chunks_stops_at_gap(self, tmp_path):
+        """测试只返回从第一个片段开始连续完成的片段"""
+        store = JobStore(str(tmp_path))
+        store.create(self.job, {})
+        for index in (0, 1, 3):
+            store.add_chunk(self.job.id, index, [{"text": f"第{index}句。"}], 0.0)
+
+        assert store.load_chunks(self.job.id) == [[{"text": "第0句。"}], [{"text": "第1句。"}]]
+
+    def test_claim_only_once(self, tmp_path):
+        """测试重启后的进程接管未完成的任务，已接管的任务不会重复接管"""
+        JobStore(str(tmp_path)).create(self.job, {"samples": 1})
+        restarted = JobStore(str(tmp_path))
+
+        claimed = restarted.claim_unfinished()
+        assert [record["id"] for record in claimed] == [self.job.id]
+        assert claimed[0]["request"] == {"samples": 1}
+        assert restarted.claim_unfinished() == []
+
+    def test_manager_persists_state(self, tmp_path):
+        """测试附带续转参数的任务状态随执行更新到任务库"""
+        store = JobStore(str(tmp_path))
+        manager = TranscriptionJobManager(max_workers=1, store=store)
+        try:
+            job = manager.submit(lambda job: ["done"], record={"samples": 1})
+            unrecorded = manager.submit(lambda job: ["done"])
+            job.future.result(timeout=5)
+            unrecorded.future.result(timeout=5)
+
+            assert wait_for(lambda: store.get(job.id)["state"] == "completed")
+            assert store.get(job.id)["result"] == ["done"]
+            assert store.get(unrecorded.id) is None
+        finally:
+            manager.shutdown()
+
+    def test_job_interrupted_by_shutdown_stays_unfinished(self, tmp_path):
+        """测试服务关闭时撤回推理请求而失败的任务不标记为失败，重启后可续转"""
+        store = JobStore(str(tmp_path))
+        manager = TranscriptionJobManager(max_workers=1, store=store)
+        started = threading.Event()
+        release = threading.Event()
+        def task(job):
+            started.set()
+            release.wait(5)
+            raise CancelledError()
+        job = manager.submit(task, record={"samples": 1})
+        assert started.wait(5)
+
+        manager.shutdown()
+        release.set()
+        with pytest.raises(CancelledError):
+            job.future.result(timeout=5)
+        assert store.get(job.id)["state"] == "running"
+
+class TestResume:
+    @pytest.fixture(autouse=True)
+    def fake_services(self, monkeypatch):
+        self.monkeypatch = monkeypatch
+        monkeypatch.setattr(transcription_module.settings, "JOB_CHECKPOINT_MIN_SECONDS", 5)
+        monkeypatch.setattr(transcription_module.model_service, "wait_until_loaded", lambda timeout=None: True)
+        monkeypatch.setattr(transcription_module.speaker_service, "diarize", lambda audio, items, offset=0.0: items)
+
+    def use(self, store, batcher, ready):
+        manager = TranscriptionJobManager(max_workers=1, store=store)
+        pipeline = TranscriptionPipeline(batcher, sample_rate=SAMPLE_RATE, long_audio_seconds=5,
+                                         max_chunk_seconds=2, max_inflight=1)
+        self.monkeypatch.setattr(transcription_module, "job_store", store)
+        self.monkeypatch.setattr(transcription_module, "job_manager", manager)
+        self.monkeypatch.setattr(transcription_module, "transcription_pipeline", pipeline)
+        self.monkeypatch.setattr(transcription_module.model_service, "is_ready", lambda: ready)
+        return manager
+
+    def test_resume_from_first_unfinished_chunk(self, tmp_path):
+        """测试进程中断后新进程从第一个未完成的片段继续，已完成片段不再推理"""
+        t = np.arange(SAMPLE_RATE * 12) / SAMPLE_RATE
+        audio = (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+        total = len(TranscriptionPipeline(FakeBatcher(), sample_rate=SAMPLE_RATE, long_audio_seconds=5,
+                                          max_chunk_seconds=2).plan_chunks(audio))
+
+        first = self.use(JobStore(str(tmp_path)), StallingBatcher(limit=3), ready=False)
+        job = transcription_module._submit_job(audio, {}, {"filename": "ep.wav"})
+        assert wait_for(lambda: len(transcription_module.job_store.load_chunks(job.id)) == 3)
+        # 模拟进程崩溃：旧任务不再写任务库
+        job.persistent = False
+        job.cancel()
+        first.shutdown()
+
+        batcher = FakeBatcher()
+        restarted = JobStore(str(tmp_path))
+        manager = self.use(restarted, batcher, ready=True)
+        try:
+            assert transcription_module.resume_jobs() == 1
+            resumed = manager.get(job.id)
+            transcription = resumed.future.result(timeout=5)
+
+            assert batcher.calls == total - 3
+            assert len(transcription) == total
+            assert resumed.metadata["resumed_chunks"] == 3
+            assert wait_for(lambda: restarted.get(job.id)["state"] == "completed")
+            assert restarted.stats()["resumed_jobs"] == 1
+            # 任务状态先于PCM删除写入任务库
+            assert wait_for(lambda: restarted.load_audio(job.id) is None)
+        finally:
+            manager.shutdown()
+
+    def test_only_resumable_jobs_recorded(self, tmp_path):
+        """测试短同步请求不写任务库，长同步请求记录但不写结果，异步任务一律记录结果"""
+        store = JobStore(str(tmp_path))
+        manager = self.use(store, FakeBatcher(), ready=False)
+        short = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        try:
+            inline = transcription_module._submit_job(short, {})
+            background = transcription_module._submit_job(short, {}, background=True)
+            long = transcription_module._submit_job(np.zeros(SAMPLE_RATE * 6, dtype=np.float32), {})
+            for job in (inline, background, long):
+                job.future.result(timeout=5)
+
+            assert store.get(inline.id) is None
+            assert wait_for(lambda: store.get(background.id)["state"] == "completed")
+            assert store.get(background.id)["result"] == background.result
+            assert wait_for(lambda: store.get(long.id)["state"] == "completed")
+            assert store.get(long.id)["result"] is None
+        finally:
+            manager.shutdown()
+
+    def test_short_job_marked_failed(self, tmp_path):
+        """测试没有保存PCM的任务重启后标记为失败"""
+        store = JobStore(str(tmp_path))
+        job = TranscriptionJob(None, {"filename": "clip.wav"})
+        store.create(job, {"samples": 16000, "sample_rate": SAMPLE_RATE, "channels": 1})
+
+        restarted = JobStore(str(tmp_path))
+        self.use(restarted, FakeBatcher(), ready=True)
+        assert transcription_module.resume_jobs() == 0
+        assert restarted.get(job.id)["state"] == "failed"
+
+class TestCoalescedSubmission:
+    def test_identical_requests_share_inference(self, monkeypatch):
+        """测试相同内容和参数的并发请求附着到同一任务，只推理一次并收到相同的句子"""
+        batcher = PendingBatcher()
+        manager = TranscriptionJobManager(max_workers=2)
+        monkeypatch.setattr(transcription_module, "job_manager", manager)
+        monkeypatch.setattr(transcription_module, "transcription_pipeline",
+                            TranscriptionPipeline(batcher, sample_rate=SAMPLE_RATE, long_audio_seconds=5))
+        audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        first, second = [], []
+        try:
+            job = transcription_module._submit_job(audio, {}, cache_key="k", on_segment=first.append)
+            assert wait_for(lambda: len(batcher.futures) == 1)
+            attached = transcription_module._submit_job(audio.copy(), {}, cache_key="k", on_segment=second.append)
+            batcher.futures[0].set_result("你好。")
+            
+            assert attached is job
+            assert job.future.result(timeout=5) == attached.future.result(timeout=5)
+            assert len(batcher.futures) == 1
+            assert [item["text"] for item in first] == [item["text"] for item in second] == ["你好。"]
+        finally:
+            manager.shutdown()
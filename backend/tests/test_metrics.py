@@ -0,0 +1,29 @@
+import pytest
+from app.utils.metrics import percentile, normalize_text, edit_distance, character_error_rate
+
+class TestMetrics:
+    def test_percentile(self):
+        """测试最近秩法百分位数"""
+        values = list(range(1, 101))
+        assert percentile(values, 50) in (50, 51)
+        assert percentile(values, 99) == 99
+        assert percentile([], 95) == 0.0
+    
+    def test_normalize_text(self):
+        """测试规范化去掉空白、中英文标点并统一全角字符"""
+        assert normalize_text("你好，世界！ Hello, ＡＢ") == "你好世界helloab"
+    
+    def test_edit_distance(self):
+        """测试替换、插入、删除各计一次编辑"""
+        assert edit_distance("今天天气", "今天天气") == 0
+        assert edit_distance("今天天气", "今天天汽") == 1
+        assert edit_distance("今天天气", "今天气") == 1
+        assert edit_distance("今天", "今天好") == 1
+        assert edit_distance("", "abc") == 3
+    
+    def test_character_error_rate(self):
+        """测试语料级字错误率按参考文本总字数归一化，忽略标点差异"""
+        references = ["今天天气很好。", "欢迎收听"]
+        hypotheses = ["今天天气很好", "欢迎收音"]
+        assert character_error_rate(references, hypotheses) == pytest.approx(1 / 10)
+        assert character_error_rate([], []) == 0.0
@@ -0,0 +1,130 @@
+import pytest
+import threading
+import time
+from app.services.batching import MicroBatcher
+from app.services.model_registry import ModelRegistry
+from tests.conftest import FakeModelService
+
+MB = 1024 * 1024
+
+class FakeLoadedModel(FakeModelService):
+    """按名称加载的模拟模型，记录加载和卸载次数"""
+    def __init__(self, name, model_dir, size_mb, fail=False, delay=0.0):
+        super().__init__()
+        self.name = name
+        self.model_dir = model_dir
+        self.size_mb = size_mb
+        self.fail = fail
+        self.delay = delay
+        self.model = None
+        self.load_error = None
+        self.unloaded = False
+    
+    def load_model(self):
+        time.sleep(self.delay)
+        if self.fail:
+            self.load_error = "missing weights"
+            return False
+        self.model = object()
+        return True
+    
+    def memory_bytes(self):
+        return self.size_mb * MB
+    
+    def unload_model(self):
+        self.model = None
+        self.unloaded = True
+        return True
+    
+    def status(self):
+        return {"elapsed": self.delay}
+
+class TestModelRegistry:
+    def setup_method(self):
+        self.created = []
+        self.default = FakeModelService()
+        self.registry = ModelRegistry({"zh": "iic/zh", "multi": "iic/multi", "fast": "iic/fast"},
+                                      budget_bytes=250 * MB, default_service=self.default, factory=self.factory)
+    
+    def factory(self, name, model_dir, **kwargs):
+        service = FakeLoadedModel(name, model_dir, 100, **kwargs)
+        self.created.append(service)
+        return service
+    
+    def test_load_on_demand(self):
+        """测试首次使用时加载模型，之后复用已加载的模型，默认模型不经过加载"""
+        assert self.registry.get("default") is self.default
+        zh = self.registry.get("zh")
+        assert zh.model_dir == "iic/zh"
+        assert self.registry.get("zh") is zh
+        
+        stats = self.registry.stats()
+        assert stats["loads"] == 1
+        assert list(stats["loaded"]) == ["zh"]
+        assert stats["available"] == ["default", "fast", "multi", "zh"]
+        with pytest.raises(KeyError):
+            self.registry.get("missing")
+    
+    def test_evicts_least_recently_used(self):
+        """测试超过内存预算时卸载最久未使用的模型"""
+        zh = self.registry.get("zh")
+        multi = self.registry.get("multi")
+        self.registry.get("zh")
+        self.registry.get("fast")
+        
+        assert multi.unloaded and not zh.unloaded
+        stats = self.registry.stats()
+        assert sorted(stats["loaded"]) == ["fast", "zh"]
+        assert stats["evictions"] == 1
+        assert stats["resident_mb"] <= stats["budget_mb"]
+        
+        # 卸载后再次使用时重新加载
+        assert self.registry.get("multi") is not multi
+        assert self.registry.stats()["loads"] == 4
+    
+    def test_acquired_model_not_evicted(self):
+        """测试使用中的模型不被卸载，全部被占用时超出预算加载并计数"""
+        zh = self.registry.acquire("zh")
+        multi = self.registry.acquire("multi")
+        self.registry.acquire("fast")
+        
+        assert not zh.unloaded and not multi.unloaded
+        assert self.registry.stats()["over_budget_loads"] == 1
+        
+        self.registry.release("zh")
+        self.registry.release("zh")
+        self.registry.get("zh")
+        assert self.registry.stats()["loaded"]["zh"]["in_use"] == 0
+    
+    def test_concurrent_acquire_loads_once(self):
+        """测试多个线程同时请求同一模型时只加载一次"""
+        self.registry._factory = lambda name, model_dir: self.factory(name, model_dir, delay=0.1)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.registry.acquire("zh"))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert len(self.created) == 1
+        assert all(service is self.created[0] for service in results)
+        assert self.registry.stats()["loaded"]["zh"]["in_use"] == 4
+    
+    def test_failed_load_raises(self):
+        """测试模型加载失败时抛出错误，不回退到模拟模型"""
+        self.registry._factory = lambda name, model_dir: self.factory(name, model_dir, fail=True)
+        with pytest.raises(RuntimeError, match="missing weights"):
+            self.registry.acquire("zh")
+        assert self.registry.stats()["loaded"] == {}
+    
+    def test_batcher_routes_by_model(self):
+        """测试不同模型的请求分别合批，按需加载的模型由注册表提供"""
+        batcher = MicroBatcher(self.default, max_batch_size=4, max_wait_ms=50, registry=self.registry)
+        try:
+            futures = [batcher.submit("a", language="中文"), batcher.submit("b", language="中文", model="zh")]
+            assert [future.result(timeout=5) for future in futures] == ["中文:a", "中文:b"]
+        finally:
+            batcher.shutdown()
+        
+        assert len(self.default.calls) == 1
+        assert self.created[0].calls[0][0] == ["b"]
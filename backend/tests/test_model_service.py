@@ -0,0 +1,93 @@
+import pytest
+import threading
+import app.services.model_service as model_service_module
+from app.services.model_service import ModelService, MOCK_TRANSCRIPT
+
+class FakeAutoModel:
+    """等待放行信号后才完成加载的模拟 AutoModel"""
+    release = threading.Event()
+    
+    def __init__(self, **kwargs):
+        FakeAutoModel.release.wait(5)
+    
+    def generate(self, input, **kwargs):
+        return [{"text": f"识别{i}"} for i in range(len(input))]
+
+class FailingAutoModel:
+    def __init__(self, **kwargs):
+        raise RuntimeError("download failed")
+
+class TestModelService:
+    def test_background_loading(self, monkeypatch):
+        """测试后台加载期间处于 loading 阶段，完成后就绪"""
+        monkeypatch.setattr(model_service_module, "AutoModel", FakeAutoModel)
+        FakeAutoModel.release.clear()
+        service = ModelService()
+        
+        service.start_loading()
+        assert service.phase == "loading"
+        assert not service.is_ready()
+        assert service.status()["elapsed"] is not None
+        
+        FakeAutoModel.release.set()
+        assert service.wait_until_loaded(5)
+        assert service.phase == "ready"
+        assert service.is_ready()
+        assert service.transcribe_batch(["a", "b"]) == ["识别0", "识别1"]
+    
+    def test_transcribe_waits_for_loading(self, monkeypatch):
+        """测试加载期间的识别请求等待加载完成，而不是返回模拟文本"""
+        monkeypatch.setattr(model_service_module, "AutoModel", FakeAutoModel)
+        FakeAutoModel.release.clear()
+        service = ModelService()
+        service.start_loading()
+        
+        results = []
+        worker = threading.Thread(target=lambda: results.append(service.transcribe("a")))
+        worker.start()
+        worker.join(0.2)
+        assert worker.is_alive()
+        
+        FakeAutoModel.release.set()
+        worker.join(5)
+        assert results == ["识别0"]
+    
+    def test_loading_failure(self, monkeypatch):
+        """测试加载失败时记录错误并回退到模拟模型，但不视为就绪"""
+        monkeypatch.setattr(model_service_module, "AutoModel", FailingAutoModel)
+        service = ModelService()
+        
+        service.start_loading()
+        service.wait_until_loaded(5)
+        
+        status = service.status()
+        assert status["phase"] == "failed"
+        assert "download failed" in status["error"]
+        assert status["mock"]
+        assert not service.is_ready()
+        assert service.transcribe("a") == MOCK_TRANSCRIPT
+    
+    def test_int8_quantization(self, monkeypatch):
+        """测试配置 int8 时线性层被替换为动态量化层"""
+        torch = pytest.importorskip("torch")
+        
+        class LinearAutoModel:
+            def __init__(self, **kwargs):
+                self.model = torch.nn.Sequential(torch.nn.Linear(8, 8), torch.nn.ReLU())
+        
+        monkeypatch.setattr(model_service_module, "AutoModel", LinearAutoModel)
+        monkeypatch.setattr(model_service_module.settings, "MODEL_QUANTIZE", "int8")
+        monkeypatch.setattr(model_service_module.settings, "DEVICE", "cpu")
+        service = ModelService()
+        
+        assert service.load_model()
+        assert service.status()["quantization"] == "int8"
+        assert isinstance(service.model.model[0], torch.ao.nn.quantized.dynamic.Linear)
+    
+    def test_quantization_disabled_by_default(self, monkeypatch):
+        """测试默认不量化"""
+        monkeypatch.setattr(model_service_module.settings, "MODEL_QUANTIZE", "none")
+        service = ModelService()
+        service.model = object()
+        
+        assert service._quantize() == "none"
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import pytest
+import app.services.model_service as model_service_module
+from app.services.model_service import ModelService
+from app.services.onnx_backend import OnnxASRModel, ensure_exported, export_dir_for, make_session_options
+
+class FakeRecognizer:
+    """模拟 funasr_onnx.Paraformer：每段音频识别为其长度对应的文本"""
+    def __init__(self):
+        self.batches = []
+    
+    def extract_feat(self, batch):
+        self.batches.append(len(batch))
+        return batch, np.array([len(audio) for audio in batch])
+    
+    def infer(self, feats, feats_len):
+        return feats_len, feats_len
+    
+    def decode(self, scores, token_nums):
+        return [["长", "度", str(n)] for n in token_nums]
+
+class FailingRecognizer(FakeRecognizer):
+    """模拟批内含有空音频时整批推理报错"""
+    def infer(self, feats, feats_len):
+        from funasr_onnx.utils.utils import ONNXRuntimeError
+        if 0 in feats_len:
+            raise ONNXRuntimeError("empty input")
+        return super().infer(feats, feats_len)
+
+class FakeOnnxModel:
+    def __init__(self, **kwargs):
+        FakeOnnxModel.kwargs = kwargs
+    
+    def generate(self, input, **kwargs):
+        return [{"text": "onnx"} for _ in input]
+
+class TestOnnxBackend:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_export_dir_for(self):
+        """测试模型名称映射为缓存目录下的单层目录"""
+        path = export_dir_for("iic/paraformer", self.temp_dir)
+        assert path == os.path.join(self.temp_dir, "iic--paraformer")
+    
+    def test_existing_export_is_reused(self, monkeypatch):
+        """测试已导出的ONNX图直接复用，不再加载PyTorch模型"""
+        export_dir = os.path.join(self.temp_dir, "model")
+        os.makedirs(export_dir)
+        open(os.path.join(export_dir, "model.onnx"), "wb").close()
+        
+        import funasr
+        monkeypatch.setattr(funasr, "AutoModel", lambda **kwargs: pytest.fail("should not export again"))
+        assert ensure_exported("model", export_dir) == os.path.join(export_dir, "model.onnx")
+    
+    def test_session_options(self):
+        """测试线程数与图优化级别按配置设置"""
+        onnxruntime = pytest.importorskip("onnxruntime")
+        options = make_session_options(3, 2, "basic")
+        
+        assert options.intra_op_num_threads == 3
+        assert options.inter_op_num_threads == 2
+        assert options.execution_mode == onnxruntime.ExecutionMode.ORT_PARALLEL
+        assert options.graph_optimization_level == onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        with pytest.raises(ValueError):
+            make_session_options(1, 1, "fastest")
+    
+    def test_generate_batches(self):
+        """测试 generate 按批大小分批推理，输出与输入一一对应"""
+        pytest.importorskip("funasr_onnx")
+        model = OnnxASRModel.__new__(OnnxASRModel)
+        model.recognizer = FakeRecognizer()
+        inputs = [np.zeros(n, dtype=np.float32) for n in (1, 2, 3)]
+        
+        results = model.generate(input=inputs, batch_size=2, hotwords=["忽略"])
+        
+        assert model.recognizer.batches == [2, 1]
+        assert [item["text"] for item in results] == ["长度1", "长度2", "长度3"]
+    
+    def test_failed_batch_retried_per_item(self):
+        """测试一条输入导致整批推理报错时逐条重试，只有出错的输入为空文本"""
+        pytest.importorskip("funasr_onnx")
+        model = OnnxASRModel.__new__(OnnxASRModel)
+        model.recognizer = FailingRecognizer()
+        inputs = [np.zeros(n, dtype=np.float32) for n in (3, 0, 2)]
+        
+        results = model.generate(input=inputs, batch_size=3)
+        
+        assert model.recognizer.batches == [3, 1, 1, 1]
+        assert [item["text"] for item in results] == ["长度3", "", "长度2"]
+    
+    def test_model_service_onnx_backend(self, monkeypatch):
+        """测试 MODEL_BACKEND=onnx 时 ModelService 使用 ONNX 模型并沿用原有识别接口"""
+        monkeypatch.setattr(model_service_module, "OnnxASRModel", FakeOnnxModel)
+        monkeypatch.setattr(model_service_module.settings, "MODEL_BACKEND", "onnx")
+        monkeypatch.setattr(model_service_module.settings, "ONNX_INTER_OP_THREADS", 2)
+        service = ModelService()
+        
+        assert service.load_model()
+        assert service.status()["backend"] == "onnx"
+        assert FakeOnnxModel.kwargs["inter_op_threads"] == 2
+        assert service.transcribe(np.zeros(16000, dtype=np.float32)) == "onnx"
+    
+    def test_unknown_backend(self, monkeypatch):
+        """测试未知后端视为加载失败"""
+        monkeypatch.setattr(model_service_module.settings, "MODEL_BACKEND", "tensorrt")
+        service = ModelService()
+        
+        assert not service.load_model()
+        assert "tensorrt" in service.status()["error"]
@@ -0,0 +1,118 @@
+import os
+import signal
+import socket
+import sys
+import time
+import multiprocessing
+import httpx
+import pytest
+import app.services.model_service as model_service_module
+import app.services.speaker_diarization as speaker_diarization_module
+from app.prefork import PreforkServer
+
+class FakeAutoModel:
+    def __init__(self, **kwargs):
+        pass
+
+    def generate(self, input, **kwargs):
+        return [{"text": "识别"} for _ in input]
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _get(url, timeout=15):
+    """轮询直到服务返回响应"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            return httpx.get(url, timeout=2)
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise AssertionError(f"No response from {url}")
+
+@pytest.mark.skipif(not hasattr(os, "fork") or sys.platform == "darwin", reason="prefork requires os.fork")
+class TestPreforkServer:
+    def setup_method(self):
+        self.port = _free_port()
+        self.base = f"http://127.0.0.1:{self.port}"
+
+    def test_workers_share_loaded_model_and_restart(self, monkeypatch):
+        """测试工作进程继承父进程已加载的模型，被杀死后自动重启"""
+        monkeypatch.setattr(model_service_module, "AutoModel", FakeAutoModel)
+        monkeypatch.setattr(speaker_diarization_module, "AutoModel", FakeAutoModel)
+        server = PreforkServer(host="127.0.0.1", port=self.port, workers=1,
+                               heartbeat_interval=0.2, heartbeat_timeout=10)
+        process = multiprocessing.get_context("fork").Process(target=server.run)
+        process.start()
+        try:
+            # 工作进程未重新加载模型即处于就绪状态
+            ready = _get(f"{self.base}/health/ready")
+            assert ready.status_code == 200
+
+            first_pid = _get(f"{self.base}/health/live").json()["pid"]
+            assert first_pid != process.pid
+            os.kill(first_pid, signal.SIGKILL)
+
+            deadline = time.time() + 15
+            new_pid = first_pid
+            while new_pid == first_pid and time.time() < deadline:
+                time.sleep(0.2)
+                try:
+                    new_pid = httpx.get(f"{self.base}/health/live", timeout=2).json()["pid"]
+                except httpx.TransportError:
+                    pass
+            assert new_pid != first_pid
+        finally:
+            process.terminate()
+            process.join(15)
+        assert process.exitcode == 0
+
+    def test_stop_runs_shutdown_hooks(self, monkeypatch, tmp_path):
+        """测试父进程停止时工作进程正常退出，执行应用的关闭钩子"""
+        import app.main as main_module
+        monkeypatch.setattr(model_service_module, "AutoModel", FakeAutoModel)
+        monkeypatch.setattr(speaker_diarization_module, "AutoModel", FakeAutoModel)
+        marker = tmp_path / "stopped"
+        monkeypatch.setattr(main_module.app.router, "on_shutdown",
+                            main_module.app.router.on_shutdown + [lambda: marker.write_text(str(os.getpid()))])
+        server = PreforkServer(host="127.0.0.1", port=self.port, workers=1,
+                               heartbeat_interval=0.2, heartbeat_timeout=10)
+        process = multiprocessing.get_context("fork").Process(target=server.run)
+        process.start()
+        try:
+            worker_pid = _get(f"{self.base}/health/live").json()["pid"]
+        finally:
+            process.terminate()
+            process.join(15)
+        assert process.exitcode == 0
+        assert marker.read_text() == str(worker_pid)
+
+
+class TestRestartBackoff:
+    def _exit(self, monkeypatch, server, healthy_seconds):
+        """模拟工作进程 0 在派生 60 秒后退出，此前持续写入心跳 healthy_seconds 秒"""
+        server.children = {1234: 0}
+        server.spawned_at[0] = time.time() - 60
+        server.heartbeats[0] = server.spawned_at[0] + healthy_seconds
+        results = iter([(1234, 9)])
+        monkeypatch.setattr(os, "waitpid", lambda pid, options: next(results, (0, 0)))
+        server._reap()
+        return server.next_spawn_at[0] - time.time()
+
+    def test_hung_worker_backs_off(self, monkeypatch):
+        """测试启动后即卡住、心跳超时被杀死的进程按重启次数延迟重启"""
+        server = PreforkServer(workers=1)
+        server.restarts[0] = 3
+
+        assert self._exit(monkeypatch, server, healthy_seconds=0) == pytest.approx(8, abs=0.5)
+        assert server.restarts[0] == 3
+
+    def test_stable_run_resets_backoff(self, monkeypatch):
+        """测试稳定运行后退出的进程立即重启，退避计数清零"""
+        server = PreforkServer(workers=1)
+        server.restarts[0] = 3
+
+        assert self._exit(monkeypatch, server, healthy_seconds=55) <= 0
+        assert server.restarts[0] == 0
@@ -1,5 +1,24 @@
 import pytest
+import shutil
+import tempfile
+import numpy as np
 from app.services.speaker_diarization import SpeakerDiarizationService
+from app.services.speaker_registry import SpeakerRegistry
+
+SAMPLE_RATE = 16000
+
+class FakeEmbeddingModel:
+    """以窗口平均幅度区分说话人的模拟嵌入模型：幅度 0.1 与 0.5 分别对应两个方向的嵌入"""
+    def __init__(self):
+        self.batches = []
+    
+    def generate(self, input, batch_size=1, **kwargs):
+        self.batches.append(len(input))
+        embeddings = []
+        for window in input:
+            loud = float(np.mean(np.abs(window))) > 0.3
+            embeddings.append([0.0, 1.0, 0.1] if loud else [1.0, 0.0, 0.1])
+        return [{"spk_embedding": np.array(embeddings, dtype=np.float32)}]
 
 class TestSpeakerDiarizationService:
     def setup_method(self):
@@ -25,6 +44,70 @@ class TestSpeakerDiarizationService:
             assert isinstance(item["text"], str)
             assert len(item["text"]) > 0
     
+    def test_diarize_with_embeddings(self):
+        """测试按窗口嵌入聚类为句子重新分配说话人，时间为绝对时间时按偏移对齐"""
+        # 0-4秒与8-10秒为说话人A（幅度0.1），4-8秒为说话人B（幅度0.5）
+        audio = np.full(SAMPLE_RATE * 10, 0.1, dtype=np.float32)
+        audio[SAMPLE_RATE * 4:SAMPLE_RATE * 8] = 0.5
+        transcription = [
+            {"speaker": "主持人", "text": "第一句。", "start": 100.0, "end": 104.0},
+            {"speaker": "嘉宾", "text": "第二句。", "start": 104.0, "end": 106.0},
+            {"speaker": "主持人", "text": "第三句。", "start": 106.0, "end": 108.0},
+            {"speaker": "嘉宾", "text": "第四句。", "start": 108.0, "end": 110.0}
+        ]
+        service = SpeakerDiarizationService(sample_rate=SAMPLE_RATE)
+        service.model = FakeEmbeddingModel()
+        
+        result = service.diarize(audio, transcription, offset=100.0)
+        
+        assert [item["speaker"] for item in result] == ["主持人", "嘉宾", "嘉宾", "主持人"]
+        assert [item["text"] for item in result] == [item["text"] for item in transcription]
+        assert transcription[2]["speaker"] == "主持人"
+    
+    def test_diarize_uses_registry_names(self):
+        """测试聚类中心在声纹库中匹配到的说话人使用登记的名称，未匹配的仍按发言顺序命名"""
+        audio = np.full(SAMPLE_RATE * 4, 0.1, dtype=np.float32)
+        audio[SAMPLE_RATE * 2:] = 0.5
+        transcription = [
+            {"speaker": "主持人", "text": "第一句。", "start": 0.0, "end": 2.0},
+            {"speaker": "嘉宾", "text": "第二句。", "start": 2.0, "end": 4.0}
+        ]
+        temp_dir = tempfile.mkdtemp()
+        try:
+            registry = SpeakerRegistry(temp_dir)
+            registry.enroll("李四", [0.0, 1.0, 0.1])
+            service = SpeakerDiarizationService(sample_rate=SAMPLE_RATE, registry=registry)
+            service.model = FakeEmbeddingModel()
+            
+            result = service.diarize(audio, transcription)
+        finally:
+            shutil.rmtree(temp_dir)
+        
+        assert [item["speaker"] for item in result] == ["主持人", "李四"]
+    
+    def test_diarize_without_model_keeps_labels(self):
+        """测试嵌入模型不可用时保留原有标注"""
+        service = SpeakerDiarizationService(sample_rate=SAMPLE_RATE)
+        service.load_error = "unavailable"
+        transcription = [{"speaker": "主持人", "text": "你好。", "start": 0.0, "end": 1.0}]
+        
+        assert service.diarize(np.zeros(SAMPLE_RATE, dtype=np.float32), transcription) == transcription
+    
+    def test_make_windows(self):
+        """测试窗口等长且不越出音频，短句取居中的一个窗口"""
+        service = SpeakerDiarizationService(sample_rate=SAMPLE_RATE)
+        transcription = [
+            {"text": "长句。", "start": 0.0, "end": 4.0},
+            {"text": "短句。", "start": 4.0, "end": 4.5},
+            {"text": "末句。", "start": 9.8, "end": 10.0}
+        ]
+        bounds, owners = service.make_windows(transcription, SAMPLE_RATE * 10)
+        
+        lengths = bounds[:, 1] - bounds[:, 0]
+        assert (lengths == int(1.5 * SAMPLE_RATE)).all()
+        assert bounds.min() >= 0 and bounds.max() <= SAMPLE_RATE * 10
+        assert list(np.bincount(owners)) == [5, 1, 1]
+    
     def test_improve_diarization(self):
         """测试改进说话人分离结果功能"""
         # 准备测试数据
@@ -71,4 +154,19 @@ class TestSpeakerDiarizationService:
         
         # 验证结果
         assert isinstance(result, list)
-        assert len(result) == 0
\ No newline at end of file
+        assert len(result) == 0
+    
+    def test_assign_speakers(self):
+        """测试为带时间戳的片段分配说话人和时间"""
+        segments = [
+            {"start": 0.0, "end": 4.0, "text": "欢迎收听。很高兴来到这里。"},
+            {"start": 10.0, "end": 12.0, "text": "请介绍一下你的项目。"}
+        ]
+        
+        result = self.speaker_service.assign_speakers(segments)
+        
+        assert [item["speaker"] for item in result] == ["主持人", "嘉宾", "主持人"]
+        assert result[0]["start"] == 0.0
+        assert result[1]["end"] == 4.0
+        assert result[2]["start"] == 10.0
+        assert result[2]["end"] == 12.0
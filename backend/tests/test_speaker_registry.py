@@ -0,0 +1,103 @@
+import pytest
+import tempfile
+import os
+import shutil
+import time
+import numpy as np
+from app.services.speaker_registry import SpeakerRegistry
+
+class TestSpeakerRegistry:
+    def setup_method(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.registry = SpeakerRegistry(self.temp_dir, threshold=0.6)
+        self.rng = np.random.default_rng(0)
+    
+    def teardown_method(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_enroll_and_match(self):
+        """测试登记后按余弦相似度认出说话人，相似度不足时不匹配"""
+        host, guest = self.rng.normal(size=(2, 192))
+        self.registry.enroll("张三", host + 0.1 * self.rng.normal(size=(5, 192)), {"show": "科技早知道"})
+        
+        matches = self.registry.match(np.stack([host, guest]))
+        assert matches[0]["name"] == "张三"
+        assert matches[0]["score"] > 0.9
+        assert matches[1] is None
+        assert self.registry.list_speakers()[0]["metadata"] == {"show": "科技早知道"}
+    
+    def test_each_speaker_matched_once(self):
+        """测试多个聚类接近同一说话人时只分配给最相似的一个"""
+        host = self.rng.normal(size=192)
+        self.registry.enroll("张三", host)
+        
+        matches = self.registry.match(np.stack([host + 0.5 * self.rng.normal(size=192), host]))
+        assert matches[0] is None
+        assert matches[1]["name"] == "张三"
+    
+    def test_enroll_same_name_merges(self):
+        """测试同名再次登记时合并声纹而不新增条目"""
+        voice = self.rng.normal(size=192)
+        self.registry.enroll("张三", voice)
+        speaker = self.registry.enroll("张三", voice + 0.1 * self.rng.normal(size=(3, 192)))
+        
+        assert len(self.registry.list_speakers()) == 1
+        assert speaker["samples"] == 4
+        with pytest.raises(ValueError):
+            self.registry.enroll("李四", np.ones(64))
+        with pytest.raises(ValueError):
+            self.registry.enroll(" ", voice)
+    
+    def test_persistence_and_remove(self):
+        """测试声纹库持久化到磁盘，删除后版本号递增"""
+        speaker = self.registry.enroll("张三", self.rng.normal(size=192))
+        self.registry.enroll("李四", self.rng.normal(size=192))
+        
+        reloaded = SpeakerRegistry(self.temp_dir)
+        assert [s["name"] for s in reloaded.list_speakers()] == ["张三", "李四"]
+        revision = reloaded.revision
+        assert reloaded.remove(speaker["id"]) is True
+        assert reloaded.remove(speaker["id"]) is False
+        assert reloaded.revision > revision
+        # 另一实例（如其他工作进程）读到更新后的声纹库
+        assert [s["name"] for s in self.registry.list_speakers()] == ["李四"]
+    
+    def test_revision_not_reused_after_directory_deleted(self):
+        """测试删除声纹库目录后重新登记，版本号不会与之前用过的版本重复"""
+        self.registry.enroll("张三", self.rng.normal(size=192))
+        first = self.registry.revision
+        shutil.rmtree(self.temp_dir)
+        
+        fresh = SpeakerRegistry(self.temp_dir)
+        assert fresh.revision == 0
+        fresh.enroll("李四", self.rng.normal(size=192))
+        assert fresh.revision > first
+    
+    def test_reload_on_revision_change(self):
+        """测试其他实例写入后按版本号重新加载，不依赖文件修改时间"""
+        self.registry.enroll("张三", self.rng.normal(size=192))
+        other = SpeakerRegistry(self.temp_dir)
+        assert len(other.list_speakers()) == 1
+        _, entries_path = self.registry._paths()
+        mtime = os.stat(entries_path).st_mtime_ns
+        self.registry.enroll("李四", self.rng.normal(size=192))
+        # 模拟修改时间精度不足：两次写入的修改时间相同
+        os.utime(entries_path, ns=(mtime, mtime))
+        
+        assert [s["name"] for s in other.list_speakers()] == ["张三", "李四"]
+    
+    def test_batched_lookup_with_thousands_of_speakers(self):
+        """测试数千个已登记说话人时批量查询仍在毫秒级"""
+        voices = self.rng.normal(size=(5000, 192)).astype(np.float32)
+        matrix = voices / np.linalg.norm(voices, axis=1, keepdims=True)
+        self.registry._save(matrix, [{"id": str(i), "name": f"speaker{i}", "metadata": {}, "samples": 1}
+                                     for i in range(len(voices))])
+        queries = voices[[10, 20, 30]] + 0.1 * self.rng.normal(size=(3, 192))
+        
+        self.registry.match(queries)
+        started = time.perf_counter()
+        matches = self.registry.match(queries)
+        elapsed = time.perf_counter() - started
+        
+        assert [m["name"] for m in matches] == ["speaker10", "speaker20", "speaker30"]
+        assert elapsed < 0.05
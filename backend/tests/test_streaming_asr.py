@@ -0,0 +1,108 @@
+import pytest
+import numpy as np
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.streaming_asr import StreamingASRService, streaming_asr_service
+
+SAMPLE_RATE = 16000
+
+class FakeStreamingModel:
+    """每次调用输出一个字，is_final 时重置缓存的模拟流式模型"""
+    def __init__(self):
+        self.calls = []
+    
+    def generate(self, input, cache, is_final, **kwargs):
+        self.calls.append((len(input), is_final))
+        cache["count"] = cache.get("count", 0) + 1
+        if is_final:
+            cache.clear()
+        voiced = len(input) and float(np.abs(input).max()) > 0.01
+        return [{"text": "字" if voiced else ""}]
+
+def tone(seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+class TestStreamingSession:
+    def setup_method(self):
+        self.service = StreamingASRService(max_sessions=1)
+        self.service.model = FakeStreamingModel()
+    
+    def test_partial_and_final(self):
+        """测试600ms块输出实时结果，句末静音后输出最终结果"""
+        session = self.service.create_session()
+        events = []
+        audio = np.concatenate([tone(1.8), silence(1.2)])
+        for i in range(0, len(audio), 1600):
+            events += session.accept(audio[i:i + 1600])
+        events += session.finish()
+        
+        partials = [e for e in events if e["type"] == "partial"]
+        finals = [e for e in events if e["type"] == "final"]
+        assert partials and partials[0]["text"] == "字"
+        assert len(finals) == 1
+        assert finals[0]["start"] == 0.0
+        assert 1.8 <= finals[0]["end"] <= 3.0
+    
+    def test_silence_after_final_not_finalized_again(self):
+        """测试句子结束后持续静音不会在每个块重复结束空句子"""
+        session = self.service.create_session()
+        audio = np.concatenate([tone(1.8), silence(4.0)])
+        for i in range(0, len(audio), 1600):
+            session.accept(audio[i:i + 1600])
+        
+        assert sum(1 for _, is_final in self.service.model.calls if is_final) == 1
+    
+    def test_session_limit(self):
+        """测试并发会话上限"""
+        assert self.service.try_acquire()
+        assert not self.service.try_acquire()
+        self.service.release()
+        assert self.service.try_acquire()
+
+class TestStreamingWebSocket:
+    def setup_method(self):
+        self.original_model = streaming_asr_service.model
+        streaming_asr_service.model = FakeStreamingModel()
+    
+    def teardown_method(self):
+        streaming_asr_service.model = self.original_model
+    
+    def test_websocket_stream(self):
+        """测试WebSocket接收PCM帧并返回识别事件"""
+        client = TestClient(app)
+        audio = (np.concatenate([tone(1.2), silence(1.0)]) * 32767).astype(np.int16).tobytes()
+        with client.websocket_connect("/api/v1/transcription/stream/ws") as websocket:
+            assert websocket.receive_json() == {"type": "ready"}
+            for i in range(0, len(audio), 3200):
+                websocket.send_bytes(audio[i:i + 3200])
+            websocket.send_text("end")
+            
+            messages = []
+            while True:
+                message = websocket.receive_json()
+                messages.append(message)
+                if message["type"] == "end":
+                    break
+        
+        assert any(m["type"] == "final" and m["text"] for m in messages)
+        assert streaming_asr_service.active_sessions == 0
+    
+    def test_websocket_inference_error(self):
+        """测试推理出错时返回 error 消息并以 1011 关闭连接"""
+        def fail(*args, **kwargs):
+            raise RuntimeError("inference failed")
+        streaming_asr_service.model.generate = fail
+        client = TestClient(app)
+        audio = (tone(1.0) * 32767).astype(np.int16).tobytes()
+        with client.websocket_connect("/api/v1/transcription/stream/ws") as websocket:
+            assert websocket.receive_json() == {"type": "ready"}
+            websocket.send_bytes(audio)
+            message = websocket.receive_json()
+            
+            assert message["type"] == "error"
+            assert "inference failed" in message["detail"]
+        assert streaming_asr_service.active_sessions == 0
@@ -0,0 +1,68 @@
+import pytest
+import tempfile
+import shutil
+from app.services.transcription_cache import TranscriptionCache
+
+class TestTranscriptionCache:
+    def setup_method(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = TranscriptionCache(self.cache_dir, max_bytes=1024 * 1024)
+    
+    def teardown_method(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+    
+    def test_get_put(self):
+        """测试写入后命中，并统计命中与未命中"""
+        key = self.cache.make_key("abc")
+        assert self.cache.get(key) is None
+        
+        result = [{"speaker": "主持人", "text": "你好。", "start": 0.0, "end": 1.0}]
+        self.cache.put(key, result)
+        assert self.cache.get(key) == result
+        
+        stats = self.cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+    
+    def test_key_depends_on_settings(self):
+        """测试识别参数不同时缓存键不同"""
+        assert self.cache.make_key("abc") == self.cache.make_key("abc", {"language": None})
+        assert self.cache.make_key("abc") != self.cache.make_key("abc", {"language": "英文"})
+        assert self.cache.make_key("abc") != self.cache.make_key("abc", {"hotwords": ["播客"]})
+        assert self.cache.make_key("abc") != self.cache.make_key("abd")
+    
+    def test_key_uses_applied_quantization(self, monkeypatch):
+        """测试缓存键取模型实际生效的量化方式，配置了 int8 但未生效时与 fp32 的键相同"""
+        import app.services.transcription_cache as cache_module
+        monkeypatch.setattr(cache_module.model_service, "quantization", "none")
+        monkeypatch.setattr(cache_module.settings, "MODEL_QUANTIZE", "none")
+        fp32 = self.cache.make_key("abc")
+        monkeypatch.setattr(cache_module.settings, "MODEL_QUANTIZE", "int8")
+        assert self.cache.make_key("abc") == fp32
+        
+        monkeypatch.setattr(cache_module.model_service, "quantization", "int8")
+        assert self.cache.make_key("abc") != fp32
+    
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        cache = TranscriptionCache(self.cache_dir, max_bytes=2500)
+        payload = "x" * 1000
+        cache.put("a", payload)
+        cache.put("b", payload)
+        cache.get("a")
+        cache.put("c", payload)
+        
+        assert cache.get("a") == payload
+        assert cache.get("b") is None
+        assert cache.get("c") == payload
+        assert cache.stats()["evictions"] == 1
+    
+    def test_persistence_and_purge(self):
+        """测试缓存在新实例中可读，并可清空"""
+        self.cache.put("a", {"text": "持久化"})
+        
+        reopened = TranscriptionCache(self.cache_dir, max_bytes=1024 * 1024)
+        assert reopened.get("a") == {"text": "持久化"}
+        assert reopened.purge() == 1
+        assert reopened.get("a") is None
@@ -0,0 +1,267 @@
+import pytest
+import queue
+import threading
+import time
+from app.services.transcription_jobs import TranscriptionJobManager
+from app.utils.cancellation import Cancelled, CancelToken
+
+class TestTranscriptionJobManager:
+    def setup_method(self):
+        self.manager = TranscriptionJobManager(max_workers=2, max_queue_size=2)
+    
+    def teardown_method(self):
+        self.manager.shutdown()
+    
+    def test_submit_and_complete(self):
+        """测试提交任务后返回任务ID，并由工作线程完成"""
+        def task(job):
+            job.set_progress(50)
+            return [{"speaker": "主持人", "text": "你好。"}]
+        
+        job = self.manager.submit(task, {"filename": "test.wav"})
+        assert job.id
+        
+        result = job.future.result(timeout=5)
+        assert result == [{"speaker": "主持人", "text": "你好。"}]
+        assert job.state == "completed"
+        assert job.progress == 100
+        
+        data = self.manager.get(job.id).to_dict()
+        assert data["state"] == "completed"
+        assert data["result"] == result
+        assert data["run_time"] is not None
+    
+    def test_failed_job(self):
+        """测试任务失败时记录错误信息"""
+        def task(job):
+            raise ValueError("bad audio")
+        
+        job = self.manager.submit(task)
+        with pytest.raises(ValueError):
+            job.future.result(timeout=5)
+        assert job.state == "failed"
+        assert job.error == "bad audio"
+    
+    def test_queue_full(self):
+        """测试队列满时拒绝新任务，并统计队列深度"""
+        release = threading.Event()
+        
+        # 两个工作线程都被阻塞
+        blockers = [self.manager.submit(lambda job: release.wait(5)) for _ in range(2)]
+        deadline = time.time() + 5
+        while self.manager.busy_workers < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        
+        # 队列容量为2
+        self.manager.submit(lambda job: None)
+        self.manager.submit(lambda job: None)
+        with pytest.raises(queue.Full):
+            self.manager.submit(lambda job: None)
+        
+        stats = self.manager.stats()
+        assert stats["busy_workers"] == 2
+        assert stats["queue_depth"] == 2
+        assert stats["jobs"]["running"] == 2
+        
+        release.set()
+        for job in blockers:
+            job.future.result(timeout=5)
+    
+    def test_cancel_queued_job(self):
+        """测试排队中的任务被取消后不再执行，状态为 cancelled"""
+        release = threading.Event()
+        blockers = [self.manager.submit(lambda job: release.wait(5)) for _ in range(2)]
+        deadline = time.time() + 5
+        while self.manager.busy_workers < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        ran = []
+        job = self.manager.submit(lambda job: ran.append(job))
+        
+        assert self.manager.cancel(job.id) is job
+        release.set()
+        with pytest.raises(Cancelled):
+            job.future.result(timeout=5)
+        assert job.state == "cancelled"
+        assert job.error == "cancelled"
+        assert ran == []
+        assert self.manager.cancel("missing") is None
+        for blocker in blockers:
+            blocker.future.result(timeout=5)
+    
+    def test_deadline_stops_running_job(self):
+        """测试执行中的任务超过截止时间后在下一次检查时停止"""
+        def task(job):
+            while True:
+                job.cancel_token.check()
+                time.sleep(0.01)
+        
+        job = self.manager.submit(task, cancel_token=CancelToken(timeout=0.1))
+        with pytest.raises(Cancelled):
+            job.future.result(timeout=5)
+        assert job.state == "cancelled"
+        assert job.error == "deadline"
+
+class TestPriorityScheduling:
+    def setup_method(self):
+        self.manager = TranscriptionJobManager(max_workers=2, reserved_workers=1)
+        self.release = threading.Event()
+    
+    def teardown_method(self):
+        self.release.set()
+        self.manager.shutdown()
+    
+    def wait_running(self, job):
+        deadline = time.time() + 5
+        while job.state != "running" and time.time() < deadline:
+            time.sleep(0.01)
+        return job.state == "running"
+    
+    def test_reserved_worker_for_interactive(self):
+        """测试批量任务不占用保留的工作线程，交互任务在批量任务运行时立即开始"""
+        bulk = [self.manager.submit(lambda job: self.release.wait(5), priority="bulk") for _ in range(2)]
+        assert self.wait_running(bulk[0])
+        
+        clip = self.manager.submit(lambda job: "clip", priority="interactive")
+        assert clip.future.result(timeout=5) == "clip"
+        assert bulk[1].state == "queued"
+        
+        priorities = self.manager.stats()["priorities"]
+        assert (priorities["bulk"]["queued"], priorities["bulk"]["running"]) == (1, 1)
+        assert (priorities["interactive"]["queued"], priorities["interactive"]["running"]) == (0, 0)
+        assert clip.to_dict()["priority"] == "interactive"
+    
+    def test_higher_priority_dequeued_first(self):
+        """测试空闲线程先取优先级高的任务"""
+        manager = TranscriptionJobManager(max_workers=1, aging_seconds=0)
+        order = []
+        try:
+            blocker = manager.submit(lambda job: self.release.wait(5))
+            assert self.wait_running(blocker)
+            jobs = [manager.submit(lambda job, name=name: order.append(name), priority=name)
+                    for name in ("bulk", "normal", "interactive")]
+            self.release.set()
+            for job in jobs:
+                job.future.result(timeout=5)
+            
+            assert order == ["interactive", "normal", "bulk"]
+        finally:
+            manager.shutdown()
+
+class TestCancelToken:
+    def test_cancel_keeps_first_reason(self):
+        """测试取消后保留最初的原因"""
+        token = CancelToken()
+        assert not token.cancelled
+        assert token.remaining() is None
+        token.cancel("disconnected")
+        token.cancel("deadline")
+        
+        assert token.cancelled
+        with pytest.raises(Cancelled) as error:
+            token.check()
+        assert error.value.reason == "disconnected"
+    
+    def test_deadline(self):
+        """测试超过截止时间后自动取消"""
+        token = CancelToken(timeout=0.05)
+        assert not token.cancelled
+        assert 0 < token.remaining() <= 0.05
+        time.sleep(0.1)
+        
+        assert token.cancelled
+        assert token.reason == "deadline"
+        assert token.remaining() == 0.0
+
+class TestRequestCoalescing:
+    def setup_method(self):
+        self.manager = TranscriptionJobManager(max_workers=1)
+        self.release = threading.Event()
+    
+    def teardown_method(self):
+        self.release.set()
+        self.manager.shutdown()
+    
+    def test_attach_shares_result(self):
+        """测试相同合并键的请求附着到未结束的任务，共用一次执行的结果"""
+        runs = []
+        
+        def task(job):
+            runs.append(job)
+            self.release.wait(5)
+            return ["done"]
+        
+        job = self.manager.submit(task, key="k")
+        assert self.manager.attach("k") is job
+        assert self.manager.attach("other") is None
+        self.release.set()
+        assert job.future.result(timeout=5) == ["done"]
+        
+        assert len(runs) == 1
+        assert self.manager.stats()["coalesced_requests"] == 1
+        # 任务结束后不再附着
+        assert self.manager.attach("k") is None
+    
+    def test_cancel_after_last_holder(self):
+        """测试共用任务的请求全部撤回后任务才取消"""
+        job = self.manager.submit(lambda job: self.release.wait(5), key="k")
+        self.manager.attach("k")
+        
+        self.manager.release(job, "disconnected")
+        assert not job.cancel_token.cancelled
+        assert self.manager.cancel(job.id) is job
+        assert job.cancel_token.reason == "cancelled"
+        # 已取消的任务不再附着，相同请求提交新任务
+        assert self.manager.attach("k") is None
+    
+    def test_attach_promotes_queued_job(self):
+        """测试更高优先级的请求附着到排队中的任务时提升任务的优先级"""
+        self.manager.submit(lambda job: self.release.wait(5))
+        job = self.manager.submit(lambda job: None, priority="bulk", key="k")
+        
+        assert self.manager.attach("k", "interactive") is job
+        assert job.priority == "interactive"
+        self.release.set()
+        job.future.result(timeout=5)
+    
+    def test_subscribe_replays_published(self):
+        """测试后订阅的回调先收到已推送的句子"""
+        job = self.manager.submit(lambda job: self.release.wait(5), key="k")
+        first, second = [], []
+        job.subscribe(first.append)
+        job.publish({"text": "你好。"})
+        job.subscribe(second.append)
+        job.publish({"text": "再见。"})
+        job.unsubscribe(first.append)
+        job.publish({"text": "谢谢。"})
+        
+        assert [item["text"] for item in first] == ["你好。", "再见。"]
+        assert [item["text"] for item in second] == ["你好。", "再见。", "谢谢。"]
+    
+    def test_finished_job_releases_published(self):
+        """测试任务结束后释放已推送的句子和订阅者，之后订阅时补发最终结果"""
+        def task(job):
+            job.publish({"text": "临时"})
+            self.release.wait(5)
+            return [{"text": "最终"}]
+        
+        job = self.manager.submit(task, key="k")
+        job.subscribe(lambda item: None)
+        self.release.set()
+        job.future.result(timeout=5)
+        deadline = time.time() + 5
+        while job.finished_at is None and time.time() < deadline:
+            time.sleep(0.01)
+        late = []
+        job.subscribe(late.append)
+        
+        assert job._published == [] and job._listeners == []
+        assert late == [{"text": "最终"}]
+    
+    def test_no_attach_after_last_release(self):
+        """测试最后一个请求撤回后任务立即取消，相同请求不会附着到该任务"""
+        job = self.manager.submit(lambda job: self.release.wait(5), key="k")
+        
+        self.manager.release(job, "disconnected")
+        
+        assert job.cancel_token.reason == "disconnected"
+        assert self.manager.attach("k") is None
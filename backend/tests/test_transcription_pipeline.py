@@ -0,0 +1,101 @@
+import pytest
+import numpy as np
+from app.services.transcription_pipeline import TranscriptionPipeline
+from app.utils.cancellation import Cancelled, CancelToken
+from tests.conftest import FakeBatcher, PendingBatcher
+
+SAMPLE_RATE = 16000
+
+class TestTranscriptionPipeline:
+    def setup_method(self):
+        self.batcher = FakeBatcher()
+        self.pipeline = TranscriptionPipeline(self.batcher, sample_rate=SAMPLE_RATE, long_audio_seconds=5,
+                                              max_chunk_seconds=2, max_inflight=2)
+    
+    def test_short_audio_single_chunk(self):
+        """测试短音频作为单个片段处理"""
+        audio = np.zeros(SAMPLE_RATE * 3, dtype=np.float32)
+        segments = self.pipeline.transcribe(audio)
+        
+        assert segments == [{"start": 0.0, "end": 3.0, "text": "片段1"}]
+    
+    def test_offset_gives_absolute_timestamps(self):
+        """测试时间窗口转录时片段时间加上窗口起点"""
+        audio = np.zeros(SAMPLE_RATE * 3, dtype=np.float32)
+        segments = self.pipeline.transcribe(audio, offset=120.5)
+        
+        assert segments == [{"start": 120.5, "end": 123.5, "text": "片段1"}]
+    
+    def test_long_audio_chunks_in_order(self):
+        """测试长音频按片段顺序拼接并带时间偏移"""
+        t = np.arange(SAMPLE_RATE * 12) / SAMPLE_RATE
+        audio = (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+        audio[SAMPLE_RATE * 6:SAMPLE_RATE * 7] = 0
+        progress = []
+        
+        segments = self.pipeline.transcribe(audio, progress=lambda done, total: progress.append((done, total)))
+        
+        assert len(segments) == self.batcher.calls > 1
+        assert [s["text"] for s in segments] == [f"片段{i + 1}" for i in range(len(segments))]
+        for prev, current in zip(segments, segments[1:]):
+            assert prev["end"] <= current["start"]
+        for segment in segments:
+            assert segment["end"] - segment["start"] <= 2.0
+        assert progress[-1] == (len(segments), len(segments))
+    
+    def test_incremental_reuses_unchanged_chunks(self, tmp_path):
+        """测试同一节目插入一段音频后只推理改动的片段，其余片段复用上一版本的文本并平移时间"""
+        from app.services.episode_chunks import EpisodeChunkStore
+        from tests.test_chunking import make_speech
+        pipeline = TranscriptionPipeline(self.batcher, sample_rate=SAMPLE_RATE, long_audio_seconds=60,
+                                         max_chunk_seconds=30, episodes=EpisodeChunkStore(str(tmp_path)),
+                                         min_chunk_seconds=10)
+        audio = make_speech(200, seed=0)
+        inserted = make_speech(7, seed=1)
+        position = 100 * SAMPLE_RATE + 123
+        edited = np.concatenate([audio[:position], inserted, audio[position:]])
+        
+        original = pipeline.transcribe(audio, episode="ep")
+        calls = self.batcher.calls
+        report = {}
+        segments = pipeline.transcribe(edited, report=report, episode="ep")
+        
+        assert self.batcher.calls - calls <= 3
+        assert report["reused_chunks"] == report["chunks"] - (self.batcher.calls - calls)
+        assert report["inference_seconds_saved"] > 150
+        assert segments[0] == original[0]
+        shift = round(len(inserted) / SAMPLE_RATE, 3)
+        assert segments[-1]["text"] == original[-1]["text"]
+        assert segments[-1]["start"] == pytest.approx(original[-1]["start"] + shift, abs=0.002)
+    
+    def test_mock_model_output_not_saved(self, tmp_path):
+        """测试模型未就绪时不保存节目片段，模型就绪后重新转录不复用模拟文本"""
+        from app.services.episode_chunks import EpisodeChunkStore
+        from tests.test_chunking import make_speech
+        episodes = EpisodeChunkStore(str(tmp_path))
+        pipeline = TranscriptionPipeline(self.batcher, sample_rate=SAMPLE_RATE, long_audio_seconds=60,
+                                         max_chunk_seconds=30, episodes=episodes, min_chunk_seconds=10,
+                                         ready=lambda: False)
+        audio = make_speech(120, seed=0)
+        
+        pipeline.transcribe(audio, episode="ep")
+        pipeline.ready = lambda: True
+        report = {}
+        pipeline.transcribe(audio, report=report, episode="ep")
+        
+        assert report["reused_chunks"] == 0
+    
+    def test_cancel_stops_inference(self):
+        """测试取消后不再提交新片段，已排队的片段从微批处理层撤回"""
+        batcher = PendingBatcher()
+        pipeline = TranscriptionPipeline(batcher, sample_rate=SAMPLE_RATE, long_audio_seconds=5,
+                                         max_chunk_seconds=2, max_inflight=2)
+        t = np.arange(SAMPLE_RATE * 12) / SAMPLE_RATE
+        audio = (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+        
+        with pytest.raises(Cancelled) as error:
+            pipeline.transcribe(audio, cancel_token=CancelToken(timeout=0.1))
+        
+        assert error.value.reason == "deadline"
+        assert len(batcher.futures) == 2
+        assert all(future.cancelled() for future in batcher.futures)
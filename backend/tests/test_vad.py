@@ -0,0 +1,51 @@
+import pytest
+import numpy as np
+from app.utils.vad import detect_speech_regions, split_into_chunks
+
+SAMPLE_RATE = 16000
+
+def make_audio(pattern):
+    """按 [(秒数, 是否有声), ...] 生成测试音频"""
+    rng = np.random.default_rng(0)
+    parts = []
+    for seconds, voiced in pattern:
+        n = int(seconds * SAMPLE_RATE)
+        if voiced:
+            t = np.arange(n) / SAMPLE_RATE
+            parts.append(0.5 * np.sin(2 * np.pi * 220 * t))
+        else:
+            parts.append(0.001 * rng.standard_normal(n))
+    return np.concatenate(parts).astype(np.float32)
+
+class TestVad:
+    def test_detect_speech_regions(self):
+        """测试检测出的语音区间与有声段对应"""
+        audio = make_audio([(1, False), (2, True), (1, False), (3, True), (1, False)])
+        regions = detect_speech_regions(audio, SAMPLE_RATE)
+        
+        assert len(regions) == 2
+        assert abs(regions[0][0] / SAMPLE_RATE - 1.0) < 0.2
+        assert abs(regions[0][1] / SAMPLE_RATE - 3.0) < 0.2
+        assert abs(regions[1][0] / SAMPLE_RATE - 4.0) < 0.2
+        assert abs(regions[1][1] / SAMPLE_RATE - 7.0) < 0.2
+    
+    def test_silence_only(self):
+        """测试纯静音没有语音区间"""
+        audio = np.zeros(SAMPLE_RATE * 2, dtype=np.float32)
+        assert detect_speech_regions(audio, SAMPLE_RATE) == []
+    
+    def test_chunks_are_bounded_and_ordered(self):
+        """测试切分片段有序、不重叠且不超过最大时长"""
+        pattern = []
+        for _ in range(20):
+            pattern += [(4, True), (0.6, False)]
+        audio = make_audio(pattern + [(50, True)])
+        chunks = split_into_chunks(audio, SAMPLE_RATE, max_chunk_seconds=10)
+        
+        assert len(chunks) > 1
+        for start, end in chunks:
+            assert 0 < end - start <= 10 * SAMPLE_RATE
+        for (_, prev_end), (next_start, _) in zip(chunks, chunks[1:]):
+            assert prev_end <= next_start
+        # 覆盖末尾的长语音段
+        assert chunks[-1][1] >= len(audio) - SAMPLE_RATE
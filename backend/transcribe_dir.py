@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+离线批量转录脚本：转录整个目录的音频，每个文件输出一份转录稿
+
+清单文件记录每个文件的哈希和状态，重复运行时跳过已完成的文件；
+中断的长音频从片段检查点继续，不必从头转录。
+
+用法:
+    python transcribe_dir.py /data/episodes --output-dir /data/transcripts --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from tqdm import tqdm
+from app.core.config import settings
+from app.services.batch_transcription import BatchManifest, find_audio_files, transcribe_file
+from app.services.model_service import model_service
+from app.services.speaker_diarization import speaker_service
+
+
+def _init_worker(workers: int, preloaded: bool):
+    """工作进程初始化：平分CPU线程，未通过 fork 继承模型时自行加载"""
+    try:
+        import torch
+        torch.set_num_threads(max(1, settings.NCPU // workers))
+    except ImportError:
+        pass
+    if not preloaded:
+        model_service.load_model()
+
+
+def _run_task(task: tuple) -> tuple:
+    """在工作进程中转录单个文件，异常转为失败结果返回给父进程"""
+    relpath, source_path, transcript_path, checkpoint_path = task
+    try:
+        return relpath, transcribe_file(source_path, transcript_path, checkpoint_path)
+    except Exception as e:
+        return relpath, {"status": "failed", "error": str(getattr(e, "detail", "") or e)}
+
+
+def _output_paths(output_dir: str, relpath: str) -> tuple:
+    """转录稿和检查点路径，保持输入目录的层级结构"""
+    base = os.path.join(output_dir, relpath)
+    return f"{base}.json", f"{base}.checkpoint.json"
+
+
+def run(input_dir: str, output_dir: str, workers: int = 1, retry_failed: bool = True) -> dict:
+    """转录目录下所有尚未完成的音频文件
+
+    Args:
+        input_dir: 音频目录
+        output_dir: 转录稿输出目录，清单文件位于其中
+        workers: 并行进程数
+        retry_failed: 是否重试上次失败的文件
+
+    Returns:
+        dict: 汇总统计
+    """
+    manifest = BatchManifest(os.path.join(output_dir, "manifest.json"))
+    tasks = []
+    skipped = 0
+    for relpath in find_audio_files(input_dir):
+        source_path = os.path.join(input_dir, relpath)
+        transcript_path, checkpoint_path = _output_paths(output_dir, relpath)
+        if manifest.is_completed(relpath, source_path, transcript_path):
+            skipped += 1
+            continue
+        if not retry_failed and manifest.files.get(relpath, {}).get("status") == "failed":
+            skipped += 1
+            continue
+        manifest.update(relpath, status="partial" if os.path.exists(checkpoint_path) else "pending",
+                        transcript=os.path.relpath(transcript_path, output_dir))
+        tasks.append((relpath, source_path, transcript_path, checkpoint_path))
+    manifest.save()
+
+    print(f"{len(tasks)} files to transcribe, {skipped} already done")
+    summary = {"completed": 0, "failed": 0, "skipped": skipped, "cached": 0, "resumed": 0,
+               "audio_seconds": 0.0, "inference_seconds_saved": 0.0, "wall_seconds": 0.0}
+    if not tasks:
+        return summary
+
+    # 支持 fork 时父进程加载一次模型，工作进程以写时复制方式共享权重
+    preloaded = hasattr(os, "fork")
+    if preloaded and not model_service.load_model():
+        raise RuntimeError(f"Model loading failed: {model_service.load_error}")
+    if preloaded and speaker_service.enabled:
+        speaker_service.load_model()
+
+    start = time.time()
+    progress = tqdm(total=len(tasks), unit="file")
+
+    def record(relpath: str, result: dict):
+        manifest.update(relpath, **result)
+        manifest.save()
+        if result["status"] == "completed":
+            summary["completed"] += 1
+            summary["cached"] += result["cached"]
+            summary["resumed"] += result["resumed_chunks"] > 0
+            summary["audio_seconds"] += result["duration"] or 0.0
+            summary["inference_seconds_saved"] += result["inference_seconds_saved"]
+        else:
+            summary["failed"] += 1
+            tqdm.write(f"Failed: {relpath}: {result['error']}")
+        elapsed = time.time() - start
+        progress.set_postfix(audio_h=round(summary["audio_seconds"] / 3600, 2),
+                             speed=f"{summary['audio_seconds'] / elapsed:.1f}x" if elapsed else "-")
+        progress.update(1)
+
+    if workers <= 1:
+        _init_worker(1, preloaded)
+        for task in tasks:
+            record(*_run_task(task))
+    else:
+        context = multiprocessing.get_context("fork" if preloaded else None)
+        with context.Pool(workers, initializer=_init_worker, initargs=(workers, preloaded)) as pool:
+            for relpath, result in pool.imap_unordered(_run_task, tasks):
+                record(relpath, result)
+    progress.close()
+
+    summary["wall_seconds"] = round(time.time() - start, 3)
+    summary["audio_seconds"] = round(summary["audio_seconds"], 3)
+    summary["inference_seconds_saved"] = round(summary["inference_seconds_saved"], 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线批量转录目录下的音频文件")
+    parser.add_argument("input_dir", help="音频目录（递归查找）")
+    parser.add_argument("--output-dir", help="转录稿输出目录，默认为 <input_dir>/transcripts")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数")
+    parser.add_argument("--skip-failed", action="store_true", help="不重试上次失败的文件")
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or os.path.join(args.input_dir, "transcripts")
+    summary = run(args.input_dir, output_dir, workers=args.workers, retry_failed=not args.skip_failed)
+
+    wall = summary["wall_seconds"]
+    print(f"Completed: {summary['completed']} (cached {summary['cached']}, resumed {summary['resumed']}), "
+          f"failed: {summary['failed']}, skipped: {summary['skipped']}")
+    if wall:
+        print(f"Audio: {summary['audio_seconds'] / 3600:.2f} h in {wall:.1f} s, "
+              f"{summary['audio_seconds'] / wall:.1f}x realtime, {summary['completed'] * 60 / wall:.1f} files/min")
+    if summary["inference_seconds_saved"]:
+        print(f"Inference skipped for reused audio: {summary['inference_seconds_saved']:.1f} s")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
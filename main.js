@@ -84,7 +84,7 @@ ipcMain.handle('transcribe', async (event, audioPath) => {
   try {
     // 检查本地API是否可用
     try {
-      await axios.get(`${LOCAL_API_URL}/health`);
+      await axios.get(`${LOCAL_API_URL}/health/live`);
     } catch (error) {
       return {
         status: 'error',
@@ -92,12 +92,25 @@ ipcMain.handle('transcribe', async (event, audioPath) => {
       };
     }
     
+    // 优先让后端按路径直接读取文件，无需上传；文件不在后端允许的目录（LOCAL_INGEST_DIRS）时回退到上传
+    try {
+      const response = await axios.post(`${LOCAL_API_URL}/api/v1/transcription/transcribe/local`, null, {
+        params: { path: audioPath },
+      });
+      console.log('Local API result:', response.data);
+      return response.data;
+    } catch (error) {
+      if (![403, 404].includes(error.response?.status)) {
+        throw error;
+      }
+    }
+    
     // 调用本地FunASR API进行语音识别
     const formData = new FormData();
     const fileStream = fs.createReadStream(audioPath);
     formData.append('file', fileStream, { filename: path.basename(audioPath) });
     
-    const response = await axios.post(`${LOCAL_API_URL}/transcribe`, formData, {
+    const response = await axios.post(`${LOCAL_API_URL}/api/v1/transcription/transcribe`, formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
       },